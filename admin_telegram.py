@@ -0,0 +1,253 @@
+import asyncio
+import bisect
+import heapq
+import hmac
+import itertools
+import logging
+import time
+
+from servidor_http import Resposta, resposta_json
+
+logger = logging.getLogger(__name__)
+
+# --- API de Administração do Bot do Telegram ---
+# Substitui o menu do CLI (input() numa thread, que chamava o Application de fora do event
+# loop). As rotas rodam num ServidorHTTP no mesmo event loop do bot, então disparar o
+# follow-up e encerrar o bot são chamadas feitas de dentro do loop. As listagens são
+# paginadas por cursor (o último chat_id da página anterior) e só a página é montada: os
+# chat_ids do banco são ordenados (e filtrados pela busca) uma vez, em lotes que cedem o event
+# loop, e a listagem fica guardada por RETRATO_SEGUNDOS para as páginas seguintes; o próximo
+# envio de cada contrato da página vem do índice do agendador (O(1) por chat), sem varrer a
+# fila de envios.
+#
+# GET  /admin/prospects?limite=50&depois=<chat_id>&busca=<nome>
+# GET  /admin/contratos?limite=50&depois=<chat_id>&busca=<nome>
+# GET  /admin/follow-up      andamento (ou resumo) do último follow-up
+# POST /admin/follow-up      inicia o follow-up dos prospects; corpo opcional {"mensagem": "..."}
+# GET  /admin/relatorio      memória e cache (o que o CLI mostrava)
+# POST /admin/encerrar       encerramento gracioso do bot
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+MAX_ERROS = 100 # Erros por chat mostrados no resumo do follow-up
+LOTE = 2000 # chat_ids ordenados ou filtrados entre uma cedida e outra do event loop
+RETRATO_SEGUNDOS = 10 # Validade da listagem ordenada (e de cada busca) entre as páginas
+MAX_BUSCAS = 16 # Buscas diferentes guardadas ao mesmo tempo
+CAMINHO_BASE = "/admin"
+
+
+async def ordenar_em_lotes(chaves):
+    """
+    sorted(chaves) sem segurar o event loop: lotes de LOTE ordenados separadamente e depois
+    intercalados, cedendo o loop entre um lote e outro (100k chat_ids de uma vez seriam dezenas
+    de ms com os updates do Telegram esperando).
+    """
+    lotes = []
+    for inicio in range(0, len(chaves), LOTE):
+        lotes.append(sorted(chaves[inicio:inicio + LOTE]))
+        await asyncio.sleep(0)
+    ordenadas = []
+    intercaladas = heapq.merge(*lotes)
+    while lote := list(itertools.islice(intercaladas, LOTE)):
+        ordenadas.extend(lote)
+        await asyncio.sleep(0)
+    return ordenadas
+
+
+async def filtrar_em_lotes(chaves, dados, busca, nome=str):
+    """Os chat_ids de 'chaves' (na mesma ordem) cujo nome(dados[chat_id]) contém 'busca', sem diferenciar maiúsculas."""
+    busca = busca.casefold()
+    filtradas = []
+    for inicio in range(0, len(chaves), LOTE):
+        filtradas.extend(chat_id for chat_id in chaves[inicio:inicio + LOTE]
+                         if chat_id in dados and busca in nome(dados[chat_id]).casefold())
+        await asyncio.sleep(0)
+    return filtradas
+
+
+def paginar(chaves, dados, depois=None, limite=LIMITE_PADRAO):
+    """
+    Uma página de 'chaves' (chat_ids em ordem) começando depois do chat_id 'depois', pulando os
+    que já saíram de 'dados'. Retorna (chat_ids da página, cursor da próxima página ou None).
+    O(log n + limite).
+    """
+    pagina = []
+    inicio = bisect.bisect_right(chaves, depois) if depois is not None else 0
+    for indice in range(inicio, len(chaves)):
+        chat_id = chaves[indice]
+        if chat_id in dados:
+            if len(pagina) == limite:
+                return pagina, pagina[-1]
+            pagina.append(chat_id)
+    return pagina, None
+
+
+class RequisicaoInvalida(ValueError):
+    pass
+
+
+def _parametros(consulta):
+    try:
+        limite = int(consulta.get("limite", LIMITE_PADRAO))
+        depois = int(consulta["depois"]) if consulta.get("depois") else None
+    except ValueError:
+        raise RequisicaoInvalida("'limite' e 'depois' devem ser inteiros") from None
+    if not 1 <= limite <= LIMITE_MAXIMO:
+        raise RequisicaoInvalida(f"'limite' deve estar entre 1 e {LIMITE_MAXIMO}")
+    return depois, limite, consulta.get("busca") or None
+
+
+class AdminTelegram:
+    """
+    Rotas da administração. Recebe o bot por funções, chamadas a cada requisição (os bancos
+    podem ser trocados por usar_estado_compartilhado):
+    - retrato_prospects() / retrato_contratos(): coroutines -> cópia do banco (chat_id -> valor),
+      chamadas no máximo a cada RETRATO_SEGUNDOS por listagem
+    - proxima_execucao(chat_id) -> datetime ou None
+    - enviar_follow_up(mensagem, ao_progredir) -> coroutine com o resumo do envio em massa
+    - relatorio() -> dicionário; encerrar() -> pede o encerramento do bot
+    'token' None = sem autenticação (só para a API escutando em localhost).
+    """
+
+    def __init__(self, token, retrato_prospects, retrato_contratos, proxima_execucao,
+                 enviar_follow_up, mensagem_follow_up, relatorio, encerrar):
+        self.token = token
+        self.retrato_prospects = retrato_prospects
+        self.retrato_contratos = retrato_contratos
+        self.proxima_execucao = proxima_execucao
+        self.enviar_follow_up = enviar_follow_up
+        self.mensagem_follow_up = mensagem_follow_up
+        self.relatorio = relatorio
+        self.encerrar = encerrar
+        self._listagens = {}   # (banco, busca) -> (instante, tarefa da montagem), ver _listagem
+        self._follow_up = None # Tarefa do follow-up em andamento (ou do último)
+        self.andamento = None  # {"total", "enviados", "falhas", "inicio"} e, no fim, o resumo
+
+    def registrar(self, servidor):
+        rotas = (
+            ("GET", "/prospects", self.listar_prospects),
+            ("GET", "/contratos", self.listar_contratos),
+            ("GET", "/follow-up", self.status_follow_up),
+            ("POST", "/follow-up", self.iniciar_follow_up),
+            ("GET", "/relatorio", self.mostrar_relatorio),
+            ("POST", "/encerrar", self.pedir_encerramento),
+        )
+        for metodo, caminho, handler in rotas:
+            servidor.rota(metodo, CAMINHO_BASE + caminho, self._autenticado(handler))
+        return servidor
+
+    def _autenticado(self, handler):
+        async def atender(requisicao):
+            if self.token is not None:
+                enviado = requisicao.cabecalhos.get("authorization", "").removeprefix("Bearer ")
+                if not hmac.compare_digest(enviado.encode(), self.token.encode()):
+                    return Resposta(401)
+            try:
+                return await handler(requisicao)
+            except RequisicaoInvalida as e:
+                return resposta_json({"erro": str(e)}, 400)
+        return atender
+
+    async def _listagem(self, banco, retrato, busca, nome):
+        """
+        (instante, dados, chat_ids em ordem) de 'banco', filtrados por 'busca', montados no
+        máximo RETRATO_SEGUNDOS atrás. Requisições simultâneas esperam a mesma montagem.
+        """
+        chave = (banco, busca)
+        guardada = self._listagens.get(chave)
+        if guardada is None or time.monotonic() - guardada[0] > RETRATO_SEGUNDOS:
+            if busca is None:
+                montagem = self._montar(retrato)
+            else:
+                montagem = self._filtrar(await self._listagem(banco, retrato, None, nome), busca, nome)
+            self._listagens.pop(chave, None) # Volta para o fim da ordem (a mais nova)
+            guardada = self._listagens[chave] = (time.monotonic(), asyncio.create_task(montagem))
+            if len(self._listagens) > MAX_BUSCAS:
+                self._listagens.pop(next(iter(self._listagens))) # A mais antiga
+        try:
+            # shield: uma requisição cancelada (cliente desconectou) não cancela a montagem dos outros
+            return await asyncio.shield(guardada[1])
+        except Exception:
+            if self._listagens.get(chave) is guardada:
+                del self._listagens[chave]
+            raise
+
+    @staticmethod
+    async def _montar(retrato):
+        dados = await retrato()
+        return time.monotonic(), dados, await ordenar_em_lotes(list(dados))
+
+    @staticmethod
+    async def _filtrar(base, busca, nome):
+        instante, dados, chaves = base
+        return instante, dados, await filtrar_em_lotes(chaves, dados, busca, nome)
+
+    async def _listar(self, requisicao, banco, retrato, item, nome):
+        depois, limite, busca = _parametros(requisicao.consulta)
+        _, dados, chaves = await self._listagem(banco, retrato, busca and busca.casefold(), nome)
+        pagina, proximo = paginar(chaves, dados, depois, limite)
+        return resposta_json({"total": len(chaves), "itens": [item(chat_id, dados[chat_id]) for chat_id in pagina],
+                              "proximo": proximo})
+
+    async def listar_prospects(self, requisicao):
+        return await self._listar(requisicao, "prospects", self.retrato_prospects,
+                                  lambda chat_id, nome: {"chat_id": chat_id, "nome": nome}, str)
+
+    async def listar_contratos(self, requisicao):
+        def item(chat_id, contrato):
+            proximo = self.proxima_execucao(chat_id)
+            return {"chat_id": chat_id, "nome": contrato["nome"],
+                    "proximo_envio": proximo.isoformat() if proximo else None}
+        return await self._listar(requisicao, "contratos", self.retrato_contratos, item,
+                                  lambda contrato: contrato["nome"])
+
+    async def status_follow_up(self, requisicao):
+        em_andamento = self._follow_up is not None and not self._follow_up.done()
+        return resposta_json({"em_andamento": em_andamento, **(self.andamento or {})})
+
+    async def iniciar_follow_up(self, requisicao):
+        if self._follow_up is not None and not self._follow_up.done():
+            return resposta_json({"erro": "Já existe um follow-up em andamento", **self.andamento}, 409)
+        try:
+            corpo = requisicao.json() if requisicao.corpo else {}
+            mensagem = corpo.get("mensagem") or self.mensagem_follow_up
+        except (ValueError, AttributeError):
+            raise RequisicaoInvalida("corpo deve ser um objeto JSON, ex: {\"mensagem\": \"...\"}") from None
+        if not isinstance(mensagem, str):
+            raise RequisicaoInvalida("'mensagem' deve ser um texto")
+
+        self.andamento = {"total": None, "enviados": 0, "falhas": 0, "inicio": time.time()}
+        self._follow_up = asyncio.create_task(self._executar_follow_up(mensagem))
+        return resposta_json({"em_andamento": True, **self.andamento}, 202)
+
+    async def _executar_follow_up(self, mensagem):
+        def progresso(enviados, falhas, total):
+            self.andamento.update(total=total, enviados=enviados, falhas=falhas)
+
+        try:
+            resumo = await self.enviar_follow_up(mensagem, progresso)
+        except Exception as e:
+            logger.exception("Erro no follow-up")
+            self.andamento["erro"] = repr(e)
+            return
+        self.andamento.update(total=resumo["total"], enviados=resumo["enviados"], falhas=resumo["falhas"],
+                              duracao=resumo["duracao"], erros=dict(itertools.islice(resumo["erros"].items(), MAX_ERROS)))
+        logger.info(f"Follow-up concluído em {resumo['duracao']:.1f}s: "
+                    f"{resumo['enviados']} enviados, {resumo['falhas']} falhas")
+
+    async def mostrar_relatorio(self, requisicao):
+        return resposta_json(self.relatorio())
+
+    async def pedir_encerramento(self, requisicao):
+        logger.info("Encerramento pedido pela API de administração")
+        # Depois desta resposta ser enviada; o encerramento para o servidor e o bot em ordem
+        asyncio.get_running_loop().call_soon(self.encerrar)
+        return resposta_json({"encerrando": True}, 202)
+
+    async def parar(self):
+        """Cancela o follow-up e as listagens em andamento (no encerramento do bot)."""
+        tarefas = [tarefa for _, tarefa in self._listagens.values()] + [self._follow_up] * (self._follow_up is not None)
+        self._listagens.clear()
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
@@ -0,0 +1,159 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# --- Agendador Único dos Follow-ups de Contrato ---
+# Em vez de um job do JobQueue por chat, todos os contratos ficam num min-heap
+# ordenado pelo próximo envio. O agendador acorda uma vez por horário devido,
+# retira o lote inteiro que venceu, envia e reagenda cada contrato para o próximo
+# dia útil (a regra do calendário fica na função 'proximo_horario').
+
+
+class AgendadorContratos:
+    """Min-heap de (próximo envio, chat). Adicionar/remover em O(log n), um despertar por horário."""
+
+    def __init__(self, proximo_horario, enviar_lote):
+        # proximo_horario(a_partir_de: datetime) -> datetime do próximo envio válido
+        # enviar_lote(lista de chat_ids) -> coroutine que faz os envios (limitados) do horário
+        self.proximo_horario = proximo_horario
+        self.enviar_lote = enviar_lote
+        self._heap = []        # Entradas: [horario, seq, chat_id, ativa]
+        self._entradas = {}    # Chave: ID do chat, Valor: entrada ativa no heap
+        self._inativas = 0
+        self._seq = itertools.count()
+        self._acordar = asyncio.Event()
+        self._tarefa = None
+        self.ultimo_atraso = 0.0 # Atraso (s) entre o horário devido e o despertar do último lote
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, chat_id):
+        return chat_id in self._entradas
+
+    def __iter__(self):
+        return iter(self._entradas)
+
+    def proxima_execucao(self, chat_id):
+        """Próximo envio agendado do chat (consulta O(1) no índice), ou None."""
+        entrada = self._entradas.get(chat_id)
+        return entrada[0] if entrada else None
+
+    def adicionar(self, chat_id, horario=None):
+        """Agenda (ou reagenda) o chat. Sem 'horario', usa o próximo horário válido a partir de agora."""
+        if chat_id in self._entradas:
+            self._desativar(chat_id)
+        horario = horario or self.proximo_horario(datetime.now())
+        entrada = [horario, next(self._seq), chat_id, True]
+        self._entradas[chat_id] = entrada
+        antes = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, entrada)
+        if antes is None or horario < antes:
+            self._acordar.set() # O próximo despertar mudou
+
+    def adicionar_varios(self, chat_ids, horario=None):
+        """Agenda muitos chats de uma vez (reidratação): O(n) com heapify."""
+        horario = horario or self.proximo_horario(datetime.now())
+        for chat_id in chat_ids:
+            if chat_id in self._entradas:
+                self._desativar(chat_id)
+            entrada = [horario, next(self._seq), chat_id, True]
+            self._entradas[chat_id] = entrada
+            self._heap.append(entrada)
+        heapq.heapify(self._heap)
+        self._acordar.set()
+
+    def sincronizar(self, chat_ids):
+        """Deixa agendados exatamente os chats informados (contratos gravados por outros workers)."""
+        chat_ids = set(chat_ids)
+        removidos = [chat_id for chat_id in self._entradas if chat_id not in chat_ids]
+        for chat_id in removidos:
+            self._desativar(chat_id)
+        novos = [chat_id for chat_id in chat_ids if chat_id not in self._entradas]
+        if novos:
+            self.adicionar_varios(novos)
+        return len(novos), len(removidos)
+
+    def remover(self, chat_id):
+        """Remove o agendamento do chat. Retorna False se ele não existia."""
+        if chat_id not in self._entradas:
+            return False
+        self._desativar(chat_id)
+        return True
+
+    def _desativar(self, chat_id):
+        # Remoção preguiçosa: a entrada sai do índice agora e do heap quando chegar ao topo
+        self._entradas.pop(chat_id)[3] = False
+        self._inativas += 1
+        if self._inativas > 1024 and self._inativas > len(self._heap) // 2:
+            self._heap = [e for e in self._heap if e[3]]
+            heapq.heapify(self._heap)
+            self._inativas = 0
+
+    def _retirar_vencidos(self, agora):
+        """Retira do heap todas as entradas vencidas e as reagenda para o próximo horário válido."""
+        lote = []
+        proximos = {}
+        while self._heap and self._heap[0][0] <= agora:
+            entrada = heapq.heappop(self._heap)
+            if not entrada[3]:
+                self._inativas -= 1
+                continue
+            horario, _, chat_id, _ = entrada
+            lote.append(chat_id)
+            # O mesmo horário vencido leva sempre ao mesmo próximo horário: calcula uma vez por slot
+            if horario not in proximos:
+                proximos[horario] = self.proximo_horario(max(horario, agora))
+            nova = [proximos[horario], next(self._seq), chat_id, True]
+            self._entradas[chat_id] = nova
+            heapq.heappush(self._heap, nova)
+        return lote
+
+    async def executar(self):
+        """Loop principal: dorme até o próximo horário devido e envia o lote daquele horário."""
+        while True:
+            self._acordar.clear()
+            while self._heap and not self._heap[0][3]:
+                heapq.heappop(self._heap)
+                self._inativas -= 1
+
+            if not self._heap:
+                await self._acordar.wait()
+                continue
+
+            espera = (self._heap[0][0] - datetime.now()).total_seconds()
+            if espera > 0:
+                try:
+                    # Acorda antes se um contrato com horário mais cedo for adicionado
+                    await asyncio.wait_for(self._acordar.wait(), timeout=espera)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            agora = datetime.now()
+            self.ultimo_atraso = (agora - self._heap[0][0]).total_seconds()
+            lote = self._retirar_vencidos(agora)
+            if lote:
+                logger.info(f"Enviando {len(lote)} follow-ups de contrato (atraso de {self.ultimo_atraso:.2f}s).")
+                try:
+                    await self.enviar_lote(lote)
+                except Exception as e:
+                    logger.error(f"Erro ao enviar lote de follow-ups de contrato: {e}")
+
+    def iniciar(self):
+        if self._tarefa is None:
+            self._tarefa = asyncio.get_running_loop().create_task(self.executar())
+        return self._tarefa
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+            self._tarefa = None
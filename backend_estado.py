@@ -0,0 +1,375 @@
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import MutableMapping
+
+# --- Backends de Estado Compartilhado (prospects do WhatsApp) ---
+# Com vários workers (ex: gunicorn), o estado não pode ficar num dicionário do processo:
+# todos os workers e o envio de follow-up precisam enxergar o mesmo conjunto de prospects.
+# Cada backend garante que "adicionar se ainda não existe" é atômico.
+# Além dos prospects, cada backend guarda tabelas chave/valor genéricas (texto), usadas
+# pelo bot do Telegram rodando em vários processos (estado das conversas, prospects, contratos).
+
+
+class BackendEstado(ABC):
+    """Interface dos backends de estado (um backend incompleto falha ao ser criado)."""
+
+    @abstractmethod
+    def adicionar_prospect(self, numero, nome):
+        """Adiciona o prospect se ele ainda não existir. Retorna True se foi adicionado agora."""
+
+    @abstractmethod
+    def remover_prospect(self, numero):
+        ...
+
+    @abstractmethod
+    def listar_prospects(self):
+        """Retorna um dicionário {numero: nome} com um retrato consistente dos prospects."""
+
+    @abstractmethod
+    def quantidade_prospects(self):
+        ...
+
+    @abstractmethod
+    def obter(self, tabela, chave):
+        """Valor (texto) da chave na tabela, ou None."""
+
+    @abstractmethod
+    def definir(self, tabela, chave, valor):
+        ...
+
+    @abstractmethod
+    def remover(self, tabela, chave):
+        """Remove a chave. Retorna True se ela existia."""
+
+    @abstractmethod
+    def listar(self, tabela):
+        """Retorna um dicionário {chave: valor} com a tabela inteira (uma única leitura)."""
+
+    @abstractmethod
+    def quantidade(self, tabela):
+        ...
+
+    @abstractmethod
+    def adquirir_trava(self, nome, ttl):
+        """
+        Tenta pegar a trava 'nome' sem esperar. Retorna um token (para liberar) ou None se ela já
+        tem dono. A trava expira sozinha após 'ttl' segundos, caso o processo dono morra.
+        """
+
+    @abstractmethod
+    def liberar_trava(self, nome, token):
+        ...
+
+
+class BackendMemoria(BackendEstado):
+    """Estado em memória do processo (testes e execução com um único processo)."""
+
+    def __init__(self):
+        self._prospects = {}
+        self._tabelas = {}
+        self._travas = {} # Chave: nome, Valor: (token, expira)
+        self._lock = threading.Lock()
+
+    def adicionar_prospect(self, numero, nome):
+        with self._lock:
+            if numero in self._prospects:
+                return False
+            self._prospects[numero] = nome
+            return True
+
+    def remover_prospect(self, numero):
+        with self._lock:
+            self._prospects.pop(numero, None)
+
+    def listar_prospects(self):
+        with self._lock:
+            return dict(self._prospects)
+
+    def quantidade_prospects(self):
+        return len(self._prospects)
+
+    def obter(self, tabela, chave):
+        return self._tabelas.get(tabela, {}).get(chave)
+
+    def definir(self, tabela, chave, valor):
+        with self._lock:
+            self._tabelas.setdefault(tabela, {})[chave] = valor
+
+    def remover(self, tabela, chave):
+        with self._lock:
+            return self._tabelas.get(tabela, {}).pop(chave, None) is not None
+
+    def listar(self, tabela):
+        with self._lock:
+            return dict(self._tabelas.get(tabela, {}))
+
+    def quantidade(self, tabela):
+        return len(self._tabelas.get(tabela, {}))
+
+    def adquirir_trava(self, nome, ttl):
+        agora = time.monotonic()
+        with self._lock:
+            atual = self._travas.get(nome)
+            if atual is not None and atual[1] > agora:
+                return None
+            token = secrets.token_hex(8)
+            self._travas[nome] = (token, agora + ttl)
+            return token
+
+    def liberar_trava(self, nome, token):
+        with self._lock:
+            if self._travas.get(nome, (None,))[0] == token:
+                del self._travas[nome]
+
+
+class BackendSQLite(BackendEstado):
+    """Estado num arquivo SQLite (WAL) compartilhado pelos processos da mesma máquina."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._local = threading.local() # Uma conexão por thread
+        conexao = self._conexao()
+        conexao.execute("PRAGMA journal_mode=WAL")
+        with conexao:
+            conexao.execute("CREATE TABLE IF NOT EXISTS prospects (numero TEXT PRIMARY KEY, nome TEXT)")
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS estado (tabela TEXT, chave TEXT, valor TEXT, "
+                "PRIMARY KEY (tabela, chave)) WITHOUT ROWID"
+            )
+            conexao.execute("CREATE TABLE IF NOT EXISTS travas (nome TEXT PRIMARY KEY, token TEXT, expira REAL)")
+
+    def _conexao(self):
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexao = conexao
+        return conexao
+
+    def adicionar_prospect(self, numero, nome):
+        conexao = self._conexao()
+        with conexao:
+            # INSERT OR IGNORE é atômico mesmo com vários processos gravando
+            cursor = conexao.execute("INSERT OR IGNORE INTO prospects (numero, nome) VALUES (?, ?)", (numero, nome))
+        return cursor.rowcount == 1
+
+    def remover_prospect(self, numero):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute("DELETE FROM prospects WHERE numero = ?", (numero,))
+
+    def listar_prospects(self):
+        return dict(self._conexao().execute("SELECT numero, nome FROM prospects").fetchall())
+
+    def quantidade_prospects(self):
+        return self._conexao().execute("SELECT COUNT(*) FROM prospects").fetchone()[0]
+
+    def obter(self, tabela, chave):
+        linha = self._conexao().execute(
+            "SELECT valor FROM estado WHERE tabela = ? AND chave = ?", (tabela, chave)
+        ).fetchone()
+        return linha[0] if linha else None
+
+    def definir(self, tabela, chave, valor):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute("INSERT OR REPLACE INTO estado (tabela, chave, valor) VALUES (?, ?, ?)", (tabela, chave, valor))
+
+    def remover(self, tabela, chave):
+        conexao = self._conexao()
+        with conexao:
+            cursor = conexao.execute("DELETE FROM estado WHERE tabela = ? AND chave = ?", (tabela, chave))
+        return cursor.rowcount == 1
+
+    def listar(self, tabela):
+        return dict(self._conexao().execute("SELECT chave, valor FROM estado WHERE tabela = ?", (tabela,)).fetchall())
+
+    def quantidade(self, tabela):
+        return self._conexao().execute("SELECT COUNT(*) FROM estado WHERE tabela = ?", (tabela,)).fetchone()[0]
+
+    def adquirir_trava(self, nome, ttl):
+        # Relógio de parede: os processos precisam concordar sobre a expiração
+        agora = time.time()
+        token = secrets.token_hex(8)
+        conexao = self._conexao()
+        with conexao:
+            # As duas instruções rodam na mesma transação de escrita (serializada pelo SQLite)
+            conexao.execute("DELETE FROM travas WHERE nome = ? AND expira <= ?", (nome, agora))
+            cursor = conexao.execute("INSERT OR IGNORE INTO travas (nome, token, expira) VALUES (?, ?, ?)",
+                                     (nome, token, agora + ttl))
+        return token if cursor.rowcount == 1 else None
+
+    def liberar_trava(self, nome, token):
+        conexao = self._conexao()
+        with conexao:
+            conexao.execute("DELETE FROM travas WHERE nome = ? AND token = ?", (nome, token))
+
+
+def _texto(valor):
+    return valor.decode() if isinstance(valor, bytes) else valor
+
+
+# Apaga a trava só se o valor ainda for o token de quem a pegou (atômico no servidor)
+_LUA_LIBERAR_TRAVA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class BackendRedis(BackendEstado):
+    """Estado num servidor compatível com o protocolo Redis (um hash com os prospects)."""
+
+    def __init__(self, cliente, chave="wa:prospects"):
+        self.cliente = cliente
+        self.chave = chave
+        self._liberar_trava = cliente.register_script(_LUA_LIBERAR_TRAVA)
+
+    def adicionar_prospect(self, numero, nome):
+        # HSETNX: grava apenas se o campo ainda não existir (atômico no servidor)
+        return bool(self.cliente.hsetnx(self.chave, numero, nome))
+
+    def remover_prospect(self, numero):
+        self.cliente.hdel(self.chave, numero)
+
+    def listar_prospects(self):
+        return {_texto(numero): _texto(nome) for numero, nome in self.cliente.hgetall(self.chave).items()}
+
+    def quantidade_prospects(self):
+        return self.cliente.hlen(self.chave)
+
+    # Cada tabela genérica é um hash "estado:<tabela>"
+    def obter(self, tabela, chave):
+        return _texto(self.cliente.hget(f"estado:{tabela}", chave))
+
+    def definir(self, tabela, chave, valor):
+        self.cliente.hset(f"estado:{tabela}", chave, valor)
+
+    def remover(self, tabela, chave):
+        return bool(self.cliente.hdel(f"estado:{tabela}", chave))
+
+    def listar(self, tabela):
+        return {_texto(chave): _texto(valor) for chave, valor in self.cliente.hgetall(f"estado:{tabela}").items()}
+
+    def quantidade(self, tabela):
+        return self.cliente.hlen(f"estado:{tabela}")
+
+    def adquirir_trava(self, nome, ttl):
+        token = secrets.token_hex(8)
+        # SET NX PX: cria a chave só se ninguém tiver a trava, já com a expiração
+        return token if self.cliente.set(f"trava:{nome}", token, nx=True, px=int(ttl * 1000)) else None
+
+    def liberar_trava(self, nome, token):
+        # Só apaga se a trava ainda for nossa (não apaga a de outro processo depois de expirar).
+        # Comparar e apagar num script: entre um GET e um DEL a trava poderia expirar e ser de outro
+        self._liberar_trava(keys=[f"trava:{nome}"], args=[token])
+
+
+def criar_backend(url):
+    """
+    Cria o backend a partir de uma URL:
+    'memoria://', 'sqlite:///caminho/arquivo.db' ou 'redis://host:porta/db'.
+    """
+    if url.startswith("memoria://"):
+        return BackendMemoria()
+    if url.startswith("sqlite:///"):
+        return BackendSQLite(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis # Dependência opcional, só necessária com o backend Redis
+        return BackendRedis(redis.Redis.from_url(url))
+    raise ValueError(f"Backend de estado desconhecido: {url}")
+
+
+class DicionarioCompartilhado(MutableMapping):
+    """
+    Dicionário sem cópia local: toda leitura e escrita vai direto para uma tabela do backend,
+    então vários processos enxergam as mesmas chaves (mesma interface do DicionarioPersistente).
+
+    As chaves e os valores são gravados como texto; 'serializar_chave'/'desserializar_chave'
+    e 'serializar'/'desserializar' fazem a conversão (ex: IDs de chat inteiros).
+
+    As chamadas ao backend bloqueiam (SQLite, Redis). No caminho de um update, carregar(update)
+    lê a chave daquele update ('chave_update(update)', ex: o ID do chat) e, até gravar(update),
+    ela é lida e alterada só em memória. O ProcessadorPorChat chama os dois numa thread, junto
+    com a trava do chat: os handlers não seguram o event loop esperando o backend.
+    """
+
+    def __init__(self, backend, tabela, serializar_chave=str, desserializar_chave=int,
+                 serializar=str, desserializar=None, chave_update=None):
+        self.backend = backend
+        self.tabela = tabela
+        self.serializar_chave = serializar_chave
+        self.desserializar_chave = desserializar_chave
+        self.serializar = serializar
+        self.desserializar = desserializar or (lambda valor: valor)
+        self.chave_update = chave_update
+        self._carregadas = {} # Chave: chave do update, Valor: [texto lido, texto atual] (None = ausente)
+
+    def carregar(self, update):
+        chave = self.chave_update(update)
+        if chave is not None and chave not in self._carregadas:
+            valor = self.backend.obter(self.tabela, self.serializar_chave(chave))
+            self._carregadas[chave] = [valor, valor]
+
+    def gravar(self, update):
+        chave = self.chave_update(update)
+        lido, atual = self._carregadas.pop(chave, (None, None))
+        if atual == lido:
+            return
+        if atual is None:
+            self.backend.remover(self.tabela, self.serializar_chave(chave))
+        else:
+            self.backend.definir(self.tabela, self.serializar_chave(chave), atual)
+
+    def _obter(self, chave):
+        carregada = self._carregadas.get(chave)
+        if carregada is not None:
+            return carregada[1]
+        return self.backend.obter(self.tabela, self.serializar_chave(chave))
+
+    def __getitem__(self, chave):
+        valor = self._obter(chave)
+        if valor is None:
+            raise KeyError(chave)
+        return self.desserializar(valor)
+
+    def __setitem__(self, chave, valor):
+        carregada = self._carregadas.get(chave)
+        if carregada is not None:
+            carregada[1] = self.serializar(valor)
+        else:
+            self.backend.definir(self.tabela, self.serializar_chave(chave), self.serializar(valor))
+
+    def __delitem__(self, chave):
+        carregada = self._carregadas.get(chave)
+        if carregada is not None:
+            if carregada[1] is None:
+                raise KeyError(chave)
+            carregada[1] = None
+        elif not self.backend.remover(self.tabela, self.serializar_chave(chave)):
+            raise KeyError(chave)
+
+    def __contains__(self, chave):
+        return self._obter(chave) is not None
+
+    def __iter__(self):
+        return iter(list(self.dados))
+
+    def __len__(self):
+        return self.backend.quantidade(self.tabela)
+
+    @property
+    def dados(self):
+        """Retrato da tabela inteira numa única leitura (listagens e follow-ups)."""
+        return {self.desserializar_chave(chave): self.desserializar(valor)
+                for chave, valor in self.backend.listar(self.tabela).items()}
+
+    def items(self):
+        return self.dados.items()
+
+    def values(self):
+        return self.dados.values()
@@ -0,0 +1,148 @@
+"""
+Benchmark da API de administração do bot do Telegram (admin_telegram.py) com bancos grandes.
+
+Preenche prospects_db e contratos_db com --registros chats cada (só em memória, sem gravar
+no SQLite), agenda todos os contratos e sobe a API no event loop, como o bot faz. Para cada
+consulta (primeira página, página do meio por cursor, busca por nome, contratos com o próximo
+envio e o relatório), faz --requisicoes requisições com --concorrencia clientes e mede:
+- a latência das requisições;
+- o atraso do event loop enquanto elas rodam (uma tarefa que acorda a cada 1 ms mede quanto
+  atrasou): é o que os updates do Telegram esperariam a mais durante a consulta.
+A primeira requisição de cada listagem (e de cada busca) monta a listagem ordenada, que vale
+por admin_telegram.RETRATO_SEGUNDOS: é ela que aparece no p99; as outras só montam a página.
+Para comparação, mede o tempo de montar a listagem completa dos contratos como o antigo menu
+do CLI fazia (uma linha por contrato).
+
+Uso: python benchmarks/bench_admin.py --registros 100000 [--requisicoes 200] [--concorrencia 4] [--saida r.json]
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+sys.path.insert(0, PASTA)
+
+from cliente_http import ClienteHTTP
+from fake_telegram_api import TOKEN_FALSO
+from relatorio import resumo_latencias, salvar_resultado
+
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Heitor", "Isabela", "João"]
+SOBRENOMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Lima", "Carvalho", "Ferreira", "Almeida", "Costa"]
+
+
+def preencher(bot, registros, semente):
+    aleatorio = random.Random(semente)
+    chat_ids = aleatorio.sample(range(10 ** 6, 10 ** 10), registros)
+    nomes = [f"{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)} {n}" for n in range(registros)]
+    bot.prospects_db.dados.update(zip(chat_ids, nomes))
+    bot.contratos_db.dados.update((chat_id, {"nome": nome}) for chat_id, nome in zip(chat_ids, nomes))
+    bot.agendador.adicionar_varios(chat_ids)
+    return sorted(chat_ids)
+
+
+def listagem_cli(bot):
+    """A opção 3 do antigo menu do CLI: todos os contratos, uma linha cada."""
+    saida = io.StringIO()
+    for chat_id, data in bot.contratos_db.items():
+        proximo = bot.agendador.proxima_execucao(chat_id)
+        next_run = proximo.strftime('%Y-%m-%d %H:%M:%S') if proximo else "N/A"
+        print(f"- ID: {chat_id}, Nome: {data['nome']}, Próximo Envio: {next_run}", file=saida)
+    return saida.getvalue()
+
+
+async def medir(cliente, caminho, requisicoes, concorrencia):
+    latencias, atrasos, status = [], [], set()
+    ultimo = {}
+    rodando = True
+
+    async def relogio():
+        # Quanto cada acordar de 1 ms atrasou: o tempo que o event loop ficou ocupado
+        while rodando:
+            inicio = time.perf_counter()
+            await asyncio.sleep(0.001)
+            atrasos.append(max(0.0, time.perf_counter() - inicio - 0.001))
+
+    async def cliente_admin(quantidade):
+        for _ in range(quantidade):
+            inicio = time.perf_counter()
+            codigo, corpo = await cliente.get(caminho)
+            latencias.append(time.perf_counter() - inicio)
+            status.add(codigo)
+            ultimo["corpo"] = corpo
+
+    tarefa_relogio = asyncio.create_task(relogio())
+    await asyncio.gather(*(cliente_admin(requisicoes // concorrencia) for _ in range(concorrencia)))
+    rodando = False
+    await tarefa_relogio
+    return latencias, atrasos, status, json.loads(ultimo["corpo"])
+
+
+async def executar(bot, args, chat_ids):
+    application = bot.application = bot.montar_aplicacao(token=TOKEN_FALSO)
+    bot.ADMIN_PORTA = 0 # Porta livre escolhida pelo sistema
+    await bot.iniciar_admin(application)
+    cliente = ClienteHTTP("127.0.0.1", bot._servidor_admin.porta, conexoes=args.concorrencia)
+    consultas = {
+        "prospects, 1a pagina": "/admin/prospects?limite=50",
+        "prospects, pagina do meio": f"/admin/prospects?limite=50&depois={chat_ids[len(chat_ids) // 2]}",
+        "prospects, busca por nome": "/admin/prospects?limite=50&busca=silva%2012",
+        "contratos, 1a pagina": "/admin/contratos?limite=50",
+        "contratos, busca por nome": "/admin/contratos?limite=50&busca=costa",
+        "relatorio": "/admin/relatorio",
+    }
+    resultados = {}
+    try:
+        for nome, caminho in consultas.items():
+            latencias, atrasos, status, ultimo = await medir(cliente, caminho, args.requisicoes, args.concorrencia)
+            resumo = resumo_latencias(latencias)
+            atraso = resumo_latencias(atrasos)
+            resultados[nome] = {"latencia": resumo, "atraso_event_loop": atraso, "status": sorted(status),
+                                "total": ultimo.get("total")}
+            print(f"- {nome:<28} p50 {resumo['p50_ms']:7.1f} ms  p99 {resumo['p99_ms']:7.1f} ms  "
+                  f"atraso do event loop p99 {atraso['p99_ms']:5.1f} ms, máx {atraso['max_ms']:5.1f} ms  "
+                  f"(status {sorted(status)}, total {ultimo.get('total', '-')})", flush=True)
+    finally:
+        await cliente.fechar()
+        await bot.parar_admin(application)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--registros", type=int, default=100_000, help="Prospects e contratos (cada)")
+    parser.add_argument("--requisicoes", type=int, default=200, help="Requisições por consulta")
+    parser.add_argument("--concorrencia", type=int, default=4)
+    parser.add_argument("--semente", type=int, default=1)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON com o resultado ('-' para imprimir)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta) # O bot cria o banco local no diretório atual
+        import chatbot_telegram as bot
+        logging.getLogger().setLevel(logging.CRITICAL)
+        chat_ids = preencher(bot, args.registros, args.semente)
+
+        inicio = time.perf_counter()
+        listagem_cli(bot)
+        antes = time.perf_counter() - inicio
+        print(f"{args.registros:,} prospects e {args.registros:,} contratos. Listagem completa dos contratos "
+              f"(antigo CLI): {antes * 1000:.0f} ms. API, {args.requisicoes} requisições por consulta, "
+              f"{args.concorrencia} clientes:")
+        resultados = asyncio.run(executar(bot, args, chat_ids))
+        resultados["listagem_cli_ms"] = round(antes * 1000, 3)
+        bot.armazem.fechar()
+
+    if args.saida:
+        salvar_resultado(args.saida, "bench_admin", vars(args), resultados)
+
+
+if __name__ == "__main__":
+    main()
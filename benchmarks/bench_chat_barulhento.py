@@ -0,0 +1,213 @@
+"""
+Benchmark: um chat mandando perguntas sem parar não pode aumentar a latência dos outros.
+
+Roda o Application real do bot (ProcessadorPorChat, ConversationHandler, FAQ, limite de
+perguntas e Gemini) contra a Bot API falsa e o Gemini falso no mesmo processo. --chats
+chats "normais" fazem uma pergunta livre a cada --intervalo segundos; um chat barulhento
+cola --ritmo mensagens por segundo. Mede a latência das perguntas dos chats normais (do
+update recebido até a resposta enviada) em três cenários:
+- sem_barulho: só os chats normais (referência).
+- antes:       com o barulhento, sem limite de perguntas e com a ordem antiga do processador
+               (a vaga de update simultâneo é ocupada antes da vez do chat chegar).
+- depois:      com o barulhento, limite de perguntas por chat e global (limitador_chats.py)
+               e o ProcessadorPorChat atual.
+Perguntas sem resposta depois de --timeout segundos são contadas à parte.
+O benchmark termina com erro se, no cenário depois, algum chat normal ficar sem resposta ou o
+p95 deles passar de --tolerancia vezes o p95 sem barulho.
+
+Uso: python benchmarks/bench_chat_barulhento.py --chats 20 --intervalo 4 --ritmo 50 --duracao 20 [--tolerancia 1.5] [--saida r.json]
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+sys.path.insert(0, PASTA)
+
+from fake_gemini import FakeGemini
+from fake_telegram_api import TOKEN_FALSO, FakeTelegramAPI
+from limitador_chats import LimitadorChats
+from processador_updates import ProcessadorPorChat
+from relatorio import resumo_latencias, salvar_resultado
+from soak_conversas import update_sintetico
+
+PERGUNTA = "Conseguem integrar a planilha de estoque da loja {} com o sistema de vendas ({})?"
+BARULHENTO = 10 ** 9
+
+
+class ProcessadorAntigo(ProcessadorPorChat):
+    """Ordem anterior: ocupa a vaga de update simultâneo antes de esperar a trava do chat."""
+
+    def __init__(self, max_concurrent_updates, backend=None, **opcoes):
+        super().__init__(max_concurrent_updates, backend, **opcoes)
+        self._vagas_antes = asyncio.BoundedSemaphore(max_concurrent_updates)
+
+    async def do_process_update(self, update, coroutine):
+        # Com esta vaga ocupada, a do ProcessadorPorChat (mesmo limite) nunca precisa esperar
+        async with self._vagas_antes:
+            await super().do_process_update(update, coroutine)
+
+
+async def cenario(bot, args, api, fake, barulho, antigo, limitar):
+    bot.ProcessadorPorChat = ProcessadorAntigo if antigo else ProcessadorPorChat
+    if limitar:
+        bot.limitador_gemini = LimitadorChats(args.por_minuto_chat, args.rajada_chat,
+                                              args.por_segundo_global, args.rajada_global)
+    else:
+        bot.limitador_gemini = LimitadorChats(None, por_segundo_global=None)
+    application = bot.montar_aplicacao(token=TOKEN_FALSO, base_url=api.base_url)
+    await application.initialize()
+    processador = application.update_processor
+    ids = itertools.count(1)
+    tarefas, medidas, latencias = set(), [], []
+    chamadas_antes = fake.chamadas
+    enviadas_barulho = 0
+
+    def despachar(chat_id, texto, medir=False):
+        update = update_sintetico(application.bot, next(ids), chat_id, texto)
+
+        async def rodar():
+            inicio = time.perf_counter()
+            corrotina = application.process_update(update)
+            try:
+                await processador.process_update(update, corrotina)
+            except asyncio.CancelledError:
+                corrotina.close() # Ainda na fila do chat quando o cenário acabou
+                raise
+            if medir:
+                latencias.append(time.perf_counter() - inicio)
+
+        tarefa = asyncio.create_task(rodar())
+        tarefas.add(tarefa)
+        tarefa.add_done_callback(tarefas.discard)
+        if medir:
+            medidas.append(tarefa)
+        return tarefa
+
+    async def normal(chat_id, fim):
+        await despachar(chat_id, "/start")
+        await asyncio.sleep(random.uniform(0, args.intervalo))
+        for n in itertools.count(1):
+            if time.perf_counter() >= fim:
+                return
+            # O usuário pergunta no seu ritmo, sem esperar a resposta anterior
+            despachar(chat_id, PERGUNTA.format(chat_id, n), medir=True)
+            await asyncio.sleep(args.intervalo * random.uniform(0.8, 1.2))
+
+    async def barulhento(fim):
+        nonlocal enviadas_barulho
+        await despachar(BARULHENTO, "/start")
+        while time.perf_counter() < fim:
+            enviadas_barulho += 1
+            despachar(BARULHENTO, PERGUNTA.format("barulhenta", enviadas_barulho))
+            await asyncio.sleep(1 / args.ritmo)
+
+    fim = time.perf_counter() + args.duracao
+    grupos = [normal(chat_id, fim) for chat_id in range(1, args.chats + 1)]
+    if barulho:
+        grupos.append(barulhento(fim))
+    await asyncio.gather(*grupos)
+    await asyncio.wait(medidas, timeout=args.timeout)
+    sem_resposta = sum(1 for tarefa in medidas if not tarefa.done())
+
+    for tarefa in list(tarefas):
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    await application.shutdown()
+    return {
+        "normais": resumo_latencias(latencias),
+        "perguntas_normais": len(medidas),
+        "sem_resposta": sem_resposta,
+        "mensagens_barulhentas": enviadas_barulho,
+        "chamadas_gemini": fake.chamadas - chamadas_antes,
+        "recusadas": dict(bot.limitador_gemini.recusadas),
+    }
+
+
+async def executar(bot, args):
+    from google import genai
+    from google.genai import types
+
+    api = await FakeTelegramAPI(latencia=args.latencia_telegram).iniciar()
+    fake = await FakeGemini(latencia=args.latencia_gemini).iniciar()
+    bot.client = genai.Client(api_key="chave-falsa", http_options=types.HttpOptions(base_url=fake.base_url))
+    bot.GEMINI_STREAMING = False # A latência medida é a da resposta, sem o intervalo entre edições
+    bot.cache_gemini = type(bot.cache_gemini)()
+    resultados = {}
+    try:
+        for nome, barulho, antigo, limitar in (("sem_barulho", False, False, True),
+                                               ("antes", True, True, False),
+                                               ("depois", True, False, True)):
+            resultado = resultados[nome] = await cenario(bot, args, api, fake, barulho, antigo, limitar)
+            normais = resultado["normais"]
+            print(f"- {nome:<12} p50 {normais.get('p50_ms', 0):8.0f} ms  p95 {normais.get('p95_ms', 0):8.0f} ms  "
+                  f"p99 {normais.get('p99_ms', 0):8.0f} ms  ({resultado['perguntas_normais']} perguntas, "
+                  f"{resultado['sem_resposta']} sem resposta)  barulhentas {resultado['mensagens_barulhentas']}, "
+                  f"chamadas ao Gemini {resultado['chamadas_gemini']}, recusadas {resultado['recusadas']}", flush=True)
+    finally:
+        await fake.parar()
+        await api.parar()
+    return resultados
+
+
+def verificar(resultados, tolerancia):
+    """O barulhento não pode deixar os chats normais sem resposta nem aumentar a latência deles."""
+    referencia, depois = resultados["sem_barulho"], resultados["depois"]
+    falhas = []
+    if not depois["perguntas_normais"] or not referencia["normais"]["n"]:
+        return ["nenhuma pergunta dos chats normais medida"]
+    if depois["sem_resposta"]:
+        falhas.append(f"{depois['sem_resposta']} perguntas dos chats normais sem resposta com o barulhento")
+    limite = referencia["normais"]["p95_ms"] * tolerancia
+    if depois["normais"].get("p95_ms", float("inf")) > limite:
+        falhas.append(f"p95 dos chats normais com o barulhento {depois['normais'].get('p95_ms', 0):.0f} ms, "
+                      f"acima de {limite:.0f} ms ({tolerancia:g}x sem barulho)")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=20, help="Chats normais")
+    parser.add_argument("--intervalo", type=float, default=4.0, help="Segundos entre as perguntas de um chat normal")
+    parser.add_argument("--ritmo", type=float, default=50.0, help="Mensagens por segundo do chat barulhento")
+    parser.add_argument("--duracao", type=float, default=20.0)
+    parser.add_argument("--timeout", type=float, default=10.0, help="Espera pelas últimas respostas")
+    parser.add_argument("--latencia-gemini", type=float, default=1.0)
+    parser.add_argument("--latencia-telegram", type=float, default=0.02)
+    parser.add_argument("--por-minuto-chat", type=float, default=30)
+    parser.add_argument("--rajada-chat", type=int, default=3)
+    parser.add_argument("--por-segundo-global", type=float, default=20)
+    parser.add_argument("--rajada-global", type=int, default=40)
+    parser.add_argument("--tolerancia", type=float, default=1.5,
+                        help="Máximo do p95 dos chats normais com o barulhento, em vezes o p95 sem barulho")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON com o resultado ('-' para imprimir)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta) # O bot cria o banco local no diretório atual
+        import chatbot_telegram as bot
+        logging.getLogger().setLevel(logging.CRITICAL)
+        print(f"{args.chats} chats perguntando a cada {args.intervalo:g} s, barulhento a {args.ritmo:g} msgs/s, "
+              f"Gemini com {args.latencia_gemini * 1000:.0f} ms, {args.duracao:g} s por cenário:")
+        resultados = asyncio.run(executar(bot, args))
+        bot.armazem.fechar()
+
+    falhas = verificar(resultados, args.tolerancia)
+    resultados["falhas"] = falhas
+    for falha in falhas:
+        print(f"FALHOU: {falha}")
+    if args.saida:
+        salvar_resultado(args.saida, "bench_chat_barulhento", vars(args), resultados)
+    if falhas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
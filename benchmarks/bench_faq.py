@@ -0,0 +1,113 @@
+"""
+Benchmark e verificação do índice local de FAQ (indice_faq.py).
+
+1. Classificação: perguntas que devem receber a resposta local de uma entrada do faq.json
+   (paráfrases, erros de digitação, sem acento) e perguntas parecidas que devem seguir para
+   o Gemini ("qual o valor do dólar hoje" lembra "qual o valor", mas não é sobre a ITAC).
+   Cada pergunta mostra o score e as palavras desconhecidas; qualquer erro faz o benchmark
+   terminar com erro.
+2. Tempo por pergunta de IndiceFAQ.responder (o que o bot executa antes de chamar o Gemini).
+
+Uso: python benchmarks/bench_faq.py [--repeticoes 2000] [--saida r.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+sys.path.insert(0, PASTA)
+
+from indice_faq import CAMINHO_FAQ, IndiceFAQ
+from relatorio import resumo_latencias, salvar_resultado
+
+# (pergunta, primeira variação da entrada esperada no faq.json)
+POSITIVAS = [
+    ("o que vocês fazem?", "o que vocês fazem"),
+    ("quais são os serviços", "o que vocês fazem"),
+    ("quanto custa?", "quanto custa"),
+    ("quanto custa o sistema", "quanto custa"),
+    ("quanto custa um sistema?", "quanto custa"),
+    ("qual o preço de vocês", "quanto custa"),
+    ("qual o valor do serviço", "quanto custa"),
+    ("QUAL O PRECO", "quanto custa"),
+    ("preciso de suporte urgente", "preciso de suporte"),
+    ("meu sistema parou de funcionar", "preciso de suporte"),
+    ("estou com problema no sistema", "preciso de suporte"),
+    ("quero falar com um atendente", "quero falar com um consultor"),
+    ("quero falar com uma pessoa por favor", "quero falar com um consultor"),
+    ("o que é API", "o que é uma API"),
+    ("para que serve uma API?", "o que é uma API"),
+    ("como automatizar minha empresa?", "o que é automação de processos"),
+    ("automatizar tarefas repetitivas", "o que é automação de processos"),
+]
+
+# Perguntas que devem seguir para o Gemini (parecidas com o FAQ, mas sobre outra coisa)
+NEGATIVAS = [
+    "qual o valor do dólar hoje",
+    "quanto custa um iphone",
+    "qual o preço da gasolina",
+    "qual o valor nutricional do ovo",
+    "vocês fazem bolo?",
+    "o que é uma pessoa jurídica",
+    "problema de matemática",
+    "Como um sistema sob medida ajudaria a empresa 42 a vender mais?",
+]
+
+
+def classificar(indice, entradas):
+    """Confere cada pergunta; retorna (linhas do relatório, quantidade de erros)."""
+    resposta_de = {e["perguntas"][0]: e["resposta"] for e in entradas}
+    linhas, erros = [], 0
+    casos = [(p, resposta_de[esperada]) for p, esperada in POSITIVAS] + [(p, None) for p in NEGATIVAS]
+    for pergunta, esperada in casos:
+        entrada, score = indice.buscar(pergunta)
+        desconhecidas = indice.palavras_desconhecidas(pergunta, entrada) if entrada is not None else []
+        obtida = indice.responder(pergunta)
+        ok = obtida == esperada
+        erros += not ok
+        linhas.append({"pergunta": pergunta, "esperado": "faq" if esperada else "gemini",
+                       "score": round(score, 3), "desconhecidas": desconhecidas, "ok": ok})
+    return linhas, erros
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    parser.add_argument("--saida", help="grava o resultado em JSON")
+    args = parser.parse_args()
+
+    with open(CAMINHO_FAQ, encoding="utf-8") as f:
+        entradas = json.load(f)
+    indice = IndiceFAQ.construir(entradas)
+
+    linhas, erros = classificar(indice, entradas)
+    print(f"{'':2} {'esperado':8} {'score':>5}  pergunta")
+    for linha in linhas:
+        marca = "ok" if linha["ok"] else "X"
+        extra = f"  (desconhecidas: {', '.join(linha['desconhecidas'])})" if linha["desconhecidas"] else ""
+        print(f"{marca:2} {linha['esperado']:8} {linha['score']:5.2f}  {linha['pergunta']}{extra}")
+
+    perguntas = [p for p, _ in POSITIVAS] + NEGATIVAS
+    tempos = []
+    for i in range(args.repeticoes):
+        pergunta = perguntas[i % len(perguntas)]
+        inicio = time.perf_counter()
+        indice.responder(pergunta)
+        tempos.append(time.perf_counter() - inicio)
+    latencia = resumo_latencias(tempos)
+    print(f"\nresponder: p50 {latencia['p50_ms']:.3f} ms, p95 {latencia['p95_ms']:.3f} ms ({args.repeticoes} perguntas)")
+
+    if args.saida:
+        salvar_resultado(args.saida, "faq", vars(args), {"erros": erros, "perguntas": linhas, "responder": latencia})
+
+    if erros:
+        print(f"\nFALHOU: {erros} pergunta(s) classificada(s) errado.")
+        sys.exit(1)
+    print(f"\nOK: {len(linhas)} perguntas classificadas corretamente.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark do despacho do fluxo de conversa compilado (fluxo.json).
+
+Mede o custo de texto -> intenção -> resposta pré-montada por mensagem, com o
+fluxo real e com um fluxo inflado com centenas de ramos extras (o custo deve
+ficar praticamente igual, já que a busca é por dicionário).
+
+Uso: python benchmarks/bench_fluxo.py --repeticoes 200000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fluxo_conversa import CAMINHO_FLUXO, FluxoCompilado, TELEGRAM, WHATSAPP
+
+ENTRADAS = ["Olá", "menu", "sou_cliente", "Suporte SLA", "contratual",
+            "Ainda Não Sou Cliente", "  AINDA NAO sou cliente!  ", "qualquer outra coisa"]
+
+
+def inflar(definicao, ramos):
+    """Copia o fluxo adicionando 'ramos' nós extras pendurados no menu."""
+    definicao = json.loads(json.dumps(definicao))
+    for n in range(ramos):
+        definicao["nos"][f"ramo_{n}"] = {"texto": f"Resposta do ramo {n}", "gatilhos": [f"assunto extra {n}"]}
+        definicao["nos"]["menu"]["opcoes"].append({"id": f"ramo_{n}", "titulo": f"Ramo {n}"})
+    return definicao
+
+
+def medir(fluxo, repeticoes):
+    def despachar():
+        for texto in ENTRADAS:
+            intencao = fluxo.intencao(texto) or fluxo.fallback
+            if intencao is not None:
+                fluxo.resposta(intencao)
+
+    segundos = timeit.timeit(despachar, number=repeticoes)
+    return segundos / (repeticoes * len(ENTRADAS)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=200000)
+    args = parser.parse_args()
+
+    with open(CAMINHO_FLUXO, encoding="utf-8") as f:
+        definicao = json.load(f)
+
+    for canal in (WHATSAPP, TELEGRAM):
+        for ramos in (0, 500):
+            fluxo = FluxoCompilado(inflar(definicao, ramos) if ramos else definicao, canal)
+            print(f"- {canal:<9} {len(fluxo.respostas):4d} nós: {medir(fluxo, args.repeticoes):6.3f} µs/mensagem")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Fuzz e micro-benchmark da formatação das respostas do Gemini (formatacao_telegram.py).
+
+1. Corpus (corpus_formatacao.json) e fuzz: respostas difíceis do modelo (marcadores sem
+   par, aninhados, HTML no texto, blocos de código sem fechar, emojis, textos enormes) e
+   --fuzz textos aleatórios montados com os mesmos pedaços. Cada resultado é conferido:
+   - toda mensagem tem de 1 a 4096 caracteres (UTF-16, como o Telegram conta; --limite
+     menor força as divisões com textos curtos) e algum texto visível além de espaços;
+   - o HTML é aceito pelo Telegram: só as tags suportadas, bem aninhadas e fechadas, e
+     '<', '>' e '&' do texto escapados;
+   - nenhuma letra ou número se perde nem muda de ordem (comparando o texto sem as tags);
+   - cortar (texto puro das edições do streaming) cabe no limite e é o começo do texto.
+   Qualquer falha é mostrada e o benchmark termina com erro.
+2. Tempo por resposta: típica (~1 KB), longa (~12 KB, várias mensagens) e o corpus inteiro.
+
+Uso: python benchmarks/bench_formatacao.py --fuzz 20000 [--limite 300] [--repeticoes 2000] [--saida r.json]
+"""
+import argparse
+import html
+import json
+import os
+import random
+import re
+import sys
+import time
+from html.parser import HTMLParser
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+sys.path.insert(0, PASTA)
+
+from formatacao_telegram import LIMITE_MENSAGEM, cortar, formatar_resposta
+from relatorio import resumo_latencias, salvar_resultado
+
+PEDACOS_FUZZ = ["*", "**", "***", "_", "__", "`", "```", "```python", "~~", "[", "]", "(", ")", "](",
+                "https://itac.com.br/a_b", "<", ">", "&", "&amp;", "#", "## ", "- ", "* ", "\n", "\n\n",
+                "\r\n", " ", " ", " ", "palavra", "ação", "snake_case", "2*3", "😊", "👨‍👩‍👧", "R$ 1.000,00"]
+
+# Tags do HTML do Telegram que a formatação gera, com os atributos permitidos
+TAGS_PERMITIDAS = {"b": (), "i": (), "s": (), "a": ("href",), "code": ("class",), "pre": ()}
+_RE_PALAVRA = re.compile(r"[^\W_]+")
+_RE_CERCA = re.compile(r"^[^\S\n]*```[\w+#.-]{0,30}[^\S\n]*$", re.MULTILINE)
+_RE_ENTIDADE_INVALIDA = re.compile(r"&(?!(?:amp|lt|gt|quot);)")
+
+
+def tamanho_utf16(texto):
+    return len(texto.encode("utf-16-le")) // 2
+
+
+class VerificadorHTML(HTMLParser):
+    """
+    Confere as tags como o Telegram: suportadas, bem aninhadas, nada dentro de code/pre além de
+    code. Guarda o texto como o usuário vê, com o endereço de cada link logo depois do rótulo.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.pilha = []
+        self.erros = []
+        self.texto = []
+        self.enderecos = []
+
+    def handle_starttag(self, tag, atributos):
+        if tag not in TAGS_PERMITIDAS:
+            self.erros.append(f"tag não suportada <{tag}>")
+        elif any(nome not in TAGS_PERMITIDAS[tag] for nome, _ in atributos):
+            self.erros.append(f"atributo não suportado em <{tag}>: {atributos}")
+        if self.pilha and self.pilha[-1] in ("code", "pre") and not (self.pilha[-1] == "pre" and tag == "code"):
+            self.erros.append(f"<{tag}> dentro de <{self.pilha[-1]}>")
+        self.pilha.append(tag)
+        if tag == "a":
+            self.enderecos.append(dict(atributos).get("href", ""))
+
+    def handle_endtag(self, tag):
+        if not self.pilha or self.pilha[-1] != tag:
+            self.erros.append(f"</{tag}> fora de ordem (abertas: {self.pilha})")
+        else:
+            self.pilha.pop()
+            if tag == "a":
+                self.texto.append(" " + html.escape(self.enderecos.pop())) # Volta ao texto ainda escapado
+
+    def handle_data(self, dados):
+        self.texto.append(dados)
+
+    def handle_entityref(self, nome):
+        if nome not in ("amp", "lt", "gt", "quot"):
+            self.erros.append(f"entidade &{nome};")
+        self.texto.append(f"&{nome};")
+
+
+def verificar(texto, mensagens, limite=LIMITE_MENSAGEM):
+    """Lista de problemas da formatação de 'texto' (vazia = ok)."""
+    erros, vistos = [], []
+    for numero, mensagem in enumerate(mensagens, 1):
+        tamanho = tamanho_utf16(mensagem)
+        if not 1 <= tamanho <= limite:
+            erros.append(f"mensagem {numero} com {tamanho} caracteres")
+        sem_tags = re.sub(r"</?(?:b|i|s|code|pre|a)(?: [^>]*)?>", "", mensagem)
+        if "<" in sem_tags or ">" in sem_tags or _RE_ENTIDADE_INVALIDA.search(sem_tags):
+            erros.append(f"mensagem {numero} com '<', '>' ou '&' sem escape")
+        verificador = VerificadorHTML()
+        verificador.feed(mensagem)
+        verificador.close()
+        if verificador.pilha:
+            verificador.erros.append(f"tags sem fechar: {verificador.pilha}")
+        erros.extend(f"mensagem {numero}: {erro}" for erro in verificador.erros)
+        vistos.append("".join(verificador.texto))
+        if not html.unescape(vistos[-1]).strip():
+            erros.append(f"mensagem {numero} sem texto visível")
+    # As letras e números do texto têm que aparecer todos, na mesma ordem (o endereço de um link
+    # conta logo depois do rótulo). Não contam a linha que abre um bloco de código (com a
+    # linguagem) e os espaços (uma palavra maior que uma mensagem é cortada)
+    esperado = "".join(_RE_PALAVRA.findall(_RE_CERCA.sub("", texto)))
+    if not mensagens and esperado:
+        erros.append("texto com conteúdo virou nenhuma mensagem")
+    obtido = "".join(_RE_PALAVRA.findall(html.unescape(" ".join(vistos))))
+    if esperado != obtido:
+        erros.append(f"texto diferente: esperados {len(esperado)} caracteres, obtidos {len(obtido)}")
+    return erros
+
+
+def texto_fuzz(aleatorio, base):
+    partes = [aleatorio.choice(PEDACOS_FUZZ) for _ in range(aleatorio.randrange(1, 300))]
+    if aleatorio.random() < 0.3:
+        # Mutação de uma resposta do corpus: pedaços inseridos em posições aleatórias
+        texto = aleatorio.choice(base)
+        for parte in partes[:20]:
+            posicao = aleatorio.randrange(len(texto) + 1)
+            texto = texto[:posicao] + parte + texto[posicao:]
+        return texto
+    return "".join(partes)
+
+
+def resposta_longa(corpus):
+    """~12 KB: parágrafos do corpus repetidos, um bloco de código grande e uma 'palavra' de 5000 caracteres."""
+    # Sem as respostas com ```: um bloco sem fechar engoliria o resto
+    paragrafos = [item["texto"] for item in corpus if item["texto"].strip() and "```" not in item["texto"]] * 6
+    codigo = "```python\n" + "\n".join(f"linha_{n} = valor * {n}  # <comentário & {n}>" for n in range(120)) + "\n```"
+    return "\n\n".join(paragrafos[:40] + [codigo, "x" * 5000])
+
+
+def medir(textos, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        for texto in textos:
+            inicio = time.perf_counter()
+            formatar_resposta(texto)
+            tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fuzz", type=int, default=20_000, help="Textos aleatórios conferidos")
+    parser.add_argument("--limite", type=int, default=LIMITE_MENSAGEM, help="Tamanho máximo das mensagens no fuzz")
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    parser.add_argument("--semente", type=int, default=1)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON com o resultado ('-' para imprimir)")
+    args = parser.parse_args()
+
+    with open(os.path.join(PASTA, "corpus_formatacao.json"), encoding="utf-8") as f:
+        corpus = json.load(f)
+    longa = resposta_longa(corpus)
+
+    # 1. Corpus e fuzz
+    falhas = []
+    casos = [(item["nome"], item["texto"]) for item in corpus] + [("longa", longa)]
+    aleatorio = random.Random(args.semente)
+    base = [texto for _, texto in casos]
+    casos += [(f"fuzz_{n}", texto_fuzz(aleatorio, base)) for n in range(args.fuzz)]
+    for nome, texto in casos:
+        erros = verificar(texto, formatar_resposta(texto, args.limite), args.limite)
+        # Texto puro cortado no streaming: cabe no limite e é o começo do texto
+        cortado = cortar(texto, args.limite)
+        if tamanho_utf16(cortado) > args.limite or not texto.startswith(cortado):
+            erros.append(f"cortar: {tamanho_utf16(cortado)} unidades UTF-16 ou não é o início do texto")
+        if erros:
+            falhas.append({"nome": nome, "texto": texto[:300], "erros": erros[:5]})
+    print(f"- Corpus ({len(corpus)} respostas + 1 longa) e fuzz ({args.fuzz:,} textos): {len(falhas)} falhas")
+    for falha in falhas[:10]:
+        print(f"    {falha['nome']}: {falha['erros']}  texto={falha['texto']!r}")
+
+    # 2. Tempo por resposta
+    tipica = next(item["texto"] for item in corpus if item["nome"] == "resposta_tipica")
+    cenarios = {
+        f"tipica ({len(tipica)} caracteres)": medir([tipica], args.repeticoes),
+        f"longa ({len(longa)} caracteres, {len(formatar_resposta(longa))} mensagens)": medir([longa], max(1, args.repeticoes // 10)),
+        f"corpus ({len(corpus)} respostas)": medir([item["texto"] for item in corpus], max(1, args.repeticoes // 10)),
+    }
+    resultados = {"falhas": falhas}
+    for nome, tempos in cenarios.items():
+        resumo = resultados[nome.split(" ")[0]] = resumo_latencias(tempos)
+        print(f"- {nome:<44} média {resumo['media_ms'] * 1000:7.1f} µs  p99 {resumo['p99_ms'] * 1000:7.1f} µs")
+
+    if args.saida:
+        salvar_resultado(args.saida, "bench_formatacao", vars(args), resultados)
+    if falhas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark do tempo de inicialização do bot do Telegram (chatbot_telegram.py).
+
+1. Importação: roda 'python -X importtime -c "import chatbot_telegram"' em processos novos
+   (--repeticoes vezes, num diretório temporário, pois o bot cria o banco local no diretório
+   atual) e mostra o tempo total e, por módulo, a mediana do tempo acumulado (com o que ele
+   importa) e do tempo próprio. Os módulos listados são as dependências diretas do bot e os
+   de maior tempo próprio.
+2. Primeiro uso: num processo novo, o tempo de importar, de montar o Application e de cada
+   dependência carregada sob demanda (cliente do Gemini e índice de FAQ), que é o que
+   AQUECER_NA_INICIALIZACAO antecipa.
+
+Com --saida, o JSON pode ser comparado entre versões com comparar_resultados.py; com
+--limite-ms, o benchmark falha se a mediana da importação passar do limite (regressão).
+
+Uso: python benchmarks/bench_inicializacao.py --repeticoes 5 [--top 15] [--limite-ms 500] [--saida r.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, PASTA)
+
+from relatorio import RAIZ, resumo_latencias, salvar_resultado
+
+MODULO = "chatbot_telegram"
+
+PRIMEIRO_USO = """
+import json, time
+inicio = time.perf_counter()
+import chatbot_telegram as bot
+from fake_telegram_api import TOKEN_FALSO
+tempos = {"importacao": time.perf_counter() - inicio}
+inicio = time.perf_counter()
+bot.montar_aplicacao(token=TOKEN_FALSO)
+tempos["montar_aplicacao"] = time.perf_counter() - inicio
+inicio = time.perf_counter()
+bot.obter_cliente_gemini()
+bot._config_gemini()
+tempos["cliente_gemini"] = time.perf_counter() - inicio
+inicio = time.perf_counter()
+bot.obter_indice_faq()
+tempos["indice_faq"] = time.perf_counter() - inicio
+bot.armazem.fechar()
+print(json.dumps(tempos))
+"""
+
+
+def ambiente():
+    variaveis = dict(os.environ)
+    variaveis["PYTHONPATH"] = os.pathsep.join([RAIZ, PASTA, variaveis.get("PYTHONPATH", "")])
+    variaveis.setdefault("GOOGLE_API_KEY", "chave-falsa") # O cliente é criado, mas nenhuma chamada é feita
+    variaveis["CHATBOT_LOG_NIVEL"] = "WARNING"
+    return variaveis
+
+
+def ler_importtime(saida, modulo):
+    """
+    Linhas do -X importtime -> (microssegundos totais do módulo, {nome: (próprio, acumulado)},
+    nomes das dependências diretas). Cada módulo aparece depois dos que ele importa, com um
+    nível de recuo a mais por nível de importação.
+    """
+    linhas = []
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        nivel = (len(nome) - len(nome.lstrip(" ")) - 1) // 2
+        linhas.append((nome.strip(), nivel, int(proprio), int(acumulado)))
+
+    posicao = next(i for i, (nome, nivel, _, _) in enumerate(linhas) if nome == modulo and nivel == 0)
+    # As importações do módulo são as linhas logo antes dele, até a anterior de nível 0
+    inicio = posicao
+    while inicio > 0 and linhas[inicio - 1][1] > 0:
+        inicio -= 1
+    dependencias = [nome for nome, nivel, _, _ in linhas[inicio:posicao] if nivel == 1]
+    modulos = {nome: (proprio, acumulado) for nome, _, proprio, acumulado in linhas[inicio:posicao + 1]}
+    return linhas[posicao][3], modulos, dependencias
+
+
+def medir_importacao(repeticoes, modulo):
+    totais, processos, por_modulo, dependencias = [], [], {}, []
+    with tempfile.TemporaryDirectory() as pasta:
+        for _ in range(repeticoes):
+            codigo = f"import time; t = time.perf_counter(); import {modulo}; print(time.perf_counter() - t)"
+            resultado = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=pasta,
+                                       env=ambiente(), capture_output=True, text=True, check=True)
+            total, modulos, dependencias = ler_importtime(resultado.stderr, modulo)
+            totais.append(total / 1e6)
+            processos.append(float(resultado.stdout.strip().splitlines()[-1]))
+            for nome, tempos in modulos.items():
+                por_modulo.setdefault(nome, []).append(tempos)
+    medianas = {
+        nome: (statistics.median(t[0] for t in tempos) / 1000, statistics.median(t[1] for t in tempos) / 1000)
+        for nome, tempos in por_modulo.items()
+    }
+    return totais, processos, medianas, dependencias
+
+
+def medir_primeiro_uso():
+    with tempfile.TemporaryDirectory() as pasta:
+        resultado = subprocess.run([sys.executable, "-c", PRIMEIRO_USO], cwd=pasta, env=ambiente(),
+                                   capture_output=True, text=True, check=True)
+    return json.loads(resultado.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Módulos mostrados em cada lista")
+    parser.add_argument("--limite-ms", type=float, default=None, help="Falha se a mediana da importação passar disto")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON com o resultado ('-' para imprimir)")
+    args = parser.parse_args()
+
+    totais, processos, medianas, dependencias = medir_importacao(args.repeticoes, MODULO)
+    importacao = resumo_latencias(totais)
+    print(f"import {MODULO}: mediana {importacao['p50_ms']:.0f} ms (importtime), "
+          f"{statistics.median(processos) * 1000:.0f} ms medidos no processo, {args.repeticoes} processos novos")
+
+    print(f"- Dependências diretas (acumulado / próprio):")
+    diretas = sorted(dependencias, key=lambda nome: medianas[nome][1], reverse=True)
+    for nome in diretas[:args.top]:
+        print(f"    {nome:<32} {medianas[nome][1]:8.1f} ms  {medianas[nome][0]:7.1f} ms")
+    print(f"- Maior tempo próprio:")
+    for nome, (proprio, acumulado) in sorted(medianas.items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+        print(f"    {nome:<32} {proprio:8.1f} ms")
+    pesados = [nome for nome in ("google.genai", "numpy") if nome in medianas]
+    print(f"- Carregados na importação: {', '.join(pesados) or 'nem google.genai nem numpy'}")
+
+    primeiro_uso = medir_primeiro_uso()
+    print("- Primeiro uso (processo novo): " + ", ".join(
+        f"{etapa} {segundos * 1000:.0f} ms" for etapa, segundos in primeiro_uso.items()))
+
+    erros = []
+    if args.limite_ms is not None and importacao["p50_ms"] > args.limite_ms:
+        erros.append(f"importação em {importacao['p50_ms']:.0f} ms (limite: {args.limite_ms:g} ms)")
+    if args.saida:
+        salvar_resultado(args.saida, "bench_inicializacao", vars(args), {
+            "importacao": importacao,
+            "importacao_processo": resumo_latencias(processos),
+            "modulos": {nome: {"p50_ms": round(medianas[nome][1], 3), "proprio_ms": round(medianas[nome][0], 3)}
+                        for nome in diretas},
+            "primeiro_uso_ms": {etapa: round(segundos * 1000, 3) for etapa, segundos in primeiro_uso.items()},
+            "erros": erros,
+        })
+    if erros:
+        print("FALHOU: " + "; ".join(erros))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
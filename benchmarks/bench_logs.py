@@ -0,0 +1,166 @@
+"""
+Benchmark do custo dos logs por mensagem, antes e depois do pipeline com fila (logs_estruturados.py).
+
+Mede o tempo que os logs tiram da thread que trata a mensagem (trabalhador da fila do
+WhatsApp / event loop do Telegram), com várias threads registrando ao mesmo tempo:
+- antes_whatsapp: os 4 print() que o enviar_mensagem fazia a cada envio simulado.
+- antes_telegram: logging.basicConfig (StreamHandler) e um logger.info com f-string.
+- depois_info:    pipeline com fila, nível INFO: um logger.info estruturado por mensagem e
+                  o logger.debug da duração desligado.
+- depois_debug:   pipeline com fila, nível DEBUG com amostragem de 1 a cada 100.
+A saída é um arquivo; com --lento-ms cada escrita demora esse tempo, como um terminal lento
+ou um disco ocupado. No fim, mostra quanto tempo a thread de escrita levou para esvaziar a fila
+e o que aconteceu quando ela encheu (as threads registram sem parar, mais rápido do que a
+escrita consegue acompanhar): DEBUG é descartado, INFO ou acima é escrito direto por quem
+registrou. Nenhuma linha INFO pode se perder: se faltar alguma, o benchmark termina com erro.
+
+Uso: python benchmarks/bench_logs.py --mensagens 20000 --threads 4 [--lento-ms 0.2]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logs_estruturados import configurar_logs, logs_descartados, logs_escritos_direto, parar_logs
+
+PAYLOAD = {"messaging_product": "whatsapp", "to": "5541987654321", "type": "text",
+           "text": {"body": "Olá! Sou o assistente virtual da ITAC. Como posso ajudar?"}}
+
+
+class SaidaLenta(io.TextIOBase):
+    """
+    Arquivo em que cada escrita demora 'atraso' segundos. As escritas são serializadas, como
+    num terminal: o TextIOWrapper não é seguro entre threads (os print() simultâneos do
+    antes_whatsapp corrompiam os bytes UTF-8 no arquivo).
+    """
+
+    def __init__(self, arquivo, atraso):
+        self.arquivo = arquivo
+        self.atraso = atraso
+        self._lock = threading.Lock()
+
+    def write(self, texto):
+        with self._lock:
+            if self.atraso:
+                time.sleep(self.atraso)
+            return self.arquivo.write(texto)
+
+    def flush(self):
+        with self._lock:
+            self.arquivo.flush()
+
+
+def antes_whatsapp(logger, numero, n):
+    destinatario = f"55419{numero:08d}"
+    print("\n--- AVISO: O token e URL da API não são reais. Apenas simulando o envio. ---")
+    print(f"\n[SIMULAÇÃO DE ENVIO] -> Para: {destinatario}")
+    print("[SIMULAÇÃO DE ENVIO] -> Tipo: Texto")
+    print(f"[SIMULAÇÃO DE ENVIO] -> Conteúdo: {PAYLOAD}")
+
+
+def antes_telegram(logger, numero, n):
+    logger.info(f"Follow-up enviado para o ID: {numero}")
+
+
+def depois(logger, numero, n):
+    logger.info("Follow-up enviado", extra={"chat_id": numero})
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Update tratado", extra={"chat_id": numero, "estado": "menu_principal",
+                                              "handler": "menu_principal_handler", "duracao_ms": 1.23})
+
+
+def medir(funcao, logger, mensagens, threads):
+    por_thread = mensagens // threads
+    tempos = [[] for _ in range(threads)]
+
+    def trabalhador(indice):
+        lista = tempos[indice]
+        for n in range(por_thread):
+            inicio = time.perf_counter()
+            funcao(logger, indice * por_thread + n, n)
+            lista.append(time.perf_counter() - inicio)
+
+    grupo = [threading.Thread(target=trabalhador, args=(i,)) for i in range(threads)]
+    inicio = time.perf_counter()
+    for thread in grupo:
+        thread.start()
+    for thread in grupo:
+        thread.join()
+    total = time.perf_counter() - inicio
+    todos = sorted(t for lista in tempos for t in lista)
+    return {
+        "media_us": sum(todos) / len(todos) * 1e6,
+        "p99_us": todos[int(len(todos) * 0.99)] * 1e6,
+        "msgs_por_s": len(todos) / total,
+        "mensagens": len(todos),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mensagens", type=int, default=20_000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--lento-ms", type=float, default=0.0, help="Atraso de cada escrita na saída")
+    args = parser.parse_args()
+    atraso = args.lento_ms / 1000
+
+    logger = logging.getLogger("bench_logs")
+    stderr_original = sys.stderr
+    print(f"{args.mensagens:,} mensagens, {args.threads} threads, escrita de {args.lento_ms:g} ms:")
+    perdidas = 0
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome in ("antes_whatsapp", "antes_telegram", "depois_info", "depois_debug"):
+            arquivo = open(os.path.join(pasta, f"{nome}.log"), "w", encoding="utf-8")
+            saida = SaidaLenta(arquivo, atraso)
+            drenagem = 0.0
+            if nome == "antes_whatsapp":
+                with contextlib.redirect_stdout(saida):
+                    resultado = medir(antes_whatsapp, logger, args.mensagens, args.threads)
+            elif nome == "antes_telegram":
+                parar_logs()
+                raiz = logging.getLogger()
+                for handler in list(raiz.handlers):
+                    raiz.removeHandler(handler)
+                logging.basicConfig(stream=saida, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                                    level=logging.INFO, force=True)
+                resultado = medir(antes_telegram, logger, args.mensagens, args.threads)
+            else:
+                sys.stderr = saida # configurar_logs escreve no stderr quando não há arquivo
+                nivel = "DEBUG" if nome == "depois_debug" else "INFO"
+                configurar_logs(nivel, formato_json=True, amostragem_debug=100)
+                sys.stderr = stderr_original
+                resultado = medir(depois, logger, args.mensagens, args.threads)
+                inicio = time.perf_counter()
+                parar_logs() # Espera a thread de escrita esvaziar a fila
+                drenagem = time.perf_counter() - inicio
+            arquivo.close()
+            with open(os.path.join(pasta, f"{nome}.log"), "rb") as f:
+                linhas = f.read().count(b"\n")
+            extra = ""
+            if drenagem:
+                extra = (f", fila esvaziada {drenagem:.2f} s depois, {logs_escritos_direto()} escritos direto, "
+                         f"{logs_descartados()} DEBUG descartados")
+                # Uma linha INFO por mensagem (as de DEBUG são amostradas ou descartadas)
+                with open(os.path.join(pasta, f"{nome}.log"), "rb") as f:
+                    faltam = resultado["mensagens"] - f.read().count(b'"nivel": "INFO"')
+                if faltam:
+                    perdidas += faltam
+                    extra += f", FALTAM {faltam:,} linhas INFO"
+            print(f"- {nome:<15} média {resultado['media_us']:8.1f} µs  p99 {resultado['p99_us']:8.1f} µs  "
+                  f"{resultado['msgs_por_s']:>10,.0f} msgs/s  ({linhas:,} linhas{extra})")
+
+
+    if perdidas:
+        print(f"\nFALHOU: {perdidas:,} linhas INFO perdidas.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark da memória das conversas com o Gemini (memoria_conversa.py).
+
+1. Bytes por chat ativo (tracemalloc) com o histórico cheio até o orçamento de tokens,
+   comparando com a representação ingênua (lista de dicts {"role", "text"} por chat).
+2. Memória estável: 3x mais chats distintos que o limite do LRU; a memória medida a cada
+   lote deve parar de crescer quando o limite é atingido.
+3. Custo por mensagem de historico() + registrar().
+
+Uso: python benchmarks/bench_memoria_conversa.py --chats 100000 --trocas 6
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memoria_conversa import MemoriaConversas
+
+PERGUNTAS = [
+    "Quanto tempo leva para desenvolver um sistema de gestão para a minha loja?",
+    "E se eu quiser integrar com o sistema da minha contabilidade?",
+    "Vocês fazem aplicativo para celular também?",
+    "Como funciona o suporte depois que o sistema estiver pronto?",
+]
+RESPOSTA = ("Ótima pergunta! Cada projeto é único: primeiro entendemos os processos do seu negócio, "
+            "depois desenhamos a solução e entregamos em etapas curtas, com você validando cada uma. ") * 8
+
+
+def preencher(memoria, chats, trocas, inicio=0):
+    for chat_id in range(inicio, inicio + chats):
+        for n in range(trocas):
+            memoria.registrar(chat_id, PERGUNTAS[n % len(PERGUNTAS)] + f" ({chat_id})", f"{RESPOSTA} ({chat_id})")
+
+
+def preencher_ingenuo(historicos, chats, trocas):
+    for chat_id in range(chats):
+        historico = historicos.setdefault(chat_id, [])
+        for n in range(trocas):
+            historico.append({"role": "user", "text": PERGUNTAS[n % len(PERGUNTAS)] + f" ({chat_id})"})
+            historico.append({"role": "model", "text": f"{RESPOSTA} ({chat_id})"})
+
+
+def medir_alocado(funcao):
+    gc.collect()
+    tracemalloc.start()
+    objeto = funcao()
+    gc.collect()
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return atual, objeto
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=100_000)
+    parser.add_argument("--trocas", type=int, default=6, help="Perguntas por chat (o orçamento descarta as antigas)")
+    parser.add_argument("--orcamento", type=int, default=1000, help="Tokens de histórico por chat")
+    args = parser.parse_args()
+
+    # 1. Bytes por chat ativo
+    def compacta():
+        memoria = MemoriaConversas(orcamento_tokens=args.orcamento, max_chats=args.chats, max_bytes=1 << 40)
+        preencher(memoria, args.chats, args.trocas)
+        return memoria
+
+    def ingenua():
+        historicos = {}
+        preencher_ingenuo(historicos, args.chats, args.trocas)
+        return historicos
+
+    bytes_compacta, memoria = medir_alocado(compacta)
+    trocas_por_chat = len(memoria.historico(0))
+    del memoria
+    bytes_ingenua, historicos = medir_alocado(ingenua)
+    del historicos
+    print(f"{args.chats:,} chats, {args.trocas} perguntas cada (resposta de {len(RESPOSTA)} caracteres):")
+    print(f"- MemoriaConversas: {bytes_compacta / args.chats:8,.0f} bytes/chat "
+          f"({trocas_por_chat} trocas guardadas, orçamento de {args.orcamento} tokens)")
+    print(f"- lista de dicts:   {bytes_ingenua / args.chats:8,.0f} bytes/chat (histórico completo, sem limite)")
+
+    # 2. Memória estável com 3x mais chats que o limite
+    limite = args.chats // 2
+    memoria = MemoriaConversas(orcamento_tokens=args.orcamento, max_chats=limite, max_bytes=1 << 40)
+    gc.collect()
+    tracemalloc.start()
+    lote = max(1, limite // 2)
+    print(f"- LRU com limite de {limite:,} chats:")
+    for inicio in range(0, limite * 3, lote):
+        preencher(memoria, lote, 2, inicio)
+        print(f"    {inicio + lote:>9,} chats distintos -> {tracemalloc.get_traced_memory()[0] / 2**20:7.1f} MiB "
+              f"({len(memoria):,} na memória, {memoria.despejados:,} despejados)")
+    tracemalloc.stop()
+
+    # 3. Custo por mensagem
+    aleatorio = random.Random(1)
+    ids = [aleatorio.randrange(limite * 3) for _ in range(50_000)]
+    inicio = time.perf_counter()
+    for chat_id in ids:
+        memoria.historico(chat_id, 2500)
+        memoria.registrar(chat_id, PERGUNTAS[0], RESPOSTA)
+    segundos = (time.perf_counter() - inicio) / len(ids)
+    print(f"- historico() + registrar(): {segundos * 1e6:.1f} µs por mensagem")
+
+
+if __name__ == "__main__":
+    main()
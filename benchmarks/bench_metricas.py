@@ -0,0 +1,79 @@
+"""
+Benchmark do custo das métricas no caminho quente (metricas.py).
+
+Mede o custo por operação de Contador.inc, Histograma.observar e do 'with cronometrar()'
+usado nos handlers, em uma thread e com várias threads disputando o mesmo lock (como os
+trabalhadores da fila do webhook do WhatsApp), e o tempo de gerar o /metrics.
+
+Uso: python benchmarks/bench_metricas.py --repeticoes 500000 --threads 4
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metricas import Registro
+
+ROTULOS = [("menu_principal", "menu_principal_handler"), ("cliente_opcoes", "cliente_opcoes_handler"),
+           ("inicio", "start"), ("recebe_nome_contrato", "handle_recebe_nome_contrato")]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=500_000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    registro = Registro()
+    contador = registro.contador("bench_total", "Contador", ("estado", "handler"))
+    histograma = registro.histograma("bench_segundos", "Histograma", ("estado", "handler"))
+    valores = [random.expovariate(20) for _ in range(1024)]
+    n = args.repeticoes
+
+    def inc():
+        contador.inc("menu_principal", "menu_principal_handler")
+
+    def observar():
+        histograma.observar(valores[n & 1023], "menu_principal", "menu_principal_handler")
+
+    def cronometrar():
+        with histograma.cronometrar("menu_principal", "menu_principal_handler"):
+            pass
+
+    def vazio():
+        pass
+
+    base = timeit.timeit(vazio, number=n) / n
+    print(f"{n:,} operações por medição (custo da chamada vazia descontado: {base * 1e9:.0f} ns)")
+    for nome, funcao in (("Contador.inc", inc), ("Histograma.observar", observar), ("with cronometrar()", cronometrar)):
+        segundos = timeit.timeit(funcao, number=n) / n - base
+        print(f"- {nome:<22} {segundos * 1e9:8.0f} ns/op")
+
+    # Várias threads observando o mesmo histograma (disputa pelo lock)
+    por_thread = n // args.threads
+
+    def trabalhador():
+        for i in range(por_thread):
+            histograma.observar(valores[i & 1023], *ROTULOS[i & 3])
+
+    threads = [threading.Thread(target=trabalhador) for _ in range(args.threads)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    segundos = (time.perf_counter() - inicio) / (por_thread * args.threads)
+    print(f"- observar com {args.threads} threads  {segundos * 1e9:8.0f} ns/op")
+
+    repeticoes_exportar = 200
+    segundos = timeit.timeit(registro.exportar, number=repeticoes_exportar) / repeticoes_exportar
+    print(f"- exportar /metrics      {segundos * 1e3:8.3f} ms ({len(registro.exportar()):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
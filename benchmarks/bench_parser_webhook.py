@@ -0,0 +1,59 @@
+"""
+Micro-benchmark do parser de payloads do webhook do WhatsApp.
+
+Confere cada payload de payloads_webhook.json contra o resultado esperado e mede
+o tempo de extração por entrega (incluindo um lote grande sintético).
+
+Uso: python benchmarks/bench_parser_webhook.py --repeticoes 20000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+
+from parser_webhook import extrair_mensagens
+
+
+def lote_grande(mensagens=100, status=100):
+    """Entrega sintética com muitas mensagens e status misturados."""
+    valor = {
+        "messages": [
+            {"from": f"55419{n:08d}", "id": f"wamid.{n}", "type": "text", "text": {"body": "menu"}}
+            for n in range(mensagens)
+        ],
+        "statuses": [{"id": f"wamid.s{n}", "status": "read"} for n in range(status)],
+    }
+    return {"object": "whatsapp_business_account", "entry": [{"changes": [{"value": valor}]}]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=20000)
+    args = parser.parse_args()
+
+    with open(os.path.join(PASTA, "payloads_webhook.json"), encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    falhas = 0
+    for caso in corpus:
+        obtido = [list(m) for m in extrair_mensagens(caso["payload"])]
+        if obtido != caso["esperado"]:
+            falhas += 1
+            print(f"[FALHA] {caso['nome']}: esperado {caso['esperado']}, obtido {obtido}")
+    print(f"Corpus: {len(corpus) - falhas}/{len(corpus)} payloads corretos")
+
+    casos = [(c["nome"], c["payload"]) for c in corpus]
+    casos.append(("lote_100_msgs_100_status", lote_grande()))
+    for nome, payload in casos:
+        segundos = timeit.timeit(lambda: extrair_mensagens(payload), number=args.repeticoes)
+        print(f"- {nome:<32} {segundos / args.repeticoes * 1e6:8.2f} µs/entrega")
+
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
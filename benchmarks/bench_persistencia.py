@@ -0,0 +1,71 @@
+"""
+Benchmark da persistência em SQLite (WAL) com N registros.
+
+Mede:
+- custo por gravação visto pelo handler (só enfileira);
+- vazão real de gravação em lote até tudo estar no disco;
+- tempo de "inicialização": abrir o banco e carregar a tabela inteira;
+- tempo de reidratação dos contratos (recriação dos agendamentos em memória).
+
+Uso: python benchmarks/bench_persistencia.py --registros 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistencia import ArmazemSQLite, DicionarioPersistente
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--registros", type=int, default=100000)
+    args = parser.parse_args()
+    n = args.registros
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+
+        armazem = ArmazemSQLite(caminho)
+        contratos = DicionarioPersistente(armazem, "contratos", serializar=lambda d: d["nome"],
+                                          desserializar=lambda nome: {"nome": nome, "job": None})
+
+        inicio = time.perf_counter()
+        for chat_id in range(n):
+            contratos[chat_id] = {"nome": f"Cliente {chat_id}", "job": None}
+        enfileirar = time.perf_counter() - inicio
+        armazem.aguardar_gravacao()
+        total_gravacao = time.perf_counter() - inicio
+        armazem.fechar()
+
+        print(f"Gravação de {n} registros:")
+        print(f"- custo no handler:   {enfileirar / n * 1e6:8.2f} µs/gravação")
+        print(f"- até estar no disco: {total_gravacao:8.2f} s ({n / total_gravacao:,.0f} gravações/s)")
+
+        inicio = time.perf_counter()
+        armazem = ArmazemSQLite(caminho)
+        contratos = DicionarioPersistente(armazem, "contratos", serializar=lambda d: d["nome"],
+                                          desserializar=lambda nome: {"nome": nome, "job": None})
+        abrir = time.perf_counter() - inicio
+        quantidade = len(contratos) # Primeiro acesso: carrega tudo em uma consulta
+        carregar = time.perf_counter() - inicio - abrir
+
+        inicio = time.perf_counter()
+        agendados = []
+        for chat_id, dados in contratos.items():
+            dados["job"] = (chat_id, dados["nome"]) # Substituto do Job: mede só a iteração/reatribuição
+            agendados.append(dados["job"])
+        reidratar = time.perf_counter() - inicio
+        armazem.fechar()
+
+        print(f"Inicialização com {quantidade} registros:")
+        print(f"- abrir banco:        {abrir * 1000:8.1f} ms")
+        print(f"- carregar tabela:    {carregar * 1000:8.1f} ms")
+        print(f"- reidratar:          {reidratar * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Benchmark da resiliência do chamar_gemini (prazo, disjuntor, hedging e modelo de reserva).
+
+Roda o chamar_gemini do bot do Telegram contra o Gemini falso (fake_gemini.py), com
+perguntas chegando num ritmo fixo (laço aberto), em três situações:
+- cauda:      0,3 s por resposta, mas 5% das chamadas levam 3 s. Compara sem e com hedging.
+- incidente:  o modelo principal trava (10 s) e o de reserva está normal. Compara a chamada
+              sem proteção com prazo + disjuntor + reserva.
+- fora_do_ar: os dois modelos travam. Com os disjuntores abertos, a resposta pronta sai na hora.
+Para cada caso: p50/p95/p99 da latência vista pelo usuário e o tipo de resposta (modelo, reserva,
+indisponível, ocupado, erro). Os prazos são reduzidos para o teste caber em poucos segundos.
+
+Antes dos cenários, verificações (também contra o Gemini falso) de que:
+- o disjuntor abre depois de N falhas e, aberto, não chama a API;
+- passado o tempo aberto, uma única chamada de teste passa (meio aberto) e, indo bem, fecha;
+- o hedging dispara a segunda chamada só depois do atraso (p95) e fica com a primeira resposta;
+- o prazo total é respeitado com os dois modelos travados;
+- com o disjuntor aberto, perguntas já respondidas saem do cache.
+Qualquer verificação que falhar é mostrada e o benchmark termina com erro.
+
+Uso: python benchmarks/bench_resiliencia_gemini.py --ritmo 8 --duracao 10 [--stream] [--so-verificar] [--saida r.json]
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import sys
+import tempfile
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+sys.path.insert(0, PASTA)
+
+from fake_gemini import FakeGemini
+from relatorio import resumo_latencias, salvar_resultado
+
+PRINCIPAL, RESERVA = "gemini-1.5-flash", "gemini-1.5-flash-8b"
+
+# Configuração de teste: mesmos mecanismos do bot, com tempos menores
+SEM_PROTECAO = dict(modelos=[PRINCIPAL], prazo=None, prazo_total=None, hedge=False, min_chamadas=10 ** 9)
+RESILIENTE = dict(modelos=[PRINCIPAL, RESERVA], prazo=2.0, prazo_total=3.0, hedge=True, hedge_min_amostras=30,
+                  hedge_atraso_minimo=0.2, janela=20, min_chamadas=10, latencia_lenta=1.5, tempo_aberto=5.0)
+
+CENARIOS = [
+    ("cauda", "sem hedging", dict(RESILIENTE, hedge=False), dict(latencia=0.3, taxa_lentas=0.05, latencia_lenta=3.0)),
+    ("cauda", "com hedging", RESILIENTE, dict(latencia=0.3, taxa_lentas=0.05, latencia_lenta=3.0)),
+    ("incidente", "sem proteção", SEM_PROTECAO, dict(latencia=0.3, por_modelo={PRINCIPAL: {"latencia": 10.0}})),
+    ("incidente", "resiliente", RESILIENTE, dict(latencia=0.3, por_modelo={PRINCIPAL: {"latencia": 10.0}})),
+    ("fora_do_ar", "sem proteção", SEM_PROTECAO, dict(latencia=10.0)),
+    ("fora_do_ar", "resiliente", RESILIENTE, dict(latencia=10.0)),
+]
+
+
+def classificar(bot, texto):
+    if texto == bot.MSG_GEMINI_INDISPONIVEL:
+        return "indisponivel"
+    if texto == bot.MSG_GEMINI_OCUPADO:
+        return "ocupado"
+    if texto == bot.MSG_GEMINI_ERRO:
+        return "erro"
+    return "modelo"
+
+
+def preparar_bot(bot, fake, config):
+    """Aponta o bot para o Gemini falso, com um chamador novo e o cache vazio."""
+    from google import genai
+    from google.genai import types
+    from resiliencia_gemini import ChamadorResiliente
+
+    bot.client = genai.Client(api_key="chave-falsa", http_options=types.HttpOptions(base_url=fake.base_url))
+    config = dict(config)
+    bot.chamador_gemini = ChamadorResiliente(config.pop("modelos"), **config)
+    bot.GEMINI_MODELO = bot.chamador_gemini.modelos[0]
+    bot._semaforo_gemini = asyncio.Semaphore(bot.GEMINI_MAX_CONCORRENTES)
+    bot._gemini_pendentes = 0
+    bot.cache_gemini = type(bot.cache_gemini)() # Cache vazio: toda pergunta chega ao Gemini
+
+
+async def verificar(bot, args):
+    """Verificações do disjuntor, da chamada de teste, do hedging, do prazo e do cache. Retorna as falhas."""
+    from resiliencia_gemini import ABERTO, FECHADO, HEDGES
+
+    falhas = []
+    perguntas = (f"Pergunta de verificação {n} sobre o sistema" for n in range(10 ** 6))
+
+    def conferir(condicao, descricao):
+        print(f"    {'ok  ' if condicao else 'FALHOU'} {descricao}")
+        if not condicao:
+            falhas.append(descricao)
+
+    async def perguntar(pergunta=None):
+        inicio = time.perf_counter()
+        texto = await bot.chamar_gemini(pergunta or next(perguntas))
+        return classificar(bot, texto), time.perf_counter() - inicio, texto
+
+    # Disjuntor: abre na N-ésima falha, e aberto não chama a API. Depois do tempo aberto, uma chamada de teste
+    fake = await FakeGemini(latencia=0.2, variacao=0, taxa_erros=1.0).iniciar()
+    preparar_bot(bot, fake, dict(modelos=[PRINCIPAL], prazo=2.0, prazo_total=3.0, hedge=False, janela=5,
+                                 min_chamadas=5, tempo_aberto=0.5))
+    disjuntor = bot.chamador_gemini.disjuntores[PRINCIPAL]
+    for _ in range(4):
+        await perguntar()
+    conferir(disjuntor.estado == FECHADO, "disjuntor fechado depois de 4 falhas (mínimo de 5 chamadas)")
+    await perguntar()
+    conferir(disjuntor.estado == ABERTO, "disjuntor aberto na 5a falha")
+    chamadas = fake.chamadas
+    tipo, duracao, _ = await perguntar()
+    conferir(tipo == "indisponivel" and fake.chamadas == chamadas and duracao < 0.05,
+             f"aberto: resposta pronta sem chamar a API ({tipo}, {duracao * 1000:.0f} ms)")
+
+    await asyncio.sleep(0.6)
+    fake.taxa_erros = 0.0
+    chamadas = fake.chamadas
+    tipos = [tipo for tipo, _, _ in await asyncio.gather(*(perguntar() for _ in range(3)))]
+    conferir(fake.chamadas - chamadas == 1 and sorted(tipos) == ["indisponivel", "indisponivel", "modelo"],
+             f"meio aberto: uma única chamada de teste ({fake.chamadas - chamadas} chamadas, respostas {tipos})")
+    conferir(disjuntor.estado == FECHADO, "chamada de teste respondeu: disjuntor fechado")
+    await fake.parar()
+
+    # Hedging: com o p95 conhecido (~0,15 s), uma chamada que trava ganha uma cópia depois do p95
+    fake = await FakeGemini(latencia=0.15, variacao=0).iniciar()
+    preparar_bot(bot, fake, dict(modelos=[PRINCIPAL], prazo=3.0, prazo_total=3.0, hedge=True, hedge_min_amostras=5,
+                                 hedge_atraso_minimo=0.1, min_chamadas=10 ** 9))
+    for _ in range(5):
+        await perguntar()
+    atraso = bot.chamador_gemini.latencias[PRINCIPAL].percentil95(5)
+    hedges, chamadas = HEDGES.valor(PRINCIPAL), fake.chamadas
+    fake.taxa_lentas, fake.latencia_lenta = 1.0, 2.0
+    pergunta = asyncio.ensure_future(perguntar())
+    await asyncio.sleep(0.05) # A primeira chamada já chegou (e vai levar 2 s); a cópia vai ser rápida
+    fake.taxa_lentas = 0.0
+    tipo, duracao, _ = await pergunta
+    conferir(HEDGES.valor(PRINCIPAL) - hedges == 1 and fake.chamadas - chamadas == 2,
+             f"hedge disparado uma vez ({HEDGES.valor(PRINCIPAL) - hedges} hedges, {fake.chamadas - chamadas} chamadas)")
+    conferir(tipo == "modelo" and atraso + 0.15 <= duracao < 1.0,
+             f"hedge só depois do atraso de {atraso * 1000:.0f} ms e resposta da cópia ({duracao * 1000:.0f} ms)")
+    await fake.parar()
+
+    # Prazo: os dois modelos travados; a resposta pronta sai no prazo total, não no tempo da API
+    fake = await FakeGemini(latencia=5.0, variacao=0).iniciar()
+    preparar_bot(bot, fake, dict(modelos=[PRINCIPAL, RESERVA], prazo=0.3, prazo_total=0.5, hedge=False,
+                                 min_chamadas=10 ** 9))
+    tipo, duracao, _ = await perguntar()
+    conferir(tipo == "indisponivel" and 0.45 <= duracao < 0.8,
+             f"prazo total de 500 ms respeitado ({tipo} em {duracao * 1000:.0f} ms)")
+    await fake.parar()
+
+    # Cache: com o disjuntor aberto, uma pergunta já respondida sai do cache, sem chamar a API
+    fake = await FakeGemini(latencia=0.05, variacao=0).iniciar()
+    preparar_bot(bot, fake, dict(modelos=[PRINCIPAL], prazo=2.0, prazo_total=2.0, hedge=False, janela=3,
+                                 min_chamadas=3, tempo_aberto=60.0))
+    repetida = next(perguntas)
+    _, _, resposta = await perguntar(repetida)
+    fake.taxa_erros = 1.0
+    for _ in range(3):
+        await perguntar()
+    chamadas = fake.chamadas
+    tipo, _, texto = await perguntar(repetida)
+    conferir(bot.chamador_gemini.disjuntores[PRINCIPAL].estado == ABERTO and texto == resposta
+             and fake.chamadas == chamadas, f"disjuntor aberto: pergunta repetida respondida pelo cache ({tipo})")
+    tipo, _, _ = await perguntar()
+    conferir(tipo == "indisponivel", f"disjuntor aberto: pergunta nova recebe a resposta pronta ({tipo})")
+    await fake.parar()
+    return falhas
+
+
+async def executar_cenario(bot, args, config, config_fake):
+    from resiliencia_gemini import HEDGES, RESPOSTAS_RESERVA
+
+    fake = await FakeGemini(pedacos=args.pedacos, **config_fake).iniciar()
+    preparar_bot(bot, fake, config)
+
+    latencias, tipos = [], collections.Counter()
+    hedges_antes, reserva_antes = HEDGES.valor(PRINCIPAL), RESPOSTAS_RESERVA.valor(RESERVA)
+
+    async def perguntar(n, previsto):
+        atraso = previsto - time.perf_counter()
+        if atraso > 0:
+            await asyncio.sleep(atraso)
+        pergunta = f"Pergunta {n} sobre sistemas de gestão para a minha loja" # Distintas: sem cache
+        if args.stream:
+            texto = None
+            async for texto in bot.chamar_gemini_stream(pergunta):
+                pass
+        else:
+            texto = await bot.chamar_gemini(pergunta)
+        latencias.append(time.perf_counter() - previsto)
+        tipos[classificar(bot, texto)] += 1
+
+    total = int(args.ritmo * args.duracao)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(perguntar(n, inicio + n / args.ritmo) for n in range(total)))
+    duracao = time.perf_counter() - inicio
+    await fake.parar()
+
+    return {
+        "perguntas": total,
+        "duracao_s": round(duracao, 3),
+        "latencia": resumo_latencias(latencias),
+        "respostas": dict(tipos),
+        "chamadas_gemini": dict(fake.chamadas_por_modelo),
+        "respostas_reserva": RESPOSTAS_RESERVA.valor(RESERVA) - reserva_antes,
+        "hedges": HEDGES.valor(PRINCIPAL) - hedges_antes,
+        "disjuntor_principal": bot.chamador_gemini.disjuntores[PRINCIPAL].estado,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ritmo", type=float, default=8.0, help="Perguntas por segundo")
+    parser.add_argument("--duracao", type=float, default=10.0, help="Segundos de chegada de perguntas por cenário")
+    parser.add_argument("--stream", action="store_true", help="Usa chamar_gemini_stream (sem hedging)")
+    parser.add_argument("--pedacos", type=int, default=4)
+    parser.add_argument("--cenarios", nargs="+", default=None, help="Ex: cauda incidente")
+    parser.add_argument("--so-verificar", action="store_true", help="Só as verificações, sem os cenários")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON com o resultado ('-' para imprimir)")
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta) # O bot cria o banco local no diretório atual
+        import chatbot_telegram as bot
+        logging.getLogger().setLevel(logging.CRITICAL)
+
+        print("Verificações:")
+        falhas = asyncio.run(verificar(bot, args))
+        for nome, variante, config, config_fake in CENARIOS:
+            if args.so_verificar or args.cenarios and nome not in args.cenarios:
+                continue
+            resultado = asyncio.run(executar_cenario(bot, args, config, config_fake))
+            resultado.update(cenario=nome, variante=variante)
+            resultados.append(resultado)
+            latencia = resultado["latencia"]
+            print(f"- {nome:<10} {variante:<13} p50 {latencia['p50_ms']:8.0f} ms  p95 {latencia['p95_ms']:8.0f} ms  "
+                  f"p99 {latencia['p99_ms']:8.0f} ms  respostas {resultado['respostas']}  "
+                  f"reserva {resultado['respostas_reserva']}  hedges {resultado['hedges']}")
+        bot.armazem.fechar()
+
+    if args.saida:
+        salvar_resultado(args.saida, "bench_resiliencia_gemini", vars(args), {"falhas": falhas, "cenarios": resultados})
+    if falhas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
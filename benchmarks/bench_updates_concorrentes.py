@@ -0,0 +1,66 @@
+"""
+Benchmark: vazão do bot com N chats simulados quando o LLM está lento.
+
+Compara o processamento sequencial (padrão do Application) com o
+ProcessadorPorChat (paralelo entre chats, em ordem dentro de cada chat).
+
+Uso: python benchmarks/bench_updates_concorrentes.py --chats 50 --msgs 3 --latencia 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.ext import SimpleUpdateProcessor
+
+from processador_updates import ProcessadorPorChat
+
+
+async def simular(processador, chats, msgs_por_chat, latencia):
+    """Despacha os updates como o Application faz e mede o tempo total."""
+    recebidos = {chat_id: [] for chat_id in range(chats)}
+
+    async def handler(chat_id, seq):
+        await asyncio.sleep(latencia) # Chamada "lenta" ao Gemini
+        recebidos[chat_id].append(seq)
+
+    await processador.initialize()
+    inicio = time.perf_counter()
+    tarefas = []
+    for seq in range(msgs_por_chat):
+        for chat_id in range(chats):
+            update = SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id))
+            tarefas.append(asyncio.create_task(processador.process_update(update, handler(chat_id, seq))))
+    await asyncio.gather(*tarefas)
+    duracao = time.perf_counter() - inicio
+    await processador.shutdown()
+
+    em_ordem = all(seqs == list(range(msgs_por_chat)) for seqs in recebidos.values())
+    return duracao, em_ordem
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--msgs", type=int, default=3)
+    parser.add_argument("--latencia", type=float, default=0.2)
+    parser.add_argument("--concorrencia", type=int, default=64)
+    args = parser.parse_args()
+
+    total = args.chats * args.msgs
+    cenarios = [
+        ("sequencial", SimpleUpdateProcessor(1)),
+        (f"por_chat({args.concorrencia})", ProcessadorPorChat(args.concorrencia)),
+    ]
+    print(f"{total} updates, {args.chats} chats, LLM com {args.latencia * 1000:.0f} ms")
+    for nome, processador in cenarios:
+        duracao, em_ordem = asyncio.run(simular(processador, args.chats, args.msgs, args.latencia))
+        print(f"- {nome:<16} {duracao:7.2f}s  {total / duracao:8.1f} updates/s  ordem por chat: {'ok' if em_ordem else 'VIOLADA'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Benchmark do modo webhook do bot do Telegram com updates sintéticos (JSON do Telegram).
+
+Sobe uma Bot API falsa neste processo e W workers do bot (processos na mesma porta,
+SO_REUSEPORT). Com mais de um worker, o estado das conversas fica num SQLite
+compartilhado (ou em --estado-url). Cada chat simulado percorre
+/start -> "Sou Cliente" -> "Suporte SLA" e só manda a próxima mensagem depois de
+receber a resposta da anterior, como uma pessoa. Qualquer worker pode receber qualquer
+mensagem, então uma resposta errada indica estado de conversa perdido entre processos.
+
+Mede a latência do POST (até o 200), a latência de cada turno (POST até o sendMessage
+chegar na API falsa) e os turnos por segundo. Também confere que um POST com o token
+secreto errado é recusado.
+
+Uso: python benchmarks/bench_webhook_telegram.py --workers 1 2 4 --chats 500
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+sys.path.insert(0, PASTA)
+
+from cliente_http import ClienteHTTP
+from fake_telegram_api import TOKEN_FALSO, FakeTelegramAPI
+from fluxo_conversa import TELEGRAM, carregar_fluxo
+from relatorio import percentil
+
+SEGREDO = "segredo-do-benchmark"
+CAMINHO = "/telegram/webhook" # O mesmo WEBHOOK_CAMINHO do bot
+
+fluxo = carregar_fluxo(TELEGRAM)
+_titulos = {id_no: titulo for resposta in fluxo.respostas.values() for id_no, titulo in resposta.opcoes}
+# (texto enviado pelo usuário, nó do fluxo cuja resposta é esperada)
+ROTEIRO = [
+    ("/start", fluxo.inicio),
+    (_titulos["sou_cliente"], "sou_cliente"),
+    (_titulos["suporte_sla"], "suporte_sla"),
+]
+
+_ids_update = itertools.count(1)
+
+
+def update_sintetico(chat_id, texto):
+    """JSON de um update de mensagem de texto, no formato que o Telegram envia ao webhook."""
+    update_id = next(_ids_update)
+    mensagem = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private", "first_name": "Cliente"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "Cliente", "username": f"cliente{chat_id}"},
+        "text": texto,
+    }
+    if texto.startswith("/"):
+        mensagem["entities"] = [{"type": "bot_command", "offset": 0, "length": len(texto)}]
+    return json.dumps({"update_id": update_id, "message": mensagem}).encode()
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rodar_worker(indice, porta, base_url, estado_url):
+    import chatbot_telegram
+    logging_silencioso()
+    chatbot_telegram.TELEGRAM_BOT_TOKEN = TOKEN_FALSO
+    chatbot_telegram.executar_worker(indice, SEGREDO, f"http://127.0.0.1:{porta}", estado_url, porta, base_url)
+
+
+def logging_silencioso():
+    import logging
+    logging.getLogger().setLevel(logging.ERROR)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+async def aguardar_porta(porta, timeout=60):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", porta)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"Webhook não subiu na porta {porta}")
+
+
+async def executar(workers, chats, conexoes, estado_url):
+    esperando = {} # Chave: ID do chat, Valor: Future com (texto, instante) da próxima resposta
+
+    def ao_enviar(chat_id, texto, instante):
+        futuro = esperando.pop(chat_id, None)
+        if futuro is not None and not futuro.done():
+            futuro.set_result((texto, instante))
+
+    api = await FakeTelegramAPI(ao_enviar=ao_enviar).iniciar()
+    porta = porta_livre()
+    contexto = multiprocessing.get_context("spawn")
+    processos = [
+        contexto.Process(target=rodar_worker, args=(i, porta, api.base_url, estado_url), daemon=True)
+        for i in range(workers)
+    ]
+    for processo in processos:
+        processo.start()
+
+    cliente = ClienteHTTP("127.0.0.1", porta, conexoes)
+    try:
+        await aguardar_porta(porta)
+        while api.chamadas["getMe"] < workers: # Todos os workers inicializados
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.5)
+
+        status_invalido, _ = await cliente.post(CAMINHO, update_sintetico(1, "/start"),
+                                                {"X-Telegram-Bot-Api-Secret-Token": "errado"})
+
+        latencias_post, latencias_turno, erros = [], [], []
+        loop = asyncio.get_running_loop()
+
+        async def conversar(chat_id):
+            for texto, no_esperado in ROTEIRO:
+                futuro = loop.create_future()
+                esperando[chat_id] = futuro
+                inicio = time.perf_counter()
+                status, _ = await cliente.post(CAMINHO, update_sintetico(chat_id, texto),
+                                               {"X-Telegram-Bot-Api-Secret-Token": SEGREDO})
+                latencias_post.append(time.perf_counter() - inicio)
+                if status != 200:
+                    erros.append((chat_id, texto, f"HTTP {status}"))
+                    return
+                try:
+                    resposta, instante = await asyncio.wait_for(futuro, 15)
+                except asyncio.TimeoutError:
+                    erros.append((chat_id, texto, "sem resposta"))
+                    return
+                latencias_turno.append(instante - inicio)
+                if resposta != fluxo.resposta(no_esperado).texto:
+                    erros.append((chat_id, texto, f"resposta errada: {resposta[:40]!r}"))
+                    return
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(conversar(1_000_000 + c) for c in range(chats)))
+        duracao = time.perf_counter() - inicio
+    finally:
+        await cliente.fechar()
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            # Espera fora do event loop: as APIs falsas continuam atendendo o encerramento dos workers
+            await asyncio.to_thread(processo.join, 15)
+        await api.parar()
+
+    latencias_post.sort()
+    latencias_turno.sort()
+    return {
+        "workers": workers,
+        "turnos": len(latencias_turno),
+        "duracao": duracao,
+        "turnos_por_segundo": len(latencias_turno) / duracao,
+        "post_p50_ms": percentil(latencias_post, 50) * 1000,
+        "post_p99_ms": percentil(latencias_post, 99) * 1000,
+        "turno_p50_ms": percentil(latencias_turno, 50) * 1000,
+        "turno_p95_ms": percentil(latencias_turno, 95) * 1000,
+        "turno_p99_ms": percentil(latencias_turno, 99) * 1000,
+        "segredo_errado": status_invalido,
+        "erros": erros,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--conexoes", type=int, default=64)
+    parser.add_argument("--estado-url", default=None,
+                        help="Backend compartilhado (padrão: SQLite temporário quando há mais de um worker)")
+    args = parser.parse_args()
+
+    print(f"{args.chats} chats x {len(ROTEIRO)} turnos, {args.conexoes} conexões keep-alive")
+    ok = True
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta) # Os bancos locais do bot ficam na pasta temporária
+        for workers in args.workers:
+            estado_url = args.estado_url
+            if estado_url is None and workers > 1:
+                estado_url = f"sqlite:///{os.path.join(pasta, f'estado_{workers}.db')}"
+            r = asyncio.run(executar(workers, args.chats, args.conexoes, estado_url))
+            print(f"- {workers} worker(s) [{estado_url.split(':')[0] if estado_url else 'local'}]: "
+                  f"{r['turnos']} turnos em {r['duracao']:.2f}s ({r['turnos_por_segundo']:,.0f}/s) | "
+                  f"POST p50 {r['post_p50_ms']:.1f} ms p99 {r['post_p99_ms']:.1f} ms | "
+                  f"turno p50 {r['turno_p50_ms']:.1f} ms p95 {r['turno_p95_ms']:.1f} ms p99 {r['turno_p99_ms']:.1f} ms | "
+                  f"token errado -> HTTP {r['segredo_errado']} | erros: {len(r['erros'])}")
+            for erro in r["erros"][:5]:
+                print(f"    {erro}")
+            ok = ok and not r["erros"] and r["segredo_errado"] == 403
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
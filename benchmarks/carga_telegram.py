@@ -0,0 +1,224 @@
+"""
+Teste de carga do bot do Telegram: milhares de chats simulados percorrendo os estados
+do ConversationHandler pelo webhook, com a Bot API e o Gemini falsos (latência configurável).
+
+Cada chat segue um roteiro sorteado conforme --mistura:
+- cliente:  /start -> Sou Cliente -> Suporte SLA (MENU_PRINCIPAL -> CLIENTE_OPCOES)
+- prospect: /start -> Ainda Não Sou Cliente
+- contrato: /start -> Configurar Contrato -> nome (RECEBE_NOME_CONTRATO, agendador)
+- faq:      /start -> pergunta respondida pelo índice local de FAQ
+- gemini:   /start -> pergunta livre (Gemini em streaming, fila e semáforo do bot)
+A próxima mensagem do chat só é enviada depois de todas as respostas esperadas chegarem.
+
+Relata p50/p95/p99 da latência do POST e de cada turno (por etapa), turnos e POSTs por
+segundo, memória dos workers e as chamadas ao Gemini, em JSON (--saida) para comparar versões.
+
+Uso: python benchmarks/carga_telegram.py --chats 2000 --workers 1 --latencia-gemini 1.5 --saida tg.json
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+sys.path.insert(0, PASTA)
+
+from bench_webhook_telegram import CAMINHO, SEGREDO, aguardar_porta, logging_silencioso, porta_livre, update_sintetico
+from cliente_http import ClienteHTTP
+from fake_gemini import FakeGemini
+from fake_telegram_api import TOKEN_FALSO, FakeTelegramAPI
+from fluxo_conversa import TELEGRAM, carregar_fluxo
+from relatorio import memoria_processo, resumo_latencias, salvar_resultado
+
+fluxo = carregar_fluxo(TELEGRAM)
+_titulos = {id_no: titulo for resposta in fluxo.respostas.values() for id_no, titulo in resposta.opcoes}
+_texto = lambda id_no: fluxo.resposta(id_no).texto
+
+# Etapas: (rótulo, texto enviado, respostas esperadas). None = qualquer texto (Gemini, FAQ, confirmação).
+# '{chat}' é trocado pelo ID do chat (perguntas diferentes não caem no cache do Gemini).
+INICIO = ("menu", "/start", [_texto(fluxo.inicio)])
+ROTEIROS = {
+    "cliente": [INICIO, ("sou_cliente", _titulos["sou_cliente"], [_texto("sou_cliente")]),
+                ("suporte_sla", _titulos["suporte_sla"], [_texto("suporte_sla")])],
+    "prospect": [INICIO, ("nao_sou_cliente", _titulos["nao_sou_cliente"], [_texto("nao_sou_cliente")])],
+    "contrato": [INICIO, ("configurar_contrato", _titulos["configurar_contrato"],
+                          [_texto("configurar_contrato"), _texto("pedir_nome_contrato")]),
+                 ("nome_contrato", "Cliente {chat}", [None])],
+    "faq": [INICIO, ("faq", "quanto custa um sistema?", [None])],
+    "gemini": [INICIO, ("gemini", "Como um sistema sob medida ajudaria a empresa {chat} a vender mais?", [None])],
+}
+MISTURA_PADRAO = "cliente=3,prospect=2,contrato=1,faq=2,gemini=2"
+
+
+def rodar_worker(indice, porta, url_telegram, url_gemini, estado_url):
+    import chatbot_telegram
+    from google import genai
+    from google.genai import types
+
+    logging_silencioso()
+    chatbot_telegram.TELEGRAM_BOT_TOKEN = TOKEN_FALSO
+    chatbot_telegram.client = genai.Client(api_key="chave-falsa", http_options=types.HttpOptions(base_url=url_gemini))
+    chatbot_telegram.executar_worker(indice, SEGREDO, f"http://127.0.0.1:{porta}", estado_url, porta, url_telegram)
+
+
+def sortear_roteiros(chats, mistura, semente):
+    pesos = {nome: float(peso) for nome, peso in (item.split("=") for item in mistura.split(","))}
+    aleatorio = random.Random(semente)
+    return aleatorio.choices(list(pesos), weights=list(pesos.values()), k=chats)
+
+
+async def executar(args, workers, estado_url):
+    caixas = {} # Chave: ID do chat, Valor: asyncio.Queue com (texto, instante) das mensagens do bot
+
+    def ao_enviar(chat_id, texto, instante):
+        caixa = caixas.get(chat_id)
+        if caixa is not None:
+            caixa.put_nowait((texto, instante))
+
+    api = await FakeTelegramAPI(ao_enviar=ao_enviar, latencia=args.latencia_telegram).iniciar()
+    gemini = await FakeGemini(latencia=args.latencia_gemini, pedacos=args.pedacos).iniciar()
+    porta = porta_livre()
+    contexto = multiprocessing.get_context("spawn")
+    processos = [
+        contexto.Process(target=rodar_worker, args=(i, porta, api.base_url, gemini.base_url, estado_url), daemon=True)
+        for i in range(workers)
+    ]
+    for processo in processos:
+        processo.start()
+
+    cliente = ClienteHTTP("127.0.0.1", porta, args.conexoes)
+    latencias_post, por_etapa, erros = [], {}, []
+    recusadas_gemini = 0
+    roteiros = sortear_roteiros(args.chats, args.mistura, args.semente)
+    try:
+        await aguardar_porta(porta)
+        while api.chamadas["getMe"] < workers:
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.5)
+        memoria_inicial = [memoria_processo(p.pid) for p in processos]
+
+        async def conversar(chat_id, nome_roteiro, atraso):
+            nonlocal recusadas_gemini
+            await asyncio.sleep(atraso) # Rampa: os chats não começam todos no mesmo instante
+            caixa = caixas[chat_id] = asyncio.Queue()
+            for rotulo, texto, esperadas in ROTEIROS[nome_roteiro]:
+                inicio = time.perf_counter()
+                status, _ = await cliente.post(CAMINHO, update_sintetico(chat_id, texto.format(chat=chat_id)),
+                                               {"X-Telegram-Bot-Api-Secret-Token": SEGREDO})
+                latencias_post.append(time.perf_counter() - inicio)
+                if status != 200:
+                    erros.append((chat_id, rotulo, f"HTTP {status}"))
+                    return
+                for esperada in esperadas:
+                    try:
+                        resposta, instante = await asyncio.wait_for(caixa.get(), args.timeout)
+                    except asyncio.TimeoutError:
+                        erros.append((chat_id, rotulo, "sem resposta"))
+                        return
+                    if esperada is not None and resposta != esperada:
+                        erros.append((chat_id, rotulo, f"resposta errada: {resposta[:40]!r}"))
+                        return
+                    if rotulo == "gemini" and resposta.startswith("⏳"):
+                        recusadas_gemini += 1 # Back-pressure do bot: fila do Gemini cheia
+                por_etapa.setdefault(rotulo, []).append(instante - inicio)
+                if args.pensar:
+                    await asyncio.sleep(random.uniform(0.5, 1.5) * args.pensar)
+            del caixas[chat_id]
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(
+            conversar(1_000_000 + i, nome, args.rampa * i / args.chats) for i, nome in enumerate(roteiros)
+        ))
+        duracao = time.perf_counter() - inicio
+        memoria_final = [memoria_processo(p.pid) for p in processos]
+    finally:
+        await cliente.fechar()
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            # Espera fora do event loop: as APIs falsas continuam atendendo o encerramento dos workers
+            await asyncio.to_thread(processo.join, 15)
+        await api.parar()
+        await gemini.parar()
+
+    turnos = [latencia for latencias in por_etapa.values() for latencia in latencias]
+    return {
+        "workers": workers,
+        "estado": estado_url.split(":")[0] if estado_url else "local",
+        "chats": args.chats,
+        "roteiros": {nome: roteiros.count(nome) for nome in ROTEIROS},
+        "duracao_s": round(duracao, 3),
+        "turnos": len(turnos),
+        "turnos_por_segundo": round(len(turnos) / duracao, 2),
+        "posts_por_segundo": round(len(latencias_post) / duracao, 2),
+        "post": resumo_latencias(latencias_post),
+        "turno": resumo_latencias(turnos),
+        "por_etapa": {rotulo: resumo_latencias(latencias) for rotulo, latencias in sorted(por_etapa.items())},
+        "erros": len(erros),
+        "exemplos_erros": [list(erro) for erro in erros[:10]],
+        "gemini": {"chamadas": gemini.chamadas, "pico_em_voo": gemini.pico_em_voo, "respostas_ocupado": recusadas_gemini},
+        "telegram_api": dict(api.chamadas),
+        "memoria_workers_inicio": memoria_inicial,
+        "memoria_workers_fim": memoria_final,
+    }
+
+
+def imprimir(r):
+    print(f"- {r['workers']} worker(s) [{r['estado']}], {r['chats']} chats: {r['turnos']} turnos em {r['duracao_s']:.2f}s "
+          f"({r['turnos_por_segundo']:,.0f} turnos/s, {r['posts_por_segundo']:,.0f} POST/s), {r['erros']} erros")
+    print(f"    POST   p50 {r['post'].get('p50_ms', 0):8.1f} ms  p95 {r['post'].get('p95_ms', 0):8.1f} ms  "
+          f"p99 {r['post'].get('p99_ms', 0):8.1f} ms")
+    for rotulo, resumo in r["por_etapa"].items():
+        print(f"    {rotulo:<20} p50 {resumo['p50_ms']:8.1f} ms  p95 {resumo['p95_ms']:8.1f} ms  "
+              f"p99 {resumo['p99_ms']:8.1f} ms  (n={resumo['n']})")
+    print(f"    Gemini: {r['gemini']['chamadas']} chamadas, pico de {r['gemini']['pico_em_voo']} simultâneas, "
+          f"{r['gemini']['respostas_ocupado']} respostas 'ocupado'")
+    for memoria in r["memoria_workers_fim"]:
+        if memoria:
+            print(f"    Memória do worker: {memoria['rss_kib'] / 1024:.1f} MiB (pico {memoria['pico_rss_kib'] / 1024:.1f} MiB)")
+    for erro in r["exemplos_erros"][:5]:
+        print(f"    erro: {erro}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--mistura", default=MISTURA_PADRAO, help="Pesos dos roteiros, ex: cliente=3,gemini=1")
+    parser.add_argument("--rampa", type=float, default=2.0, help="Segundos até todos os chats terem começado")
+    parser.add_argument("--pensar", type=float, default=0.0, help="Tempo médio (s) entre os turnos de um chat")
+    parser.add_argument("--conexoes", type=int, default=64)
+    parser.add_argument("--latencia-telegram", type=float, default=0.02)
+    parser.add_argument("--latencia-gemini", type=float, default=1.0)
+    parser.add_argument("--pedacos", type=int, default=4, help="Pedaços do streaming do Gemini")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--estado-url", default=None,
+                        help="Backend compartilhado (padrão: SQLite temporário quando há mais de um worker)")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", default=None, help="Arquivo JSON com o resultado ('-' para imprimir)")
+    args = parser.parse_args()
+
+    cenarios = []
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta) # Os bancos locais do bot ficam na pasta temporária
+        for workers in args.workers:
+            estado_url = args.estado_url
+            if estado_url is None and workers > 1:
+                estado_url = f"sqlite:///{os.path.join(pasta, f'estado_{workers}.db')}"
+            resultado = asyncio.run(executar(args, workers, estado_url))
+            imprimir(resultado)
+            cenarios.append(resultado)
+
+    if args.saida:
+        parametros = {chave: valor for chave, valor in vars(args).items() if chave != "saida"}
+        salvar_resultado(args.saida, "carga_telegram", parametros, {"cenarios": cenarios})
+    sys.exit(0 if all(c["erros"] == 0 for c in cenarios) else 1)
+
+
+if __name__ == "__main__":
+    main()
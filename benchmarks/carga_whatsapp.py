@@ -0,0 +1,276 @@
+"""
+Teste de carga do bot do WhatsApp: reproduz tráfego gravado ou sintético (JSONL) no /webhook do Flask.
+
+Cada linha do arquivo de tráfego é um JSON:
+    {"t": 1.25, "payload": {...entrega do webhook...}, "respostas": 1}
+- t: segundos desde o início (sem 't', a linha é enviada logo após a anterior);
+- respostas: quantas mensagens o bot deve enviar por causa desta entrega
+  (0 para reentregas e status; sem o campo, a latência ponta a ponta não é medida).
+Uma linha que já é a entrega crua da Meta (com "entry") também é aceita, como num tráfego gravado.
+
+'gerar' cria tráfego sintético: chats percorrendo o fluxo, com reentregas e status misturados.
+'reproduzir' sobe o bot (chatbot.py, servidor WSGI com threads) apontando para a Graph API falsa,
+envia cada linha no seu instante (laço aberto, medido a partir do instante previsto, sem
+"coordinated omission") e relata p50/p95/p99 do POST e da resposta ponta a ponta (POST até a
+mensagem chegar na Graph API), entregas por segundo, respostas 503 e a memória do processo do bot.
+
+Uso:
+    python benchmarks/carga_whatsapp.py gerar --chats 2000 --rps 300 --trafego trafego.jsonl
+    python benchmarks/carga_whatsapp.py reproduzir --trafego trafego.jsonl --saida whatsapp.json
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+sys.path.insert(0, PASTA)
+
+from bench_webhook_telegram import aguardar_porta, porta_livre
+from cliente_http import ClienteHTTP
+from fake_graph_api import FakeGraphAPI
+from relatorio import memoria_processo, resumo_latencias, salvar_resultado
+
+# Roteiros: sequência de mensagens do usuário ("texto" digitado ou ID de opção de lista)
+ROTEIROS = {
+    "cliente": [("texto", "Olá"), ("lista", "sou_cliente"), ("lista", "suporte_sla")],
+    "prospect": [("texto", "oi"), ("lista", "nao_sou_cliente")],
+    "texto_livre": [("texto", "menu"), ("texto", "quero saber mais sobre vocês")],
+}
+
+
+def _entrega(valor):
+    return {"object": "whatsapp_business_account",
+            "entry": [{"id": "WABA_ID", "changes": [{"field": "messages", "value": valor}]}]}
+
+
+def _mensagem(numero, id_mensagem, tipo, conteudo):
+    mensagem = {"from": numero, "id": id_mensagem, "timestamp": str(int(time.time()))}
+    if tipo == "texto":
+        mensagem.update(type="text", text={"body": conteudo})
+    else:
+        mensagem.update(type="interactive", interactive={"type": "list_reply", "list_reply": {"id": conteudo, "title": conteudo}})
+    return _entrega({
+        "messaging_product": "whatsapp",
+        "contacts": [{"profile": {"name": "Cliente"}, "wa_id": numero}],
+        "messages": [mensagem],
+    })
+
+
+def _status(numero, id_mensagem):
+    return _entrega({"messaging_product": "whatsapp",
+                     "statuses": [{"id": id_mensagem, "status": "delivered", "recipient_id": numero}]})
+
+
+def gerar_trafego(chats, rps, pensar, duplicadas, status, semente):
+    """Eventos (t, payload, respostas) ordenados pelo tempo, com ~'rps' entregas por segundo."""
+    aleatorio = random.Random(semente)
+    ids = itertools.count(1)
+    eventos = []
+    media_msgs = sum(len(r) for r in ROTEIROS.values()) / len(ROTEIROS)
+    for chat in range(chats):
+        numero = f"55419{chat:08d}"
+        t = chat * media_msgs / rps # Os chats começam espalhados para manter a taxa pedida
+        for tipo, conteudo in ROTEIROS[aleatorio.choice(list(ROTEIROS))]:
+            id_mensagem = f"wamid.CARGA{next(ids)}"
+            payload = _mensagem(numero, id_mensagem, tipo, conteudo)
+            eventos.append((t, payload, 1))
+            if aleatorio.random() < duplicadas:
+                eventos.append((t + aleatorio.uniform(0.1, 1.0), payload, 0)) # Reentrega da Meta
+            if aleatorio.random() < status:
+                eventos.append((t + aleatorio.uniform(0.05, 0.5), _status(numero, id_mensagem), 0))
+            t += aleatorio.uniform(0.5, 1.5) * pensar
+    eventos.sort(key=lambda evento: evento[0])
+    return eventos
+
+
+def ler_trafego(caminho):
+    eventos, t = [], 0.0
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            if not linha.strip():
+                continue
+            dados = json.loads(linha)
+            if "entry" in dados: # Entrega crua gravada do webhook
+                dados = {"payload": dados}
+            t = dados.get("t", t)
+            eventos.append((t, dados["payload"], dados.get("respostas")))
+    return eventos
+
+
+def _destinatarios(payload):
+    """Remetentes das mensagens da entrega (na ordem)."""
+    return [m.get("from") for e in payload.get("entry", []) for c in e.get("changes", [])
+            for m in c.get("value", {}).get("messages", [])]
+
+
+def rodar_bot(porta, api_url, estado_url):
+    """Processo do bot: o Flask do chatbot.py num servidor WSGI com threads, enviando para a Graph API falsa."""
+    import logging
+    from werkzeug.serving import make_server
+
+    sys.stdout = open(os.devnull, "w") # O bot imprime cada prospect registrado
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    import chatbot
+    from backend_estado import criar_backend
+    from envio_whatsapp import EnviadorWhatsApp
+    chatbot.enviador = EnviadorWhatsApp(api_url, "token-de-teste", msgs_por_segundo=10000, max_concorrentes=50,
+                                        simulado=False)
+    chatbot.estado = criar_backend(estado_url)
+    make_server("127.0.0.1", porta, chatbot.app, threaded=True).serve_forever()
+
+
+async def reproduzir(eventos, args):
+    loop = asyncio.get_running_loop()
+    pendentes = collections.defaultdict(collections.deque) # Remetente -> instantes previstos aguardando resposta
+    latencias_ponta = []
+    aguardando = 0
+
+    def receber(para, instante):
+        nonlocal aguardando
+        fila = pendentes.get(para)
+        if fila:
+            latencias_ponta.append(instante - fila.popleft())
+            aguardando -= 1
+
+    graph = FakeGraphAPI(latencia=args.latencia_graph,
+                         ao_receber=lambda para, instante: loop.call_soon_threadsafe(receber, para, instante)).iniciar()
+    processo = None
+    if args.url:
+        host, _, resto = args.url.split("//", 1)[1].partition(":")
+        porta, _, caminho = resto.partition("/")
+        porta, caminho = int(porta), "/" + caminho
+    else:
+        host, porta, caminho = "127.0.0.1", porta_livre(), "/webhook"
+        estado_url = args.estado_url or f"sqlite:///{os.path.join(os.getcwd(), 'estado_carga.db')}"
+        processo = multiprocessing.get_context("spawn").Process(
+            target=rodar_bot, args=(porta, graph.url, estado_url), daemon=True)
+        processo.start()
+
+    cliente = ClienteHTTP(host, porta, args.conexoes)
+    latencias_post, status = [], collections.Counter()
+    try:
+        await aguardar_porta(porta)
+        memoria_inicial = memoria_processo(processo.pid) if processo else None
+
+        async def enviar(previsto, payload, respostas):
+            nonlocal aguardando
+            atraso = previsto - time.perf_counter()
+            if atraso > 0:
+                await asyncio.sleep(atraso)
+            if respostas:
+                for numero in _destinatarios(payload)[:respostas]:
+                    pendentes[numero].append(previsto)
+                    aguardando += 1
+            codigo, _ = await cliente.post(caminho, json.dumps(payload).encode())
+            latencias_post.append(time.perf_counter() - previsto)
+            status[codigo] += 1
+            if codigo != 200 and respostas:
+                # Entrega recusada (ex: 503): o bot não vai responder a estas mensagens
+                for numero in _destinatarios(payload)[:respostas]:
+                    if pendentes[numero]:
+                        pendentes[numero].pop()
+                        aguardando -= 1
+
+        inicio = time.perf_counter()
+        escala = 1 / args.velocidade
+        await asyncio.gather(*(enviar(inicio + t * escala, payload, respostas) for t, payload, respostas in eventos))
+        duracao_envio = time.perf_counter() - inicio
+        limite = time.perf_counter() + args.timeout
+        while aguardando > 0 and time.perf_counter() < limite:
+            await asyncio.sleep(0.05)
+        duracao = time.perf_counter() - inicio
+        memoria_final = memoria_processo(processo.pid) if processo else None
+    finally:
+        await cliente.fechar()
+        if processo:
+            processo.terminate()
+            await asyncio.to_thread(processo.join, 15)
+        graph.shutdown()
+
+    esperadas = sum(r or 0 for _, _, r in eventos)
+    return {
+        "entregas": len(eventos),
+        "duracao_envio_s": round(duracao_envio, 3),
+        "duracao_s": round(duracao, 3),
+        "entregas_por_segundo": round(len(eventos) / duracao_envio, 2),
+        "status_http": {str(codigo): quantidade for codigo, quantidade in sorted(status.items())},
+        "post": resumo_latencias(latencias_post),
+        "ponta_a_ponta": resumo_latencias(latencias_ponta),
+        "respostas_esperadas": esperadas,
+        "respostas_recebidas": len(latencias_ponta),
+        "sem_resposta": aguardando,
+        "memoria_bot_inicio": memoria_inicial,
+        "memoria_bot_fim": memoria_final,
+    }
+
+
+def imprimir(r):
+    print(f"{r['entregas']} entregas em {r['duracao_envio_s']:.2f}s ({r['entregas_por_segundo']:,.0f}/s), "
+          f"status HTTP {r['status_http']}")
+    for nome in ("post", "ponta_a_ponta"):
+        resumo = r[nome]
+        if resumo["n"]:
+            print(f"- {nome:<14} p50 {resumo['p50_ms']:8.1f} ms  p95 {resumo['p95_ms']:8.1f} ms  "
+                  f"p99 {resumo['p99_ms']:8.1f} ms  (n={resumo['n']})")
+    print(f"- respostas: {r['respostas_recebidas']}/{r['respostas_esperadas']} ({r['sem_resposta']} sem resposta)")
+    if r["memoria_bot_fim"]:
+        print(f"- memória do bot: {r['memoria_bot_fim']['rss_kib'] / 1024:.1f} MiB "
+              f"(pico {r['memoria_bot_fim']['pico_rss_kib'] / 1024:.1f} MiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    gerar = sub.add_parser("gerar", help="Gera tráfego sintético em JSONL")
+    gerar.add_argument("--chats", type=int, default=2000)
+    gerar.add_argument("--rps", type=float, default=300, help="Entregas por segundo (aproximado)")
+    gerar.add_argument("--pensar", type=float, default=1.0, help="Segundos médios entre mensagens do mesmo chat")
+    gerar.add_argument("--duplicadas", type=float, default=0.05, help="Fração de mensagens reentregues")
+    gerar.add_argument("--status", type=float, default=0.2, help="Fração de mensagens com callback de status")
+    gerar.add_argument("--semente", type=int, default=42)
+    gerar.add_argument("--trafego", required=True)
+
+    repro = sub.add_parser("reproduzir", help="Reproduz um arquivo JSONL no /webhook")
+    repro.add_argument("--trafego", required=True)
+    repro.add_argument("--velocidade", type=float, default=1.0, help="Multiplicador do ritmo gravado (2 = 2x mais rápido)")
+    repro.add_argument("--conexoes", type=int, default=64)
+    repro.add_argument("--latencia-graph", type=float, default=0.02)
+    repro.add_argument("--timeout", type=float, default=30.0, help="Espera máxima pelas respostas no fim")
+    repro.add_argument("--url", default=None, help="Webhook de um bot já rodando (sem medir ponta a ponta)")
+    repro.add_argument("--estado-url", default=None)
+    repro.add_argument("--saida", default=None, help="Arquivo JSON com o resultado ('-' para imprimir)")
+    args = parser.parse_args()
+
+    if args.comando == "gerar":
+        eventos = gerar_trafego(args.chats, args.rps, args.pensar, args.duplicadas, args.status, args.semente)
+        with open(args.trafego, "w", encoding="utf-8") as f:
+            for t, payload, respostas in eventos:
+                f.write(json.dumps({"t": round(t, 4), "payload": payload, "respostas": respostas}, ensure_ascii=False) + "\n")
+        print(f"{len(eventos)} entregas gravadas em {args.trafego}")
+        return
+
+    eventos = ler_trafego(os.path.abspath(args.trafego))
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta) # Bancos do bot na pasta temporária
+        resultado = reproduzir(eventos, args)
+        resultado = asyncio.run(resultado)
+    imprimir(resultado)
+    if args.saida:
+        parametros = {chave: valor for chave, valor in vars(args).items() if chave not in ("saida", "comando")}
+        salvar_resultado(args.saida, "carga_whatsapp", parametros, resultado)
+    sys.exit(0 if resultado["sem_resposta"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
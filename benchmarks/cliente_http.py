@@ -0,0 +1,69 @@
+"""
+Cliente HTTP/1.1 mínimo (asyncio, keep-alive) para os benchmarks de carga.
+
+Mantém um pool fixo de conexões abertas, sem o custo por requisição de um cliente
+completo, para que o gargalo medido seja o servidor e não o gerador de carga.
+"""
+import asyncio
+
+
+class ClienteHTTP:
+    def __init__(self, host, porta, conexoes=32):
+        self.host = host
+        self.porta = porta
+        self.conexoes = conexoes
+        self._livres = asyncio.Queue()
+        for _ in range(conexoes):
+            self._livres.put_nowait(None) # Conexão aberta sob demanda
+
+    async def post(self, caminho, corpo, cabecalhos=None):
+        """Envia um POST e retorna (status, corpo da resposta)."""
+        return await self.requisitar("POST", caminho, corpo, cabecalhos)
+
+    async def get(self, caminho, cabecalhos=None):
+        return await self.requisitar("GET", caminho, b"", cabecalhos)
+
+    async def requisitar(self, metodo, caminho, corpo, cabecalhos=None):
+        extras = "".join(f"{nome}: {valor}\r\n" for nome, valor in (cabecalhos or {}).items())
+        pedido = (
+            f"{metodo} {caminho} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n{extras}\r\n"
+        ).encode("latin-1") + corpo
+
+        conexao = await self._livres.get()
+        try:
+            for tentativa in range(2):
+                if conexao is None:
+                    conexao = await asyncio.open_connection(self.host, self.porta)
+                reader, writer = conexao
+                try:
+                    writer.write(pedido)
+                    return await self._ler_resposta(reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # O servidor fechou a conexão keep-alive: reabre uma vez
+                    writer.close()
+                    conexao = None
+                    if tentativa:
+                        raise
+        finally:
+            self._livres.put_nowait(conexao)
+
+    @staticmethod
+    async def _ler_resposta(reader):
+        cabecalho = await reader.readuntil(b"\r\n\r\n")
+        linhas = cabecalho.decode("latin-1").split("\r\n")
+        status = int(linhas[0].split(" ", 2)[1])
+        tamanho = 0
+        for linha in linhas[1:]:
+            nome, _, valor = linha.partition(":")
+            if nome.strip().lower() == "content-length":
+                tamanho = int(valor)
+        corpo = await reader.readexactly(tamanho) if tamanho else b""
+        return status, corpo
+
+    async def fechar(self):
+        while not self._livres.empty():
+            conexao = self._livres.get_nowait()
+            if conexao is not None:
+                conexao[1].close()
+
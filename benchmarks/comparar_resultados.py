@@ -0,0 +1,75 @@
+"""
+Compara resultados dos testes de carga (JSON gravado com --saida) entre versões.
+
+Mostra as métricas principais (percentis, taxas, erros e memória) de cada arquivo lado a
+lado, com a variação percentual em relação ao primeiro (a versão de referência).
+
+Uso: python benchmarks/comparar_resultados.py antes.json depois.json [--todas]
+"""
+import argparse
+import json
+import os
+
+# Sufixos das métricas mostradas por padrão (--todas mostra todos os números)
+PRINCIPAIS = ("p50_ms", "p95_ms", "p99_ms", "por_segundo", "erros", "sem_resposta", "rss_kib")
+
+
+def achatar(dados, prefixo=""):
+    """{'post': {'p50_ms': 1}} -> {'post.p50_ms': 1}. Listas de cenários usam o nº de workers, se houver."""
+    planos = {}
+    if isinstance(dados, dict):
+        for chave, valor in dados.items():
+            planos.update(achatar(valor, f"{prefixo}{chave}."))
+    elif isinstance(dados, list):
+        for i, valor in enumerate(dados):
+            rotulo = f"w{valor['workers']}" if isinstance(valor, dict) and "workers" in valor else str(i)
+            planos.update(achatar(valor, f"{prefixo}{rotulo}."))
+    elif isinstance(dados, (int, float)) and not isinstance(dados, bool):
+        planos[prefixo.rstrip(".")] = dados
+    return planos
+
+
+def carregar(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        dados = json.load(f)
+    return dados, achatar(dados["resultados"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("arquivos", nargs="+")
+    parser.add_argument("--todas", action="store_true", help="Mostra todas as métricas numéricas")
+    args = parser.parse_args()
+
+    carregados = [carregar(caminho) for caminho in args.arquivos]
+    benchmarks = {dados["benchmark"] for dados, _ in carregados}
+    if len(benchmarks) > 1:
+        print(f"Aviso: comparando benchmarks diferentes ({', '.join(sorted(benchmarks))})")
+
+    rotulos = []
+    for caminho, (dados, _) in zip(args.arquivos, carregados):
+        commit = dados["metadados"].get("commit") or "?"
+        rotulos.append(f"{os.path.basename(caminho)}@{commit}")
+    print(f"{'métrica':<52}" + "".join(f"{rotulo:>28}" for rotulo in rotulos))
+
+    referencia = carregados[0][1]
+    chaves = list(referencia)
+    for _, metricas in carregados[1:]:
+        chaves += [chave for chave in metricas if chave not in referencia and chave not in chaves]
+    for chave in chaves:
+        if not args.todas and not chave.endswith(PRINCIPAIS):
+            continue
+        colunas = []
+        for _, metricas in carregados:
+            valor = metricas.get(chave)
+            if valor is None:
+                colunas.append(f"{'-':>28}")
+                continue
+            base = referencia.get(chave)
+            variacao = f" ({(valor - base) / base * 100:+.1f}%)" if base and metricas is not referencia else ""
+            colunas.append(f"{valor:>28,.2f}" if not variacao else f"{f'{valor:,.2f}{variacao}':>28}")
+        print(f"{chave:<52}" + "".join(colunas))
+
+
+if __name__ == "__main__":
+    main()
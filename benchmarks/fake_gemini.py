@@ -0,0 +1,146 @@
+"""
+Servidor falso da API do Gemini (generateContent e streamGenerateContent via SSE).
+
+A latência é configurável: a resposta completa leva 'latencia' segundos (com variação
+aleatória) e, em streaming, chega em 'pedacos' partes espaçadas igualmente. Uma fração
+'taxa_erros' das chamadas responde 503, como quando o modelo está sobrecarregado, e uma
+fração 'taxa_lentas' leva 'latencia_lenta' segundos (cauda longa). 'por_modelo' troca esses
+valores para um modelo, ex: {"gemini-1.5-flash": {"latencia": 30}} (incidente só no principal);
+os atributos podem ser alterados com o servidor rodando.
+O cliente do bot aponta para ele com:
+    genai.Client(api_key="x", http_options=types.HttpOptions(base_url=fake.base_url))
+
+Uso: python benchmarks/fake_gemini.py --porta 8083 --latencia 1.5 --pedacos 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servidor_http import Resposta, ServidorHTTP, resposta_json
+
+MODELOS = ("gemini-1.5-flash", "gemini-1.5-flash-8b")
+
+
+class FakeGemini:
+    def __init__(self, porta=0, latencia=1.0, pedacos=4, variacao=0.2, taxa_erros=0.0, modelos=MODELOS,
+                 taxa_lentas=0.0, latencia_lenta=10.0, por_modelo=None):
+        self.latencia = latencia
+        self.pedacos = max(1, pedacos)
+        self.variacao = variacao
+        self.taxa_erros = taxa_erros
+        self.taxa_lentas = taxa_lentas
+        self.latencia_lenta = latencia_lenta
+        self.por_modelo = por_modelo or {} # Chave: modelo, Valor: dict com os atributos acima trocados
+        self.chamadas = 0
+        self.erros = 0
+        self.chamadas_por_modelo = dict.fromkeys(modelos, 0)
+        self.em_voo = 0
+        self.pico_em_voo = 0 # Chamadas simultâneas no pior momento (mede a concorrência do bot)
+        self.servidor = ServidorHTTP("127.0.0.1", porta)
+        for modelo in modelos:
+            self.servidor.rota("POST", f"/v1beta/models/{modelo}:generateContent",
+                               lambda requisicao, modelo=modelo: self._gerar(requisicao, modelo))
+            self.servidor.rota("POST", f"/v1beta/models/{modelo}:streamGenerateContent",
+                               lambda requisicao, modelo=modelo: self._gerar_stream(requisicao, modelo))
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.servidor.porta}/"
+
+    async def iniciar(self):
+        await self.servidor.iniciar()
+        return self
+
+    async def parar(self):
+        await self.servidor.parar()
+
+    def _config(self, modelo, nome):
+        return self.por_modelo.get(modelo, {}).get(nome, getattr(self, nome))
+
+    def _duracao(self, modelo):
+        if random.random() < self._config(modelo, "taxa_lentas"):
+            return self._config(modelo, "latencia_lenta")
+        latencia = self._config(modelo, "latencia")
+        return max(0.0, latencia * random.uniform(1 - self.variacao, 1 + self.variacao))
+
+    def _registrar(self, modelo):
+        """Conta a chamada. Retorna uma Resposta de erro simulado, ou None."""
+        self.chamadas += 1
+        self.chamadas_por_modelo[modelo] += 1
+        if random.random() < self._config(modelo, "taxa_erros"):
+            self.erros += 1
+            return resposta_json({"error": {"code": 503, "message": "Modelo sobrecarregado (simulado)",
+                                            "status": "UNAVAILABLE"}}, status=503)
+        return None
+
+    @staticmethod
+    def _texto(requisicao):
+        try:
+            return requisicao.json()["contents"][-1]["parts"][0]["text"] # A pergunta atual vem depois do histórico
+        except (ValueError, KeyError, IndexError, TypeError):
+            return ""
+
+    @staticmethod
+    def _candidato(texto, final):
+        dados = {"candidates": [{"content": {"role": "model", "parts": [{"text": texto}]}, "index": 0}]}
+        if final:
+            dados["candidates"][0]["finishReason"] = "STOP"
+            dados["usageMetadata"] = {"promptTokenCount": 120, "candidatesTokenCount": 60, "totalTokenCount": 180}
+        return dados
+
+    def _partes(self, pergunta):
+        texto = f"Resposta simulada do Gemini para: *{pergunta[:60]}*. " * 3
+        tamanho = -(-len(texto) // self.pedacos)
+        return [texto[i:i + tamanho] for i in range(0, len(texto), tamanho)]
+
+    async def _gerar(self, requisicao, modelo):
+        erro = self._registrar(modelo)
+        if erro:
+            return erro
+        self.em_voo += 1
+        self.pico_em_voo = max(self.pico_em_voo, self.em_voo)
+        try:
+            await asyncio.sleep(self._duracao(modelo))
+        finally:
+            self.em_voo -= 1
+        return resposta_json(self._candidato("".join(self._partes(self._texto(requisicao))), final=True))
+
+    async def _gerar_stream(self, requisicao, modelo):
+        erro = self._registrar(modelo)
+        if erro:
+            return erro
+        partes = self._partes(self._texto(requisicao))
+        intervalo = self._duracao(modelo) / len(partes)
+
+        async def eventos():
+            self.em_voo += 1
+            self.pico_em_voo = max(self.pico_em_voo, self.em_voo)
+            try:
+                for i, parte in enumerate(partes):
+                    await asyncio.sleep(intervalo)
+                    dados = self._candidato(parte, final=i == len(partes) - 1)
+                    yield f"data: {json.dumps(dados, ensure_ascii=False)}\r\n\r\n".encode()
+            finally:
+                self.em_voo -= 1
+
+        return Resposta(200, eventos(), "text/event-stream")
+
+
+async def _main(args):
+    fake = await FakeGemini(args.porta, args.latencia, args.pedacos, taxa_erros=args.erros).iniciar()
+    print(f"Fake Gemini em {fake.base_url} (latência {args.latencia}s, {args.pedacos} pedaços)")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--porta", type=int, default=8083)
+    parser.add_argument("--latencia", type=float, default=1.0)
+    parser.add_argument("--pedacos", type=int, default=4)
+    parser.add_argument("--erros", type=float, default=0.0)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,108 @@
+"""
+Servidor falso da Graph API do WhatsApp para testes locais do envio.
+
+Responde ao POST /messages com latência configurável e uma fração de
+respostas 429/503, para exercitar o pool de conexões e as novas tentativas.
+
+Uso: python benchmarks/fake_graph_api.py --mensagens 500 --latencia 0.05 --falhas 0.1
+(sobe o servidor, dispara um follow-up em massa com EnviadorWhatsApp e imprime o resumo)
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeGraphAPI(ThreadingHTTPServer):
+    """Servidor HTTP que imita o endpoint /messages da Graph API."""
+
+    daemon_threads = True
+
+    def __init__(self, endereco=("127.0.0.1", 0), latencia=0.0, taxa_falhas=0.0, ao_receber=None):
+        super().__init__(endereco, _Handler)
+        self.latencia = latencia
+        self.taxa_falhas = taxa_falhas
+        # ao_receber(destinatario, instante): chamado (na thread do servidor) a cada mensagem aceita
+        self.ao_receber = ao_receber
+        self.recebidas = 0
+        self.conexoes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/messages"
+
+    def iniciar(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive: permite medir o reaproveitamento de conexões
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.conexoes += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.latencia:
+            time.sleep(self.server.latencia)
+
+        if random.random() < self.server.taxa_falhas:
+            status, resposta = random.choice([429, 503]), {"error": {"message": "simulado"}}
+        else:
+            with self.server._lock:
+                self.server.recebidas += 1
+            para = json.loads(corpo).get("to")
+            status, resposta = 200, {"messages": [{"id": f"wamid.{para}.{time.monotonic_ns()}"}]}
+            if self.server.ao_receber:
+                self.server.ao_receber(para, time.perf_counter())
+
+        dados = json.dumps(resposta).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        if status == 429:
+            self.send_header("Retry-After", "0.1")
+        self.end_headers()
+        self.wfile.write(dados)
+
+
+def main():
+    from envio_whatsapp import EnviadorWhatsApp
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mensagens", type=int, default=500)
+    parser.add_argument("--latencia", type=float, default=0.05)
+    parser.add_argument("--falhas", type=float, default=0.1)
+    parser.add_argument("--taxa", type=float, default=200)
+    parser.add_argument("--concorrencia", type=int, default=20)
+    args = parser.parse_args()
+
+    servidor = FakeGraphAPI(latencia=args.latencia, taxa_falhas=args.falhas).iniciar()
+    enviador = EnviadorWhatsApp(servidor.url, "token-de-teste", msgs_por_segundo=args.taxa,
+                                max_concorrentes=args.concorrencia, simulado=False)
+
+    mensagens = [(str(n), {"messaging_product": "whatsapp", "to": str(n), "type": "text", "text": {"body": "oi"}})
+                 for n in range(args.mensagens)]
+    resumo = enviador.enviar_em_massa(mensagens)
+    servidor.shutdown()
+
+    print(f"{resumo['enviados']}/{resumo['total']} enviados em {resumo['duracao']:.2f}s "
+          f"({resumo['total'] / resumo['duracao']:.0f} msg/s), {resumo['falhas']} falhas, "
+          f"{servidor.conexoes} conexões TCP abertas no servidor")
+
+
+if __name__ == "__main__":
+    main()
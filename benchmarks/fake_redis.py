@@ -0,0 +1,172 @@
+"""
+Servidor mínimo compatível com o protocolo Redis (RESP2), para testes locais.
+
+Implementa só os comandos usados pelos bots (hashes de prospects e de estado, dedup e travas com SET NX EX/PX)
+e guarda tudo em memória, com um único lock, então cada comando é atômico como no Redis. De Lua, só
+entende o script de comparar e apagar usado para liberar as travas (EVAL/EVALSHA/SCRIPT LOAD).
+
+Uso: python benchmarks/fake_redis.py --porta 6390 [--latencia 0.002]
+"""
+import argparse
+import hashlib
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            comando = self._ler_comando()
+            if comando is None:
+                return
+            resposta = self.server.executar(comando)
+            if self.server.latencia:
+                time.sleep(self.server.latencia) # Ida e volta pela rede
+            self.wfile.write(resposta)
+
+    def _ler_comando(self):
+        linha = self.rfile.readline()
+        if not linha:
+            return None
+        if not linha.startswith(b"*"):
+            return linha.split() # Comando inline (ex: via telnet)
+        argumentos = []
+        for _ in range(int(linha[1:])):
+            tamanho = int(self.rfile.readline()[1:])
+            argumentos.append(self.rfile.read(tamanho + 2)[:-2])
+        return argumentos
+
+
+def _bulk(valor):
+    if valor is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(valor), valor)
+
+
+def _inteiro(valor):
+    return b":%d\r\n" % valor
+
+
+OK = b"+OK\r\n"
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, endereco=("127.0.0.1", 0), latencia=0.0):
+        super().__init__(endereco, _Handler)
+        self.latencia = latencia # Segundos somados a cada resposta (Redis em outra máquina)
+        self._dados = {}
+        self._expira = {}
+        self._scripts = {} # Chave: SHA1 do script, Valor: texto
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        # Só falamos RESP2: o parâmetro evita que o cliente tente negociar RESP3 (HELLO 3)
+        return f"redis://{self.server_address[0]}:{self.server_address[1]}/0?protocol=2"
+
+    def iniciar(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def _obter(self, chave):
+        expira = self._expira.get(chave)
+        if expira is not None and expira <= time.monotonic():
+            self._dados.pop(chave, None)
+            del self._expira[chave]
+        return self._dados.get(chave)
+
+    def executar(self, argumentos):
+        nome = argumentos[0].upper()
+        args = argumentos[1:]
+        with self._lock:
+            if nome == b"PING":
+                return b"+PONG\r\n"
+            if nome in (b"CLIENT", b"SELECT"):
+                return OK
+            if nome == b"SET":
+                chave, valor = args[0], args[1]
+                opcoes = [a.upper() for a in args[2:]]
+                if b"NX" in opcoes and self._obter(chave) is not None:
+                    return _bulk(None)
+                self._dados[chave] = valor
+                self._expira.pop(chave, None)
+                if b"EX" in opcoes:
+                    self._expira[chave] = time.monotonic() + int(args[2 + opcoes.index(b"EX") + 1])
+                if b"PX" in opcoes:
+                    self._expira[chave] = time.monotonic() + int(args[2 + opcoes.index(b"PX") + 1]) / 1000
+                return OK
+            if nome == b"DEL":
+                removidas = 0
+                for chave in args:
+                    removidas += self._obter(chave) is not None
+                    self._dados.pop(chave, None)
+                    self._expira.pop(chave, None)
+                return _inteiro(removidas)
+            if nome == b"GET":
+                return _bulk(self._obter(args[0]))
+            if nome == b"HSETNX":
+                campos = self._dados.setdefault(args[0], {})
+                if args[1] in campos:
+                    return _inteiro(0)
+                campos[args[1]] = args[2]
+                return _inteiro(1)
+            if nome == b"HSET":
+                campos = self._dados.setdefault(args[0], {})
+                novos = 0
+                for campo, valor in zip(args[1::2], args[2::2]):
+                    novos += campo not in campos
+                    campos[campo] = valor
+                return _inteiro(novos)
+            if nome == b"HGET":
+                return _bulk(self._dados.get(args[0], {}).get(args[1]))
+            if nome == b"HDEL":
+                campos = self._dados.get(args[0], {})
+                return _inteiro(sum(1 for campo in args[1:] if campos.pop(campo, None) is not None))
+            if nome == b"HLEN":
+                return _inteiro(len(self._dados.get(args[0], {})))
+            if nome == b"HGETALL":
+                campos = self._dados.get(args[0], {})
+                resposta = [b"*%d\r\n" % (len(campos) * 2)]
+                for campo, valor in campos.items():
+                    resposta.append(_bulk(campo))
+                    resposta.append(_bulk(valor))
+                return b"".join(resposta)
+            if nome == b"SCRIPT" and args[0].upper() == b"LOAD":
+                sha = hashlib.sha1(args[1]).hexdigest().encode()
+                self._scripts[sha] = args[1]
+                return _bulk(sha)
+            if nome in (b"EVAL", b"EVALSHA"):
+                script = args[0] if nome == b"EVAL" else self._scripts.get(args[0].lower())
+                if script is None:
+                    return b"-NOSCRIPT No matching script. Please use EVAL.\r\n"
+                return self._executar_script(script, args[2:2 + int(args[1])], args[2 + int(args[1]):])
+            if nome == b"FLUSHDB":
+                self._dados.clear()
+                self._expira.clear()
+                return OK
+        return b"-ERR unknown command '%s'\r\n" % nome
+
+
+    def _executar_script(self, script, chaves, argumentos):
+        # Comparar e apagar: "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end"
+        if b"redis.call('get', KEYS[1]) == ARGV[1]" in script and b"redis.call('del', KEYS[1])" in script:
+            if self._obter(chaves[0]) != argumentos[0]:
+                return _inteiro(0)
+            self._dados.pop(chaves[0], None)
+            self._expira.pop(chaves[0], None)
+            return _inteiro(1)
+        return b"-ERR script nao suportado pelo fake\r\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--porta", type=int, default=6390)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de ida e volta simulados por comando")
+    args = parser.parse_args()
+    servidor = FakeRedis(("127.0.0.1", args.porta), args.latencia)
+    print(f"Fake Redis ouvindo em {servidor.url}")
+    servidor.serve_forever()
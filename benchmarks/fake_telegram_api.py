@@ -0,0 +1,90 @@
+"""
+Servidor falso da Bot API do Telegram, para testes locais sem rede.
+
+Atende os métodos que o bot usa (getMe, sendMessage, editMessageText, sendChatAction,
+setWebhook, deleteWebhook), com latência configurável, e registra cada mensagem
+enviada. O bot aponta para ele com base_url="http://127.0.0.1:<porta>/bot".
+
+Uso: python benchmarks/fake_telegram_api.py --porta 8082 --latencia 0.05
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+from urllib.parse import parse_qsl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servidor_http import ServidorHTTP, resposta_json
+
+TOKEN_FALSO = "123456:TESTE"
+
+METODOS = ("getMe", "sendMessage", "editMessageText", "sendChatAction", "setWebhook", "deleteWebhook")
+
+
+class FakeTelegramAPI:
+    """'ao_enviar(chat_id, texto, instante)' é chamado a cada sendMessage (no event loop do servidor)."""
+
+    def __init__(self, token=TOKEN_FALSO, porta=0, latencia=0.0, ao_enviar=None):
+        self.token = token
+        self.latencia = latencia
+        self.ao_enviar = ao_enviar
+        self.chamadas = dict.fromkeys(METODOS, 0)
+        self._ids = itertools.count(1)
+        self.servidor = ServidorHTTP("127.0.0.1", porta)
+        for metodo in METODOS:
+            self.servidor.rota("POST", f"/bot{token}/{metodo}", self._handler(metodo))
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.servidor.porta}/bot"
+
+    async def iniciar(self):
+        await self.servidor.iniciar()
+        return self
+
+    async def parar(self):
+        await self.servidor.parar()
+
+    def _handler(self, metodo):
+        async def atender(requisicao):
+            self.chamadas[metodo] += 1
+            if requisicao.cabecalhos.get("content-type", "").startswith("application/json"):
+                dados = requisicao.json() if requisicao.corpo else {}
+            else:
+                dados = dict(parse_qsl(requisicao.corpo.decode()))
+            if self.latencia:
+                await asyncio.sleep(self.latencia)
+            return resposta_json({"ok": True, "result": self._resultado(metodo, dados)})
+        return atender
+
+    def _resultado(self, metodo, dados):
+        if metodo == "getMe":
+            return {"id": int(self.token.split(":")[0]), "is_bot": True, "first_name": "Bot Teste", "username": "bot_teste"}
+        if metodo in ("sendMessage", "editMessageText"):
+            chat_id = int(dados["chat_id"])
+            if metodo == "sendMessage" and self.ao_enviar:
+                self.ao_enviar(chat_id, dados.get("text", ""), time.perf_counter())
+            return {
+                "message_id": int(dados.get("message_id") or next(self._ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": dados.get("text", ""),
+            }
+        return True
+
+
+async def _main(porta, latencia):
+    api = await FakeTelegramAPI(porta=porta, latencia=latencia).iniciar()
+    print(f"Fake Bot API em {api.base_url} (token {api.token})")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--porta", type=int, default=8082)
+    parser.add_argument("--latencia", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(_main(args.porta, args.latencia))
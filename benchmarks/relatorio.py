@@ -0,0 +1,74 @@
+"""
+Utilitários dos testes de carga: percentis, memória dos processos e resultado em JSON.
+
+O resultado de cada execução é um JSON com metadados (commit, data, Python, CPUs), os
+parâmetros usados e as métricas, para comparar versões com comparar_resultados.py.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentil(valores, p):
+    """Percentil (0-100) por posição numa lista já ordenada."""
+    if not valores:
+        return 0.0
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def resumo_latencias(segundos):
+    """Resumo (em milissegundos) de uma lista de latências em segundos."""
+    valores = sorted(segundos)
+    if not valores:
+        return {"n": 0}
+    return {
+        "n": len(valores),
+        "media_ms": round(sum(valores) / len(valores) * 1000, 3),
+        "p50_ms": round(percentil(valores, 50) * 1000, 3),
+        "p95_ms": round(percentil(valores, 95) * 1000, 3),
+        "p99_ms": round(percentil(valores, 99) * 1000, 3),
+        "max_ms": round(valores[-1] * 1000, 3),
+    }
+
+
+def memoria_processo(pid=None):
+    """Memória residente atual e o pico (KiB) de um processo, lidos de /proc (Linux). None se indisponível."""
+    try:
+        with open(f"/proc/{pid or os.getpid()}/status") as f:
+            campos = dict(linha.split(":", 1) for linha in f if ":" in linha)
+        return {"rss_kib": int(campos["VmRSS"].split()[0]), "pico_rss_kib": int(campos["VmHWM"].split()[0])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def metadados():
+    try:
+        commit = subprocess.run(["git", "-C", RAIZ, "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "commit": commit,
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def salvar_resultado(caminho, benchmark, parametros, resultados):
+    """Grava (ou imprime, com caminho '-') o resultado em JSON."""
+    dados = {"benchmark": benchmark, "metadados": metadados(), "parametros": parametros, "resultados": resultados}
+    texto = json.dumps(dados, ensure_ascii=False, indent=2)
+    if caminho == "-":
+        print(texto)
+    else:
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+        print(f"Resultado gravado em {caminho}", file=sys.stderr)
+    return dados
@@ -0,0 +1,161 @@
+"""
+Teste de resistência (soak) do estado das conversas do bot do Telegram.
+
+Passa um milhão de chats distintos pelo Application real do bot (ConversationHandler,
+handlers e filtros do fluxo), sem rede: o envio das respostas é trocado por uma função
+vazia. Cada chat manda /start e "Sou Cliente" e abandona a conversa no meio do menu, o
+pior caso para o dicionário de conversas do PTB. O relógio das conversas é simulado
+(--ritmo chats por segundo), então as horas de tráfego passam em poucos minutos.
+
+A cada lote imprime a memória residente do processo, as conversas em andamento e as já
+esquecidas. Com expiração, depois do primeiro tempo limite a memória tem que parar de
+crescer: o teste falha se o número de conversas passar do máximo teórico ou se a memória
+crescer mais que --tolerancia MiB depois do aquecimento. --tempo-limite 0 roda sem
+expiração (o comportamento antigo), para comparar.
+
+Uso: python benchmarks/soak_conversas.py --chats 1000000 --ritmo 20 [--tempo-limite 1800] [--saida r.json]
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import sys
+import tempfile
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+sys.path.insert(0, PASTA)
+
+from telegram import Update
+
+from fake_telegram_api import TOKEN_FALSO, FakeTelegramAPI
+from fluxo_conversa import TELEGRAM, carregar_fluxo
+from relatorio import memoria_processo, salvar_resultado
+
+fluxo = carregar_fluxo(TELEGRAM)
+SOU_CLIENTE = next(titulo for resposta in fluxo.respostas.values()
+                   for id_no, titulo in resposta.opcoes if id_no == "sou_cliente")
+
+
+def update_sintetico(bot_telegram, update_id, chat_id, texto):
+    mensagem = {
+        "message_id": update_id,
+        "date": 1700000000,
+        "chat": {"id": chat_id, "type": "private", "first_name": "Cliente"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "Cliente"},
+        "text": texto,
+    }
+    if texto.startswith("/"):
+        mensagem["entities"] = [{"type": "bot_command", "offset": 0, "length": len(texto)}]
+    return Update.de_json({"update_id": update_id, "message": mensagem}, bot_telegram)
+
+
+async def executar(bot, args):
+    from conversas_expiraveis import ConversasExpiraveis, expirar_conversas, trocar_conversas
+
+    async def enviar_nada(update, context, texto, keyboard=None):
+        pass
+
+    bot.enviar_texto = enviar_nada # Sem rede: o que interessa é o estado guardado por chat
+    api = await FakeTelegramAPI().iniciar() # Só para o getMe do initialize
+    application = bot.montar_aplicacao(token=TOKEN_FALSO, base_url=api.base_url)
+    await application.initialize()
+    conv_handler = application.handlers[0][0]
+
+    agora = [0.0]
+    if args.tempo_limite:
+        # Mesmo mapeamento que o bot usa, com o relógio simulado
+        atual = bot.conversas_telegram
+        bot.conversas_telegram = ConversasExpiraveis(args.tempo_limite, args.largura_balde, atual.ao_expirar,
+                                                     relogio=lambda: agora[0])
+        expirar_conversas(conv_handler, bot.conversas_telegram)
+    else:
+        bot.conversas_telegram = {}
+        trocar_conversas(conv_handler, bot.conversas_telegram)
+
+    lote = max(1, args.chats // args.amostras)
+    amostras = []
+    inicio = time.perf_counter()
+    update_id = 0
+    for chat_id in range(1, args.chats + 1):
+        agora[0] = chat_id / args.ritmo
+        for texto in ("/start", SOU_CLIENTE):
+            update_id += 1
+            await application.process_update(update_sintetico(application.bot, update_id, 10 ** 9 + chat_id, texto))
+        if chat_id % lote == 0:
+            gc.collect()
+            amostra = {
+                "chats": chat_id,
+                "horas_simuladas": round(agora[0] / 3600, 2),
+                "rss_mib": round(memoria_processo()["rss_kib"] / 1024, 1),
+                "conversas": len(bot.conversas_telegram),
+                "expiradas": getattr(bot.conversas_telegram, "expiradas", 0),
+                "user_data": len(application.user_data),
+            }
+            amostras.append(amostra)
+            print(f"  {amostra['chats']:>9,} chats ({amostra['horas_simuladas']:6.1f} h) -> {amostra['rss_mib']:7.1f} MiB, "
+                  f"{amostra['conversas']:>9,} conversas, {amostra['expiradas']:>9,} esquecidas, "
+                  f"{amostra['user_data']:,} user_data", flush=True)
+    duracao = time.perf_counter() - inicio
+    await application.shutdown()
+    await api.parar()
+    return amostras, duracao, update_id
+
+
+def verificar(args, amostras):
+    """Erros encontrados (lista vazia = memória estável)."""
+    if not args.tempo_limite:
+        return []
+    erros = []
+    # Conversas vivas: no máximo as que chegaram no tempo limite mais dois baldes
+    maximo = int(args.ritmo * (args.tempo_limite + 2 * args.largura_balde)) + 1
+    maior = max(amostra["conversas"] for amostra in amostras)
+    if maior > maximo:
+        erros.append(f"{maior:,} conversas em andamento (máximo esperado: {maximo:,})")
+    # Aquecimento: até o primeiro tempo limite passar (o dobro, para os dicionários chegarem ao tamanho final)
+    aquecidas = [amostra for amostra in amostras if amostra["horas_simuladas"] * 3600 >= 2 * args.tempo_limite]
+    if len(aquecidas) >= 2:
+        crescimento = aquecidas[-1]["rss_mib"] - aquecidas[0]["rss_mib"]
+        if crescimento > args.tolerancia:
+            erros.append(f"memória cresceu {crescimento:.1f} MiB depois do aquecimento (tolerância: {args.tolerancia} MiB)")
+    if any(amostra["user_data"] for amostra in amostras):
+        erros.append("user_data não está vazio")
+    return erros
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=1_000_000)
+    parser.add_argument("--ritmo", type=float, default=20.0, help="Chats novos por segundo (relógio simulado)")
+    parser.add_argument("--tempo-limite", type=float, default=1800, help="Segundos; 0 = sem expiração")
+    parser.add_argument("--largura-balde", type=float, default=60)
+    parser.add_argument("--amostras", type=int, default=20)
+    parser.add_argument("--tolerancia", type=float, default=8.0, help="MiB de crescimento aceitos depois do aquecimento")
+    parser.add_argument("--saida", default=None, help="Arquivo JSON com o resultado ('-' para imprimir)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        os.chdir(pasta) # O bot cria o banco local no diretório atual
+        import chatbot_telegram as bot
+        logging.getLogger().setLevel(logging.CRITICAL)
+        print(f"{args.chats:,} chats, {args.ritmo:g} por segundo, tempo limite "
+              f"{args.tempo_limite:g} s" if args.tempo_limite else f"{args.chats:,} chats, sem expiração")
+        amostras, duracao, updates = asyncio.run(executar(bot, args))
+        bot.armazem.fechar()
+
+    print(f"- {updates:,} updates em {duracao:.1f} s ({updates / duracao:,.0f} updates/s)")
+    erros = verificar(args, amostras)
+    if args.saida:
+        salvar_resultado(args.saida, "soak_conversas", vars(args),
+                         {"amostras": amostras, "duracao_s": round(duracao, 3), "erros": erros})
+    if erros:
+        print("FALHOU: " + "; ".join(erros))
+        sys.exit(1)
+    if args.tempo_limite:
+        print("OK: memória estável")
+
+
+if __name__ == "__main__":
+    main()
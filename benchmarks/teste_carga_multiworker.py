@@ -0,0 +1,120 @@
+"""
+Teste de carga multi-processo dos backends de estado (nenhum lead pode ser perdido).
+
+Simula W workers do Flask (processos), cada um com T threads registrando leads.
+Metade dos números é enviada por dois workers diferentes (reentrega / corrida).
+Um processo "follow-up" lê a lista o tempo todo. Ao final, confere que:
+- o conjunto final tem exatamente todos os números únicos;
+- cada número foi registrado como "novo" uma única vez;
+- o leitor nunca viu a lista diminuir.
+
+Uso: python benchmarks/teste_carga_multiworker.py --workers 4 --threads 4 --leads 5000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(PASTA))
+sys.path.insert(0, PASTA)
+
+from backend_estado import criar_backend
+from fake_redis import FakeRedis
+
+
+def numeros_do_worker(indice, workers, leads):
+    """Cada worker recebe sua fatia e também a fatia do vizinho pela metade (duplicatas entre processos)."""
+    fatia = leads // workers
+    proprios = range(indice * fatia, (indice + 1) * fatia)
+    vizinho = (indice + 1) % workers
+    duplicados = range(vizinho * fatia, vizinho * fatia + fatia // 2)
+    return [f"55419{n:08d}" for n in list(proprios) + list(duplicados)]
+
+
+def worker(url, indice, workers, threads, leads, novos):
+    numeros = numeros_do_worker(indice, workers, leads)
+    contagem = [0] * threads
+
+    def rodar(t):
+        backend = criar_backend(url)
+        for numero in numeros[t::threads]:
+            if backend.adicionar_prospect(numero, "Prospect"):
+                contagem[t] += 1
+
+    ts = [threading.Thread(target=rodar, args=(t,)) for t in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    novos.put(sum(contagem))
+
+
+def leitor(url, parar, resultado):
+    backend = criar_backend(url)
+    anterior, leituras, regressoes = 0, 0, 0
+    while not parar.is_set():
+        atual = len(backend.listar_prospects())
+        if atual < anterior:
+            regressoes += 1
+        anterior = atual
+        leituras += 1
+    resultado.put((leituras, regressoes))
+
+
+def executar(nome, url, args):
+    parar = multiprocessing.Event()
+    novos, resultado_leitor = multiprocessing.Queue(), multiprocessing.Queue()
+    proc_leitor = multiprocessing.Process(target=leitor, args=(url, parar, resultado_leitor))
+    proc_leitor.start()
+
+    inicio = time.perf_counter()
+    procs = [
+        multiprocessing.Process(target=worker, args=(url, i, args.workers, args.threads, args.leads, novos))
+        for i in range(args.workers)
+    ]
+    for p in procs:
+        p.start()
+    total_novos = sum(novos.get() for _ in procs)
+    for p in procs:
+        p.join()
+    duracao = time.perf_counter() - inicio
+
+    parar.set()
+    leituras, regressoes = resultado_leitor.get()
+    proc_leitor.join()
+
+    esperados = {n for i in range(args.workers) for n in numeros_do_worker(i, args.workers, args.leads)}
+    final = set(criar_backend(url).listar_prospects())
+    tentativas = sum(len(numeros_do_worker(i, args.workers, args.leads)) for i in range(args.workers))
+
+    ok = final == esperados and total_novos == len(esperados) and regressoes == 0
+    print(f"- {nome:<7} {tentativas} registros em {duracao:.2f}s ({tentativas / duracao:,.0f}/s): "
+          f"{len(final)}/{len(esperados)} leads, {total_novos} marcados como novos, "
+          f"{leituras} leituras do follow-up, {regressoes} regressões -> {'OK' if ok else 'FALHOU'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--leads", type=int, default=5000)
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        resultados.append(executar("sqlite", f"sqlite:///{os.path.join(pasta, 'estado.db')}", args))
+
+    redis_local = FakeRedis().iniciar()
+    resultados.append(executar("redis", redis_local.url, args))
+    redis_local.shutdown()
+
+    sys.exit(0 if all(resultados) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import hashlib
+import re
+import sys
+import time
+import unicodedata
+from collections import OrderedDict
+
+# --- Cache de Respostas do Gemini ---
+# Perguntas quase idênticas ("Quanto custa?", "quanto custa") caem na mesma chave,
+# evitando uma nova chamada ao LLM.
+
+_RE_NAO_ALFANUMERICO = re.compile(r"[\W_]+")
+
+
+def normalizar_pergunta(texto: str) -> str:
+    """Normaliza a pergunta: minúsculas, sem acentos, sem pontuação e com espaços simples."""
+    texto = unicodedata.normalize("NFKD", texto.casefold())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _RE_NAO_ALFANUMERICO.sub(" ", texto).strip()
+
+
+def hash_prompt(prompt: str) -> str:
+    """Hash curto do prompt de sistema. Alterar o prompt invalida as entradas antigas."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class CacheRespostas:
+    """Cache LRU com expiração (TTL) e teto aproximado de memória."""
+
+    def __init__(self, max_itens=1000, ttl_segundos=3600, max_bytes=4 * 1024 * 1024):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes = max_bytes
+
+        # Chave: (hash do prompt, pergunta normalizada), Valor: (expira_em, resposta, tamanho)
+        self._itens = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self._segundos_misses = 0.0 # Soma das latências das chamadas reais ao LLM
+
+    @staticmethod
+    def _tamanho(chave, resposta):
+        return sys.getsizeof(chave[1]) + sys.getsizeof(resposta)
+
+    def _remover(self, chave):
+        _, _, tamanho = self._itens.pop(chave)
+        self._bytes -= tamanho
+
+    def obter(self, pergunta, prompt_hash):
+        """Retorna a resposta em cache ou None (contabilizando hit/miss)."""
+        chave = (prompt_hash, normalizar_pergunta(pergunta))
+        item = self._itens.get(chave)
+
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                self._remover(chave)
+            self.misses += 1
+            return None
+
+        self._itens.move_to_end(chave)
+        self.hits += 1
+        return item[1]
+
+    def guardar(self, pergunta, prompt_hash, resposta, latencia=None):
+        """Armazena a resposta; 'latencia' é o tempo gasto pelo LLM para gerá-la."""
+        if latencia is not None:
+            self._segundos_misses += latencia
+
+        chave = (prompt_hash, normalizar_pergunta(pergunta))
+        if not chave[1]:
+            return
+
+        tamanho = self._tamanho(chave, resposta)
+        if tamanho > self.max_bytes:
+            return
+
+        if chave in self._itens:
+            self._remover(chave)
+
+        self._itens[chave] = (time.monotonic() + self.ttl_segundos, resposta, tamanho)
+        self._bytes += tamanho
+
+        # Despejo LRU até respeitar o número de itens e o teto de memória
+        while len(self._itens) > self.max_itens or self._bytes > self.max_bytes:
+            self._remover(next(iter(self._itens)))
+
+    def estatisticas(self):
+        """Contadores de uso do cache (para a CLI / logs)."""
+        total = self.hits + self.misses
+        media_miss = self._segundos_misses / self.misses if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": (self.hits / total) if total else 0.0,
+            "itens": len(self._itens),
+            "bytes": self._bytes,
+            # Estimativa: cada hit economizou uma chamada de duração média
+            "segundos_economizados": self.hits * media_miss,
+        }
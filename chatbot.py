@@ -1,6 +1,17 @@
+import atexit
+import logging
+import threading
 import time
-from flask import Flask, request, jsonify
-import requests
+from types import MappingProxyType
+from flask import Flask, Response, request, jsonify
+from envio_whatsapp import EnviadorWhatsApp
+from fila_webhook import FilaProcessamento, RECUSAR
+from parser_webhook import extrair_mensagens
+from dedup import DedupMemoria, DedupRedis
+from fluxo_conversa import carregar_fluxo, WHATSAPP
+from backend_estado import criar_backend
+from metricas import TIPO_CONTEUDO, registro
+from logs_estruturados import configurar_logs, logs_descartados
 
 app = Flask(__name__)
 
@@ -8,11 +19,47 @@ app = Flask(__name__)
 # Em um cenário real, você obterá estes dados do seu App no Meta Developers.
 WHATSAPP_API_URL = "https://graph.facebook.com/v19.0/SEU_ID_DO_NUMERO_DE_TELEFONE/messages"
 WHATSAPP_ACCESS_TOKEN = "SEU_TOKEN_DE_ACESSO_AQUI"
+# Limite de envio em massa (mensagens por segundo) e envios simultâneos
+WHATSAPP_MSGS_POR_SEGUNDO = 20
+WHATSAPP_MAX_CONCORRENTES = 10
+# Fila do webhook: tamanho máximo, trabalhadores e o que fazer quando encher
+# (RECUSAR -> responde 503 e a Meta reenvia; DESCARTAR_ANTIGA; BLOQUEAR)
+FILA_WEBHOOK_TAMANHO = 1000
+FILA_WEBHOOK_TRABALHADORES = 4
+FILA_WEBHOOK_AO_ENCHER = RECUSAR
+# Deduplicação de reentregas da Meta. Com vários workers do Flask, aponte para um Redis
+# compartilhado (ex: "redis://localhost:6379/0"); com None, cada processo usa a própria memória.
+DEDUP_REDIS_URL = None
+DEDUP_TTL_SEGUNDOS = 24 * 3600
+# Logs: uma thread em segundo plano escreve (JSON), os trabalhadores da fila só enfileiram.
+# Com LOG_NIVEL = "DEBUG", cada mensagem gera linhas com número, intenção e duracao_ms
+# (amostradas: 1 de cada LOG_AMOSTRAGEM_DEBUG de cada tipo).
+LOG_NIVEL = "INFO"
+LOG_JSON = True
+LOG_AMOSTRAGEM_DEBUG = 100
+LOG_ARQUIVO = None # None = stderr
 # --------------------------------------------------------------------------
 
-# Estrutura de dados para armazenar clientes em potencial para follow-up
-# Chave: Número de Telefone (ex: '5541987654321'), Valor: Nome (opcional)
-prospects_db = {} 
+logger = logging.getLogger(__name__)
+registro.medidor("chatbot_logs_descartados", "Registros de log descartados com a fila de escrita cheia", logs_descartados)
+
+# Enviador compartilhado (Session com conexões keep-alive). Simula o envio enquanto o token for o de exemplo.
+enviador = EnviadorWhatsApp(
+    WHATSAPP_API_URL,
+    WHATSAPP_ACCESS_TOKEN,
+    msgs_por_segundo=WHATSAPP_MSGS_POR_SEGUNDO,
+    max_concorrentes=WHATSAPP_MAX_CONCORRENTES
+)
+if enviador.simulado:
+    logger.warning("O token e a URL da API não são reais: apenas simulando o envio")
+
+# Estado compartilhado com os clientes em potencial para follow-up
+# (Número de Telefone, ex: '5541987654321' -> Nome). Todos os workers do Flask e o
+# envio de follow-up usam o mesmo backend:
+#   "memoria://" (um único processo / testes), "sqlite:///chatbot_whatsapp.db"
+#   (vários processos na mesma máquina) ou "redis://localhost:6379/0" (várias máquinas)
+ESTADO_URL = "sqlite:///chatbot_whatsapp.db"
+estado = criar_backend(ESTADO_URL)
 
 # --- Funções de Envio de Mensagem (Simuladas) ---
 
@@ -20,167 +67,139 @@ def enviar_mensagem(destinatario, tipo_mensagem, dados_mensagem):
     """
     Função para enviar uma mensagem via API do WhatsApp.
     
-    Em um ambiente real, esta função faria uma chamada POST para o WHATSAPP_API_URL.
+    Faz um POST para o WHATSAPP_API_URL reaproveitando as conexões do 'enviador'.
     
-    Para o nosso propósito didático, vamos apenas simular o envio.
+    Enquanto o token for o de exemplo, apenas simulamos o envio.
     """
-    if not WHATSAPP_ACCESS_TOKEN or "SEU_TOKEN_DE_ACESSO_AQUI" in WHATSAPP_ACCESS_TOKEN:
-        print("\n--- AVISO: O token e URL da API não são reais. Apenas simulando o envio. ---")
-    
-    print(f"\n[SIMULAÇÃO DE ENVIO] -> Para: {destinatario}")
-    print(f"[SIMULAÇÃO DE ENVIO] -> Tipo: {tipo_mensagem}")
-    print(f"[SIMULAÇÃO DE ENVIO] -> Conteúdo: {dados_mensagem}")
-    
-    # Exemplo de como a requisição real seria:
-    # headers = {"Authorization": f"Bearer {WHATSAPP_ACCESS_TOKEN}"}
-    # response = requests.post(WHATSAPP_API_URL, headers=headers, json=dados_mensagem)
-    # return response.json()
+    if enviador.simulado and logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Envio simulado", extra={"destinatario": destinatario, "tipo": tipo_mensagem, "conteudo": dados_mensagem})
     
-    return {"status": "success", "simulado": True}
+    return enviador.enviar(dados_mensagem)
 
 
-def enviar_texto(destinatario, texto):
-    """Envia uma mensagem de texto simples."""
-    dados_mensagem = {
+def montar_texto(destinatario, texto):
+    """Monta o payload de uma mensagem de texto simples."""
+    return {
         "messaging_product": "whatsapp",
         "to": destinatario,
         "type": "text",
         "text": {"body": texto}
     }
-    return enviar_mensagem(destinatario, "Texto", dados_mensagem)
 
 
-def enviar_lista_interativa(destinatario, corpo_msg, titulo_botao, secoes):
-    """
-    Envia uma mensagem de lista interativa (Menu).
-    (Requer o uso de templates na API real, simplificado aqui para demonstração)
-    """
-    dados_mensagem = {
-        "messaging_product": "whatsapp",
-        "to": destinatario,
-        "type": "interactive",
-        "interactive": {
-            "type": "list",
-            "body": {"text": corpo_msg},
-            "action": {
-                "button": titulo_botao,
-                "sections": secoes
+def enviar_texto(destinatario, texto):
+    """Envia uma mensagem de texto simples."""
+    return enviar_mensagem(destinatario, "Texto", montar_texto(destinatario, texto))
+
+
+# --- Lógica do Chatbot ---
+
+# Fluxo de conversa compartilhado com o bot do Telegram (fluxo.json), compilado na inicialização
+fluxo = carregar_fluxo(WHATSAPP)
+
+def montar_payload(resposta):
+    """Pré-monta o payload de um nó do fluxo (sem o destinatário). Retorna (tipo, payload)."""
+    if resposta.opcoes:
+        secoes = [{"rows": [{"id": id_opcao, "title": titulo} for id_opcao, titulo in resposta.opcoes]}]
+        return "Lista Interativa", {
+            "messaging_product": "whatsapp",
+            "type": "interactive",
+            "interactive": {
+                "type": "list",
+                "body": {"text": resposta.texto},
+                "action": {"button": resposta.botao, "sections": secoes}
             }
         }
+    return "Texto", {
+        "messaging_product": "whatsapp",
+        "type": "text",
+        "text": {"body": resposta.texto}
     }
-    return enviar_mensagem(destinatario, "Lista Interativa", dados_mensagem)
 
+# Chave: ID do nó, Valor: (tipo, payload). Montados uma única vez; não devem ser alterados.
+PAYLOADS = MappingProxyType({id_no: montar_payload(r) for id_no, r in fluxo.respostas.items() if r.texto})
 
-# --- Lógica do Chatbot ---
+# --- Métricas (expostas em /metrics no formato do Prometheus) ---
+LATENCIA_INTENCAO = registro.histograma(
+    "whatsapp_mensagem_segundos", "Tempo para tratar uma mensagem recebida (inclui o envio da resposta)", ("intencao",))
+registro.medidor("whatsapp_prospects", "Prospects registrados para follow-up", lambda: estado.quantidade_prospects())
 
 def processar_mensagem(remetente, mensagem_recebida):
     """
     Contém a lógica de conversação do chatbot.
     """
-    # Converter a mensagem recebida para minúsculas e remover espaços extras
-    msg_normalizada = mensagem_recebida.lower().strip()
-    
-    # --- Ramo Principal: Introdução e Opções Iniciais ---
-    
-    if msg_normalizada in ["olá", "oi", "bom dia", "começar", "menu"]:
-        apresentacao = (
-            "🤖 *Bem-vindo(a) à ITAC Desenvolvimento de Soluções Informatizadas!* "
-            "Sou seu assistente virtual. Em que posso te ajudar hoje?"
-        )
-        
-        # Estrutura do menu interativo (Botões de Lista):
-        secoes = [
-            {
-                "rows": [
-                    {"id": "sou_cliente", "title": "Sou Cliente"},
-                    {"id": "nao_sou_cliente", "title": "Ainda Não Sou Cliente"}
-                ]
-            }
-        ]
-        
-        enviar_lista_interativa(
-            remetente,
-            apresentacao,
-            "Escolha uma Opção",
-            secoes
-        )
-        return
-        
-    # --- Ramo 1: Sou Cliente ---
-    
-    elif msg_normalizada in ["sou cliente", "sou_cliente"]:
-        mensagem_cliente = (
-            "🤝 Olá! Ótimo ter você de volta. O que você precisa? "
-            "Como posso melhor atendê-lo(a)?"
-        )
-        
-        secoes_cliente = [
-            {
-                "rows": [
-                    {"id": "suporte_sla", "title": "Entrar em Contato com o Suporte SLA"},
-                    {"id": "contratual", "title": "Questões Contratuais"}
-                ]
-            }
-        ]
-        
-        enviar_lista_interativa(
-            remetente,
-            mensagem_cliente,
-            "Escolha o Assunto",
-            secoes_cliente
-        )
-        return
+    # Texto digitado ou ID interativo -> nó do fluxo (busca O(1)); sem correspondência, resposta padrão
+    intencao = fluxo.intencao(mensagem_recebida) or fluxo.fallback
+    resposta = fluxo.resposta(intencao)
 
-    # Sub-Ramos do "Sou Cliente"
-    
-    elif msg_normalizada == "suporte_sla":
-        resposta = (
-            "🚨 Entendido. Nosso time de Suporte SLA foi notificado. "
-            "Por favor, nos envie uma breve descrição do problema, e um técnico "
-            "entrará em contato com você em até 1 hora."
-        )
-        enviar_texto(remetente, resposta)
-        return
-        
-    elif msg_normalizada == "contratual":
-        resposta = (
-            "📝 Certo. Suas questões contratuais serão encaminhadas para o setor "
-            "administrativo. Em horário comercial, um especialista responderá "
-            "em até 2 horas. Por favor, especifique o contrato ou o tópico de interesse."
-        )
-        enviar_texto(remetente, resposta)
-        return
-        
-    # --- Ramo 2: Ainda Não Sou Cliente ---
-    
-    elif msg_normalizada in ["ainda não sou cliente", "nao_sou_cliente"]:
-        # Adiciona o número na lista de prospects para follow-up
-        if remetente not in prospects_db:
-             prospects_db[remetente] = "Prospect" # Você pode pedir o nome do prospect aqui
-             
-        resposta = (
-            "👋 Sem problemas! Estou feliz em ajudar a iniciar sua jornada. "
-            "Nós nos especializamos em soluções de software personalizadas para "
-            "pequenos negócios. Um de nossos consultores entrará em contato "
-            "com você em breve para entender melhor suas necessidades. "
-            "Obrigado pelo seu interesse!"
-        )
-        enviar_texto(remetente, resposta)
-
-        print(f"\n[DEBUG] Tamanho atual do prospects_db: {len(prospects_db)}")
-        print(f"\n[INFO] Número {remetente} adicionado aos prospects para follow-up.")
-        return
-        
-    # --- Resposta Padrão (Fallback) ---
-    
-    else:
-        # Tenta reenviar a mensagem de boas-vindas para reiniciar o fluxo
-        enviar_texto(
-            remetente, 
-            "🤔 Não entendi sua resposta. Por favor, digite *Olá* ou *Menu* para ver as opções, "
-            "ou tente selecionar uma das opções interativas anteriores."
-        )
+    inicio = time.perf_counter()
+    try:
+        tipo, payload = PAYLOADS[intencao]
+        enviar_mensagem(remetente, tipo, {**payload, "to": remetente})
+
+        # --- Ramo "Ainda Não Sou Cliente": adiciona o número na lista de prospects para follow-up ---
+        if resposta.acao == "registrar_prospect":
+            # Operação atômica no backend: dois workers não duplicam nem perdem o mesmo lead
+            if estado.adicionar_prospect(remetente, "Prospect"): # Você pode pedir o nome do prospect aqui
+                logger.info("Adicionado aos prospects para follow-up", extra={"numero": remetente})
+    finally:
+        duracao = time.perf_counter() - inicio
+        LATENCIA_INTENCAO.observar(duracao, intencao)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Mensagem tratada", extra={"numero": remetente, "intencao": intencao,
+                                                    "duracao_ms": round(duracao * 1000, 2)})
+
+def criar_dedup():
+    """Índice de IDs já processados: Redis compartilhado se configurado, senão em memória."""
+    if DEDUP_REDIS_URL:
+        import redis # Dependência opcional, só necessária com vários workers
+        return DedupRedis(redis.Redis.from_url(DEDUP_REDIS_URL), ttl=DEDUP_TTL_SEGUNDOS)
+    return DedupMemoria(ttl=DEDUP_TTL_SEGUNDOS)
+
+dedup_mensagens = criar_dedup()
+
+def processar_lote(mensagens):
+    """Processa, em ordem, todas as mensagens de uma entrega do webhook."""
+    for id_mensagem, remetente, conteudo in mensagens:
+        try:
+            # Reentrega de uma mensagem já tratada: descartamos para não responder duas vezes
+            if id_mensagem and not dedup_mensagens.e_nova(id_mensagem):
+                continue
+            processar_mensagem(remetente, conteudo)
+        except Exception:
+            # Uma mensagem com problema (ou o dedup fora do ar) não impede o processamento das demais do lote
+            logger.exception("Erro ao processar mensagem", extra={"id_mensagem": id_mensagem, "numero": remetente})
+
+# Fila de processamento: o webhook apenas enfileira o lote e os trabalhadores chamam processar_lote
+fila_mensagens = FilaProcessamento(
+    processar_lote,
+    tamanho_max=FILA_WEBHOOK_TAMANHO,
+    trabalhadores=FILA_WEBHOOK_TRABALHADORES,
+    ao_encher=FILA_WEBHOOK_AO_ENCHER
+)
+
+registro.medidor("whatsapp_fila_webhook_profundidade", "Lotes aguardando na fila do webhook",
+                 lambda: fila_mensagens.estatisticas()["profundidade"])
+
+# As threads da fila (e a de escrita dos logs) não sobem na importação: com 'gunicorn --preload'
+# o módulo é importado no processo mestre, e threads não sobrevivem ao fork dos workers.
+# Cada processo as inicia no primeiro POST do webhook (ou no __main__) e, ao sair, processa
+# o que já foi aceito antes de encerrar.
+_processo_iniciado = False
+_lock_inicio = threading.Lock()
+
+def iniciar_processo():
+    """Sobe os logs e os trabalhadores da fila neste processo (uma única vez)."""
+    global _processo_iniciado
+    if _processo_iniciado:
         return
+    with _lock_inicio:
+        if _processo_iniciado:
+            return
+        configurar_logs(LOG_NIVEL, LOG_JSON, LOG_AMOSTRAGEM_DEBUG, LOG_ARQUIVO)
+        fila_mensagens.iniciar()
+        atexit.register(fila_mensagens.encerrar)
+        _processo_iniciado = True
 
 # --- Rota do Webhook do Flask ---
 
@@ -204,41 +223,45 @@ def webhook():
 
     # 2. Recebimento de Mensagens (POST)
     elif request.method == 'POST':
+        iniciar_processo()
         data = request.get_json()
         
-        # Lógica para extrair a mensagem do payload (altamente simplificado)
         try:
-            # Em um cenário real, você teria que navegar na estrutura JSON complexa
-            # Ex: data['entry'][0]['changes'][0]['value']['messages'][0]
-            
-            # SIMULAÇÃO: Assumimos um formato simples para fins de teste
+            # Uma entrega pode trazer várias mensagens e status:
+            # data['entry'][]['changes'][]['value']['messages'][]
+            # Cada item é (id da mensagem, remetente, texto ou ID interativo selecionado)
+            mensagens = extrair_mensagens(data)
             
-            # Remetente: o número de quem enviou (ex: '5541987654321')
-            remetente = data.get('from') 
-            
-            # Mensagem: o texto ou o ID interativo selecionado
-            mensagem_recebida = data.get('text')
-            
-            # Se o remetente e a mensagem existirem, processamos.
-            if remetente and mensagem_recebida:
-                processar_mensagem(remetente, mensagem_recebida)
+            # O lote inteiro vai para a fila de uma vez (status puros não geram trabalho)
+            if mensagens:
+                if not fila_mensagens.enfileirar(mensagens):
+                    # Fila cheia: pedimos para a API do WhatsApp reenviar mais tarde
+                    return jsonify({"status": "ocupado"}), 503
             
             # Retorna 200 para a API do WhatsApp, indicando que a mensagem foi recebida
             return jsonify({"status": "recebido"}), 200
             
-        except Exception as e:
+        except Exception:
             # Em caso de falha na extração (ex: mensagens de status), retornamos OK
-            print(f"Erro ao processar mensagem recebida: {e}")
+            logger.exception("Erro ao processar entrega do webhook")
             return jsonify({"status": "erro"}), 200
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas do processo no formato de texto do Prometheus (um alvo por worker do Flask)."""
+    return Response(registro.exportar(), content_type=TIPO_CONTEUDO)
+
+
 # --- Funcionalidade Adicional: Follow-up via Linha de Comando ---
 
 def enviar_follow_up():
     """
     Envia a mensagem de follow-up para todos os prospects armazenados.
     """
-    if not prospects_db:
+    # Retrato consistente dos prospects de todos os workers
+    prospects = estado.listar_prospects()
+    if not prospects:
         print("\n[INFO] Nenhum prospect para follow-up no momento.")
         return
         
@@ -249,21 +272,28 @@ def enviar_follow_up():
         "conversa rápida com um consultor esta semana? 💻"
     )
     
-    print(f"\n--- Iniciando Follow-up Semanal para {len(prospects_db)} prospects ---")
-    for numero, nome in prospects_db.items():
-        print(f"Enviando follow-up para: {numero} ({nome})")
-        enviar_texto(numero, follow_up_msg)
-        # Uma pausa para não sobrecarregar a API
-        time.sleep(1) 
+    print(f"\n--- Iniciando Follow-up Semanal para {len(prospects)} prospects ---")
+
+    def ao_enviar(numero, erro):
+        if erro is None:
+            print(f"Follow-up enviado para: {numero} ({prospects.get(numero)})")
+        else:
+            print(f"Falha no follow-up para: {numero} ({erro})")
+
+    # Envio em paralelo, limitado a WHATSAPP_MSGS_POR_SEGUNDO para não sobrecarregar a API
+    mensagens = [(numero, montar_texto(numero, follow_up_msg)) for numero in prospects]
+    resumo = enviador.enviar_em_massa(mensagens, ao_enviar=ao_enviar)
         
-    print("--- Follow-up Concluído! ---")
+    print(f"--- Follow-up Concluído em {resumo['duracao']:.1f}s: "
+          f"{resumo['enviados']} enviados, {resumo['falhas']} falhas ---")
+    return resumo
 
 
 # --- Execução Principal do Script ---
 
 if __name__ == '__main__':
-    
-    import threading
+
+    iniciar_processo()
 
     def iniciar_servidor_flask():
         """Inicia o servidor Flask em uma thread separada."""
@@ -290,7 +320,8 @@ if __name__ == '__main__':
             print("\n### Menu de Comandos CLI ###")
             print("1. Enviar Follow-up (Follow-up Semanal)")
             print("2. Mostrar Lista de Prospects")
-            print("3. Sair")
+            print("3. Estado da Fila do Webhook")
+            print("4. Sair")
             
             comando = input("Digite o número da opção: ").strip()
             
@@ -298,12 +329,22 @@ if __name__ == '__main__':
                 enviar_follow_up()
             elif comando == '2':
                 print("\n--- Lista de Prospects para Follow-up ---")
-                if prospects_db:
-                    for num, nome in prospects_db.items():
+                prospects = estado.listar_prospects()
+                if prospects:
+                    for num, nome in prospects.items():
                         print(f"- Número: {num}, Nome: {nome}")
                 else:
                     print("- Nenhuma entrada na lista.")
             elif comando == '3':
+                stats = fila_mensagens.estatisticas()
+                print("\n--- Fila do Webhook ---")
+                print(f"- Na fila: {stats['profundidade']}/{stats['capacidade']}")
+                print(f"- Enfileiradas: {stats['enfileirados']}, Processadas: {stats['processados']}, Erros: {stats['erros']}")
+                print(f"- Descartadas: {stats['descartados']}, Recusadas (fila cheia): {stats['recusados']}")
+                stats_dedup = dedup_mensagens.estatisticas()
+                print(f"- Reentregas descartadas: {stats_dedup['duplicados']} de {stats_dedup['verificados']} "
+                      f"({stats_dedup['taxa_duplicados']:.1%})")
+            elif comando == '4':
                 print("Encerrando o Chatbot...")
                 # O loop irá terminar e a aplicação será encerrada
                 break
@@ -314,5 +355,7 @@ if __name__ == '__main__':
             # Permite encerrar com CTRL+C
             print("\nEncerrando o Chatbot...")
             break
-            
+
+    # Processa as mensagens que já foram aceitas antes de sair
+    fila_mensagens.encerrar()
     print("Programa encerrado.")
\ No newline at end of file
@@ -1,20 +1,55 @@
+import asyncio
+import functools
 import logging
+import re
+import secrets
 import time
+from contextlib import aclosing
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler
-from telegram.ext import JobQueue
+from telegram.error import BadRequest, RetryAfter
 import threading
 import sys
+from types import MappingProxyType
 from datetime import time as dt_time, datetime, timedelta
-from codigo_bot import TELEGRAM_TOKEN 
-from google import genai # Mudou a importação
-from google.genai import types # Para as instruções de sistema
-from chave_api import GOOGLE_API_KEY
-GEMINI_API_KEY = GOOGLE_API_KEY
+from cache_respostas import CacheRespostas, hash_prompt
+from processador_updates import ProcessadorPorChat
+from envio_telegram import MotorEnvio
+from fluxo_conversa import carregar_fluxo, TELEGRAM
+from persistencia import ArmazemSQLite, DicionarioPersistente
+from agendador_contratos import AgendadorContratos
+from backend_estado import BackendSQLite, criar_backend, DicionarioCompartilhado
+from webhook_telegram import ALLOWED_UPDATES, compartilhar_conversas, executar_webhook, iniciar_workers
+from servidor_http import Resposta, ServidorHTTP
+from metricas import TIPO_CONTEUDO, registro
+from resiliencia_gemini import ChamadorResiliente, GeminiIndisponivel
+from memoria_conversa import MemoriaConversas, estimar_tokens
+from limitador_chats import CHAT, LimitadorChats
+from conversas_expiraveis import ConversasExpiraveis, descartar_marcas_persistencia, expirar_conversas, trocar_conversas
+from logs_estruturados import configurar_logs, logs_descartados
+from configuracao import SegredoAusente, config, do_ambiente, segredo
+from admin_telegram import AdminTelegram
+from formatacao_telegram import PARSE_MODE, cortar, formatar_resposta, texto_puro
 
 # --- Configuração Refinada do Gemini ---
-# Inicializa o Cliente
-client = genai.Client(api_key=GEMINI_API_KEY)
+# O cliente (e o google.genai, que leva meio segundo para importar) só é criado na primeira
+# pergunta livre, ou na inicialização com AQUECER_NA_INICIALIZACAO. A chave vem de
+# GOOGLE_API_KEY no ambiente ou do chave_api.py.
+client = None
+_lock_cliente = threading.Lock()
+
+def obter_cliente_gemini():
+    """Cria o cliente do Gemini na primeira chamada (bloqueante: no event loop, use carregar_gemini)."""
+    global client
+    with _lock_cliente:
+        if client is None:
+            from google import genai
+            client = genai.Client(api_key=segredo("GOOGLE_API_KEY"))
+    return client
+
+async def carregar_gemini():
+    """Garante o cliente do Gemini sem travar o event loop (a importação roda numa thread)."""
+    return client if client is not None else await asyncio.to_thread(obter_cliente_gemini)
 
 # O "Prompt de Sistema" define as regras de comportamento da IA
 SYSTEM_PROMPT = """
@@ -33,57 +68,515 @@ REGRAS DE RESPOSTA:
 4. Jamais invente parcerias ou serviços que não sejam desenvolvimento de software.
 5. Sempre que terminar uma explicação longa, pergunte se o usuário gostaria de falar com um consultor humano.
 """
+SYSTEM_PROMPT_HASH = hash_prompt(SYSTEM_PROMPT)
+# Contado uma única vez: o prompt de sistema é constante
+TOKENS_SYSTEM_PROMPT = estimar_tokens(SYSTEM_PROMPT)
+
+# Cache de respostas: perguntas normalizadas iguais reaproveitam a mesma resposta
+cache_gemini = CacheRespostas(max_itens=2000, ttl_segundos=6 * 3600, max_bytes=8 * 1024 * 1024)
+
+# --- Memória da Conversa (contexto das perguntas livres ao Gemini) ---
+GEMINI_MEMORIA_TOKENS = config("GEMINI_MEMORIA_TOKENS", 1000)         # Orçamento do histórico guardado por chat
+GEMINI_ORCAMENTO_PROMPT = config("GEMINI_ORCAMENTO_PROMPT", 3000)     # Máximo por chamada: prompt de sistema + histórico + pergunta
+GEMINI_MEMORIA_MAX_CHATS = config("GEMINI_MEMORIA_MAX_CHATS", 10000)  # Chats lembrados; acima disso, esquece os usados há mais tempo (LRU)
+GEMINI_MEMORIA_TTL = config("GEMINI_MEMORIA_TTL", 2 * 3600)           # Esquece a conversa depois deste tempo sem perguntas
+memoria_gemini = MemoriaConversas(
+    orcamento_tokens=GEMINI_MEMORIA_TOKENS,
+    max_chats=GEMINI_MEMORIA_MAX_CHATS,
+    ttl_segundos=GEMINI_MEMORIA_TTL
+)
+
+# Índice local de FAQ: perguntas comuns são respondidas sem chamar o Gemini.
+# Carregado na primeira pergunta livre (usa o numpy), ou na inicialização com AQUECER_NA_INICIALIZACAO.
+indice_faq = None
+
+def obter_indice_faq():
+    global indice_faq
+    if indice_faq is None:
+        from indice_faq import IndiceFAQ
+        indice_faq = IndiceFAQ.carregar()
+    return indice_faq
+
+# --- Limites de Concorrência do Gemini ---
+# Quantas chamadas ao Gemini podem estar "em voo" ao mesmo tempo
+GEMINI_MAX_CONCORRENTES = config("GEMINI_MAX_CONCORRENTES", 8)
+# Quantas perguntas podem aguardar uma vaga; acima disso respondemos na hora que estamos ocupados
+GEMINI_MAX_FILA = config("GEMINI_MAX_FILA", 32)
+GEMINI_MODELO = config("GEMINI_MODELO", "gemini-1.5-flash")
+
+# --- Resiliência do Gemini (prazos, disjuntor, hedging e modelos de reserva) ---
+# Modelos mais leves tentados, em ordem, quando o principal falha, estoura o prazo ou está com o disjuntor aberto
+GEMINI_MODELOS_RESERVA = config("GEMINI_MODELOS_RESERVA", ["gemini-1.5-flash-8b"])
+GEMINI_PRAZO_SEGUNDOS = config("GEMINI_PRAZO_SEGUNDOS", 10)              # Por chamada (no streaming, até o primeiro pedaço); None = sem prazo
+GEMINI_PRAZO_TOTAL_SEGUNDOS = config("GEMINI_PRAZO_TOTAL_SEGUNDOS", 15)  # Somando as tentativas em todos os modelos; None = sem prazo
+GEMINI_HEDGE = config("GEMINI_HEDGE", True)                              # Dispara uma 2ª chamada quando a 1ª passa do p95 observado (só sem streaming)
+# O disjuntor de cada modelo abre se, nas últimas 'janela' chamadas, a fração de erros ou de
+# chamadas mais lentas que 'latencia_lenta' segundos atingir o limite; fica aberto 'tempo_aberto' segundos
+GEMINI_DISJUNTOR = config("GEMINI_DISJUNTOR", dict(janela=20, min_chamadas=10, taxa_erros=0.5, latencia_lenta=8.0, taxa_lentas=0.5, tempo_aberto=30))
+
+chamador_gemini = ChamadorResiliente(
+    [GEMINI_MODELO, *GEMINI_MODELOS_RESERVA],
+    prazo=GEMINI_PRAZO_SEGUNDOS,
+    prazo_total=GEMINI_PRAZO_TOTAL_SEGUNDOS,
+    hedge=GEMINI_HEDGE,
+    **GEMINI_DISJUNTOR
+)
+
+# --- Limite de Perguntas por Chat ---
+# Cada chat pode mandar GEMINI_PERGUNTAS_POR_MINUTO_CHAT perguntas livres por minuto (com rajada de
+# GEMINI_RAJADA_CHAT) e o processo todo GEMINI_PERGUNTAS_POR_SEGUNDO (rajada GEMINI_RAJADA_GLOBAL).
+# Acima disso a pergunta não vai ao Gemini: o chat recebe um aviso (uma vez até voltar a ser
+# atendido) e as demais mensagens são ignoradas. None = sem aquele limite.
+GEMINI_PERGUNTAS_POR_MINUTO_CHAT = config("GEMINI_PERGUNTAS_POR_MINUTO_CHAT", 5)
+GEMINI_RAJADA_CHAT = config("GEMINI_RAJADA_CHAT", 3)
+GEMINI_PERGUNTAS_POR_SEGUNDO = config("GEMINI_PERGUNTAS_POR_SEGUNDO", 10)
+GEMINI_RAJADA_GLOBAL = config("GEMINI_RAJADA_GLOBAL", 20)
+
+limitador_gemini = LimitadorChats(
+    por_minuto_chat=GEMINI_PERGUNTAS_POR_MINUTO_CHAT,
+    rajada_chat=GEMINI_RAJADA_CHAT,
+    por_segundo_global=GEMINI_PERGUNTAS_POR_SEGUNDO,
+    rajada_global=GEMINI_RAJADA_GLOBAL
+)
+
+MSG_GEMINI_LIMITE_CHAT = (
+    "⏳ Você enviou muitas perguntas seguidas. "
+    "Aguarde {segundos} segundos e envie de novo, ou use /start para ver o menu."
+)
+
+MSG_GEMINI_OCUPADO = (
+    "⏳ Estamos com muitas conversas no momento. "
+    "Tente novamente em alguns instantes ou use /start para ver o menu."
+)
+
+_semaforo_gemini = asyncio.Semaphore(GEMINI_MAX_CONCORRENTES)
+_gemini_pendentes = 0 # Em voo + aguardando vaga (só é alterado dentro do event loop)
+
+MSG_GEMINI_ERRO = "Tive um erro ao processar sua pergunta. Tente novamente ou use /start."
+
+# Resposta imediata enquanto nenhum modelo está disponível (disjuntores abertos ou prazos estourados)
+MSG_GEMINI_INDISPONIVEL = (
+    "🤖 Nosso assistente está fora do ar no momento. "
+    "Use /start para ver o menu ou tente novamente em alguns minutos."
+)
+
+# Métricas do Gemini ('modo': completo ou stream)
+LATENCIA_GEMINI = registro.histograma("gemini_chamada_segundos", "Duração das chamadas ao Gemini", ("modo",))
+ERROS_GEMINI = registro.contador("gemini_erros_total", "Chamadas ao Gemini que falharam", ("modo",))
+RESPOSTAS_SEM_LLM = registro.contador(
+    "gemini_respostas_sem_llm_total", "Perguntas respondidas sem chamar o Gemini", ("motivo",))
+PERGUNTAS_LIMITADAS = registro.contador(
+    "gemini_perguntas_limitadas_total", "Perguntas livres recusadas pelo limite de taxa ('limite': chat ou global)",
+    ("limite",))
+registro.medidor("gemini_limitador_chats", "Chats com balde ativo no limite de perguntas", lambda: len(limitador_gemini))
 
-async def chamar_gemini(pergunta_usuario):
+# --- Streaming das Respostas ---
+# Com streaming, a primeira parte da resposta aparece assim que o Gemini a gera,
+# e a mensagem vai sendo editada até ficar completa.
+GEMINI_STREAMING = config("GEMINI_STREAMING", True)
+# Intervalo mínimo entre edições da mesma mensagem (o Telegram limita ~1 edição/s por chat)
+INTERVALO_EDICAO_STREAM = config("INTERVALO_EDICAO_STREAM", 1.0)
+
+@functools.lru_cache(maxsize=1)
+def _config_gemini():
+    # Montada uma única vez (o prompt de sistema não muda)
+    from google.genai import types
+    return types.GenerateContentConfig(
+        system_instruction=SYSTEM_PROMPT,
+        temperature=0.7 # Adiciona um pouco de criatividade natural
+    )
+
+def montar_conteudo(pergunta_usuario, chat_id=None):
+    """
+    Pergunta atual precedida das trocas anteriores do chat que couberem no orçamento do prompt.
+    Retorna (conteúdo para o Gemini, se há histórico).
+    """
+    if chat_id is None:
+        return pergunta_usuario, False
+    disponivel = GEMINI_ORCAMENTO_PROMPT - TOKENS_SYSTEM_PROMPT - estimar_tokens(pergunta_usuario)
+    trocas = memoria_gemini.historico(chat_id, disponivel)
+    if not trocas:
+        return pergunta_usuario, False
+
+    from google.genai import types
+    conteudo = []
+    for pergunta, resposta in trocas:
+        conteudo.append(types.Content(role="user", parts=[types.Part(text=pergunta)]))
+        conteudo.append(types.Content(role="model", parts=[types.Part(text=resposta)]))
+    conteudo.append(types.Content(role="user", parts=[types.Part(text=pergunta_usuario)]))
+    return conteudo, True
+
+def lembrar(chat_id, pergunta_usuario, resposta):
+    if chat_id is not None:
+        memoria_gemini.registrar(chat_id, pergunta_usuario, resposta)
+
+def _resposta_sem_llm(pergunta_usuario, chat_id=None, usar_cache=True):
+    """Resposta que não precisa do Gemini (cache, indisponível ou fila cheia), ou None."""
+    # Com histórico, a resposta depende do contexto: o cache só vale para a primeira pergunta
+    if usar_cache:
+        resposta_cache = cache_gemini.obter(pergunta_usuario, SYSTEM_PROMPT_HASH)
+        if resposta_cache is not None:
+            RESPOSTAS_SEM_LLM.inc("cache")
+            lembrar(chat_id, pergunta_usuario, resposta_cache)
+            return resposta_cache
+
+    # Todos os modelos com o disjuntor aberto: nem entra na fila
+    if not chamador_gemini.disponivel():
+        RESPOSTAS_SEM_LLM.inc("indisponivel")
+        return MSG_GEMINI_INDISPONIVEL
+
+    # Back-pressure: se a fila já está cheia, não acumulamos mais espera
+    if _gemini_pendentes >= GEMINI_MAX_CONCORRENTES + GEMINI_MAX_FILA:
+        logger.warning("Fila do Gemini cheia, pergunta recusada", extra={"chat_id": chat_id, "pendentes": _gemini_pendentes})
+        RESPOSTAS_SEM_LLM.inc("ocupado")
+        return MSG_GEMINI_OCUPADO
+
+    return None
+
+async def _gerar_texto(modelo, conteudo):
+    # Cliente assíncrono (client.aio): não bloqueia o event loop durante a chamada
+    cliente = await carregar_gemini()
+    response = await cliente.aio.models.generate_content(
+        model=modelo,
+        contents=conteudo,
+        config=_config_gemini()
+    )
+    return response.text
+
+async def chamar_gemini(pergunta_usuario, chat_id=None):
+    """Resposta do Gemini à pergunta; com 'chat_id', envia junto o histórico recente do chat."""
+    global _gemini_pendentes
+
+    await carregar_gemini()
+    conteudo, com_historico = montar_conteudo(pergunta_usuario, chat_id)
+    resposta = _resposta_sem_llm(pergunta_usuario, chat_id, usar_cache=not com_historico)
+    if resposta is not None:
+        return resposta
+
+    _gemini_pendentes += 1
     try:
-        # No novo SDK, usamos o método 'models.generate_content'
-        response = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=pergunta_usuario,
-            config=types.GenerateContentConfig(
-                system_instruction=SYSTEM_PROMPT,
-                temperature=0.7 # Adiciona um pouco de criatividade natural
-            )
+        async with _semaforo_gemini:
+            inicio = time.perf_counter()
+            # Prazo, disjuntor, hedging e modelos de reserva ficam no chamador_gemini
+            texto, modelo = await chamador_gemini.chamar(lambda modelo: _gerar_texto(modelo, conteudo))
+            latencia = time.perf_counter() - inicio
+        LATENCIA_GEMINI.observar(latencia, "completo")
+        lembrar(chat_id, pergunta_usuario, texto)
+        if modelo == GEMINI_MODELO and not com_historico: # Respostas do modelo de reserva não ficam no cache
+            cache_gemini.guardar(pergunta_usuario, SYSTEM_PROMPT_HASH, texto, latencia)
+        return texto
+    except GeminiIndisponivel:
+        ERROS_GEMINI.inc("completo")
+        return MSG_GEMINI_INDISPONIVEL
+    except Exception as e:
+        ERROS_GEMINI.inc("completo")
+        logger.error("Erro no Gemini: %r", e, extra={"chat_id": chat_id, "modo": "completo"})
+        return MSG_GEMINI_ERRO
+    finally:
+        _gemini_pendentes -= 1
+
+async def chamar_gemini_stream(pergunta_usuario, chat_id=None):
+    """Versão em streaming de chamar_gemini: gera o texto acumulado a cada pedaço recebido."""
+    global _gemini_pendentes
+
+    cliente = await carregar_gemini()
+    conteudo, com_historico = montar_conteudo(pergunta_usuario, chat_id)
+    resposta = _resposta_sem_llm(pergunta_usuario, chat_id, usar_cache=not com_historico)
+    if resposta is not None:
+        yield resposta
+        return
+
+    def abrir_stream(modelo):
+        return cliente.aio.models.generate_content_stream(
+            model=modelo,
+            contents=conteudo,
+            config=_config_gemini()
         )
-        return response.text
+
+    _gemini_pendentes += 1
+    texto = ""
+    modelo = GEMINI_MODELO
+    try:
+        async with _semaforo_gemini:
+            inicio = time.perf_counter()
+            async for chunk, modelo in chamador_gemini.stream(abrir_stream):
+                if chunk.text:
+                    texto += chunk.text
+                    yield texto
+            latencia = time.perf_counter() - inicio
+        LATENCIA_GEMINI.observar(latencia, "stream")
+        if not texto:
+            ERROS_GEMINI.inc("stream")
+            yield MSG_GEMINI_ERRO
+            return
+        lembrar(chat_id, pergunta_usuario, texto)
+        if modelo == GEMINI_MODELO and not com_historico:
+            cache_gemini.guardar(pergunta_usuario, SYSTEM_PROMPT_HASH, texto, latencia)
+    except GeminiIndisponivel:
+        ERROS_GEMINI.inc("stream")
+        yield MSG_GEMINI_INDISPONIVEL
     except Exception as e:
-        print(f"Erro no Gemini: {e}")
-        return "Tive um erro ao processar sua pergunta. Tente novamente ou use /start."
-    
+        ERROS_GEMINI.inc("stream")
+        logger.error("Erro no Gemini: %r", e, extra={"chat_id": chat_id, "modo": "stream"})
+        yield MSG_GEMINI_ERRO
+    finally:
+        _gemini_pendentes -= 1
+
+def _segundos_retry_after(erro: RetryAfter) -> float:
+    """RetryAfter.retry_after pode vir como int ou timedelta, conforme a versão da biblioteca."""
+    espera = erro.retry_after
+    return espera.total_seconds() if isinstance(espera, timedelta) else float(espera)
+
+async def _editar_mensagem(mensagem, texto, parse_mode=None):
+    """Edita a mensagem; devolve quantos segundos o Telegram pediu para esperar (0 = editou)."""
+    try:
+        await mensagem.edit_text(cortar(texto), parse_mode=parse_mode)
+    except RetryAfter as e:
+        logger.warning("Edição limitada pelo Telegram", extra={"chat_id": mensagem.chat_id, "espera_s": e.retry_after})
+        return _segundos_retry_after(e)
+    except BadRequest as e:
+        # "Message is not modified" não é erro para nós
+        if "not modified" not in str(e).lower():
+            raise
+    return 0
+
+async def _enviar_parte(update: Update, parte):
+    """Envia uma mensagem já formatada; se o Telegram recusar o HTML, envia o texto sem as tags."""
+    try:
+        await update.message.reply_text(parte, parse_mode=PARSE_MODE)
+    except BadRequest as e:
+        logger.warning("Formatação recusada pelo Telegram: %s", e, extra={"chat_id": update.effective_chat.id})
+        await update.message.reply_text(texto_puro(parte))
+
+async def responder_formatado(update: Update, texto):
+    """Envia a resposta do Gemini formatada, em uma ou mais mensagens, na ordem."""
+    for parte in formatar_resposta(texto) or formatar_resposta(MSG_GEMINI_ERRO):
+        await _enviar_parte(update, parte)
+
+async def responder_em_streaming(update: Update, pergunta):
+    """Envia a resposta do Gemini aos poucos, editando a mesma mensagem (com throttle)."""
+    mensagem = None
+    texto = ""
+    proxima_edicao = 0.0
+
+    # aclosing: se um envio ao Telegram falhar no meio, o gerador é fechado na hora e libera a
+    # vaga do semáforo do Gemini e o contador de pendentes (sem esperar o coletor de lixo)
+    async with aclosing(chamar_gemini_stream(pergunta, update.effective_chat.id)) as pedacos:
+        async for texto in pedacos:
+            agora = time.monotonic()
+            if mensagem is None:
+                # Primeira parte: texto puro, pois a formatação ainda pode estar incompleta
+                mensagem = await update.message.reply_text(cortar(texto))
+                proxima_edicao = agora + INTERVALO_EDICAO_STREAM
+            elif agora >= proxima_edicao:
+                espera = await _editar_mensagem(mensagem, texto)
+                proxima_edicao = time.monotonic() + max(espera, INTERVALO_EDICAO_STREAM)
+
+    if mensagem is None:
+        return
+
+    partes = formatar_resposta(texto)
+    if not partes:
+        return
+
+    # Edição final já formatada (respeitando o intervalo mínimo); o que passar do limite de
+    # uma mensagem vai nas mensagens seguintes
+    for _ in range(3):
+        espera = proxima_edicao - time.monotonic()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        try:
+            espera = await _editar_mensagem(mensagem, partes[0], parse_mode=PARSE_MODE)
+        except BadRequest as e:
+            logger.warning("Formatação recusada pelo Telegram: %s", e, extra={"chat_id": mensagem.chat_id})
+            espera = await _editar_mensagem(mensagem, texto_puro(partes[0]))
+        if not espera:
+            break
+        proxima_edicao = time.monotonic() + espera
+    for parte in partes[1:]:
+        await _enviar_parte(update, parte)
+
 async def fallback_gemini_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Lida com textos fora do menu usando o Gemini."""
     pergunta = update.message.text
+
+    # Primeiro tenta o FAQ local (milissegundos, funciona offline)
+    indice = indice_faq if indice_faq is not None else await asyncio.to_thread(obter_indice_faq)
+    resposta_faq = indice.responder(pergunta)
+    if resposta_faq is not None:
+        await responder_formatado(update, resposta_faq)
+        return MENU_PRINCIPAL
+
+    # Limite de taxa antes de qualquer custo do Gemini (nem o "digitando..." é enviado)
+    recusa = limitador_gemini.verificar(update.effective_chat.id)
+    if recusa is not None:
+        limite, espera, avisar = recusa
+        PERGUNTAS_LIMITADAS.inc(limite)
+        if avisar:
+            logger.info("Pergunta acima do limite", extra={"chat_id": update.effective_chat.id, "limite": limite})
+            aviso = MSG_GEMINI_LIMITE_CHAT.format(segundos=max(1, round(espera))) if limite == CHAT else MSG_GEMINI_OCUPADO
+            await update.message.reply_text(aviso)
+        return MENU_PRINCIPAL
     
     # Feedback visual de "digitando..."
     await context.bot.send_chat_action(chat_id=update.message.chat_id, action="typing")
+
+    if GEMINI_STREAMING:
+        await responder_em_streaming(update, pergunta)
+        return MENU_PRINCIPAL
     
-    resposta_ia = await chamar_gemini(pergunta)
+    resposta_ia = await chamar_gemini(pergunta, update.effective_chat.id)
     
-    await update.message.reply_text(resposta_ia, parse_mode='Markdown')
+    await responder_formatado(update, resposta_ia)
     
     return MENU_PRINCIPAL # Mantém o usuário no menu principal
 
-# --- Configurações (Substitua Pelo Seu Token, o token fica salvo em um arquivo a parte) ---
-TELEGRAM_BOT_TOKEN = TELEGRAM_TOKEN
+# --- Configurações (o token vem de TELEGRAM_TOKEN no ambiente ou do arquivo a parte codigo_bot.py) ---
+TELEGRAM_BOT_TOKEN = None # None = lido por token_telegram() quando o Application é montado
+
+def token_telegram():
+    return TELEGRAM_BOT_TOKEN or segredo("TELEGRAM_TOKEN")
+
+# Carrega o cliente do Gemini, a configuração das chamadas e o índice de FAQ antes de atender o
+# primeiro update, em vez de na primeira pergunta livre (recomendado em produção).
+AQUECER_NA_INICIALIZACAO = config("AQUECER_NA_INICIALIZACAO", False)
+# Máximo de updates processados ao mesmo tempo (chats diferentes em paralelo, cada chat em ordem)
+MAX_UPDATES_CONCORRENTES = config("MAX_UPDATES_CONCORRENTES", 64)
+
+# --- Modo de Execução ---
+# "polling": um único processo busca os updates no Telegram.
+# "webhook": o Telegram envia cada update por POST para WEBHOOK_URL_PUBLICA (HTTPS, normalmente
+# um proxy/load balancer) que encaminha para WEBHOOK_PORTA; vários workers podem atender juntos.
+MODO_EXECUCAO = config("MODO_EXECUCAO", "polling")
+WEBHOOK_URL_PUBLICA = config("WEBHOOK_URL_PUBLICA", None) # Ex: "https://bot.itac.com.br" (obrigatória no modo webhook)
+WEBHOOK_CAMINHO = config("WEBHOOK_CAMINHO", "/telegram/webhook")
+WEBHOOK_PORTA = config("WEBHOOK_PORTA", 8081)
+WEBHOOK_SEGREDO = config("WEBHOOK_SEGREDO", None) # None = gera um novo a cada inicialização (o mesmo para todos os workers)
+WEBHOOK_WORKERS = config("WEBHOOK_WORKERS", 1)
+# Estado compartilhado entre os workers ('sqlite:///arquivo.db' ou 'redis://host:porta/db').
+# Obrigatório com mais de um worker; None = bancos locais do processo (chatbot_telegram.db).
+ESTADO_URL = config("ESTADO_URL", None)
+# Threads de cada worker para as chamadas ao estado compartilhado (trava e estado do chat de cada
+# update). None = 1 com SQLite (que serializa as escritas) e 4 com Redis (sobrepõe as idas e voltas).
+THREADS_ESTADO = config("THREADS_ESTADO", None)
+# Com estado compartilhado, de quanto em quanto tempo o worker principal relê os contratos
+INTERVALO_SINCRONIA_CONTRATOS = config("INTERVALO_SINCRONIA_CONTRATOS", 30)
+# Com estado compartilhado, de quanto em quanto tempo cada worker reconta prospects, contratos e
+# conversas no backend (para /metrics e o relatório de administração)
+INTERVALO_CONTAGENS = config("INTERVALO_CONTAGENS", 15)
+
+# --- Conversas Abandonadas ---
+# Conversas paradas no meio do menu são esquecidas depois deste tempo (o usuário recomeça com /start).
+# As expirações são varridas em baldes de LARGURA_BALDE_CONVERSAS segundos. None = nunca expira.
+TEMPO_LIMITE_CONVERSA = config("TEMPO_LIMITE_CONVERSA", 30 * 60)
+LARGURA_BALDE_CONVERSAS = config("LARGURA_BALDE_CONVERSAS", 60)
+
+# --- Métricas (Prometheus) ---
+# Cada processo expõe GET /metrics em METRICAS_PORTA (no modo webhook, o worker N usa METRICAS_PORTA + N)
+METRICAS_HOST = config("METRICAS_HOST", "0.0.0.0")
+METRICAS_PORTA = config("METRICAS_PORTA", 9101) # None = não expõe /metrics
 # ------------------------------------------------
 
-# Configuração de logging básica
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', 
-    level=logging.INFO
-)
+# --- API de Administração ---
+# Listagens de prospects e contratos, follow-up, relatório e encerramento por HTTP, no lugar
+# do antigo menu do CLI (rotas em admin_telegram.py). Só o processo principal expõe a API.
+# Com o segredo ADMIN_TOKEN (ambiente ou codigo_bot.py), toda requisição precisa do cabeçalho
+# "Authorization: Bearer <token>"; sem ele, a API só sobe escutando em localhost.
+ADMIN_HOST = config("ADMIN_HOST", "127.0.0.1")
+ADMIN_PORTA = config("ADMIN_PORTA", 9100) # Abaixo das portas de /metrics dos workers; None = sem API
+# ------------------------------------------------
+
+# --- Logs ---
+# Os registros vão para uma fila e uma thread em segundo plano escreve (JSON, uma linha por registro).
+# Com LOG_NIVEL = "DEBUG", cada update tratado gera uma linha com chat_id, estado e duracao_ms;
+# LOG_AMOSTRAGEM_DEBUG = N mantém só 1 de cada N dessas linhas.
+LOG_NIVEL = config("LOG_NIVEL", "INFO")
+LOG_JSON = config("LOG_JSON", True)
+LOG_AMOSTRAGEM_DEBUG = config("LOG_AMOSTRAGEM_DEBUG", 100)
+LOG_ARQUIVO = config("LOG_ARQUIVO", None) # None = stderr
+# Bibliotecas que registram uma linha INFO a cada chamada ao Gemini
+LOGGERS_SILENCIADOS = config("LOGGERS_SILENCIADOS", ("httpx", "google_genai.models"))
+# ------------------------------------------------
+
+def iniciar_logs():
+    """Liga o pipeline de logs no processo (no __main__ e em cada worker, nunca na importação)."""
+    configurar_logs(LOG_NIVEL, LOG_JSON, LOG_AMOSTRAGEM_DEBUG, LOG_ARQUIVO)
+    for nome in LOGGERS_SILENCIADOS:
+        logging.getLogger(nome).setLevel(logging.WARNING)
+
 logger = logging.getLogger(__name__)
+registro.medidor("chatbot_logs_descartados", "Registros de log descartados com a fila de escrita cheia", logs_descartados)
 
 # --- Estados para o ConversationHandler ---
 MENU_PRINCIPAL, CLIENTE_OPCOES, CONTRATO_OPCOES, RECEBE_NOME_CONTRATO = range(4)
 
-# --- Bancos de Dados em Memória ---
+LATENCIA_HANDLER = registro.histograma(
+    "telegram_handler_segundos", "Tempo de cada handler do ConversationHandler", ("estado", "handler"))
+
+def medido(estado, handler):
+    """Envolve o handler para registrar a latência com o estado da conversa em que ele é chamado."""
+    nome = handler.__name__
+
+    @functools.wraps(handler)
+    async def executar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        inicio = time.perf_counter()
+        try:
+            return await handler(update, context)
+        finally:
+            duracao = time.perf_counter() - inicio
+            LATENCIA_HANDLER.observar(duracao, estado, nome)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Update tratado", extra={
+                    "chat_id": update.effective_chat.id if update.effective_chat else None,
+                    "estado": estado, "handler": nome, "duracao_ms": round(duracao * 1000, 2)})
+    return executar
+
+# --- Bancos de Dados (em memória, persistidos em SQLite) ---
+
+# Arquivo do banco. As gravações são feitas em lote por uma thread em segundo plano.
+CAMINHO_BANCO = config("CAMINHO_BANCO", "chatbot_telegram.db")
+armazem = ArmazemSQLite(CAMINHO_BANCO)
 
 # Chave: ID do Chat do Telegram (Inteiro), Valor: Nome ou Username
-prospects_db = {} 
+prospects_db = DicionarioPersistente(armazem, "prospects")
+
+# Chave: ID do Chat do Telegram (Inteiro), Valor: {'nome': str}
+# Os horários de envio ficam no 'agendador' e são recriados por reidratar_contratos() na inicialização.
+contratos_db = DicionarioPersistente(
+    armazem, "contratos",
+    serializar=lambda dados: dados['nome'],
+    desserializar=lambda nome: {'nome': nome}
+)
+
+# Backend compartilhado (modo webhook com vários workers). None = bancos locais acima.
+estado_compartilhado = None
+
+# Só o worker principal roda o agendador de contratos (os outros apenas gravam no estado compartilhado)
+worker_primario = True
 
-# Chave: ID do Chat do Telegram (Inteiro), Valor: {'nome': str, 'job': Job}
-contratos_db = {} 
+def usar_estado_compartilhado(url):
+    """Troca os bancos locais por tabelas no backend compartilhado, visíveis para todos os workers."""
+    global estado_compartilhado, prospects_db, contratos_db
+    estado_compartilhado = criar_backend(url)
+    prospects_db = DicionarioCompartilhado(estado_compartilhado, "telegram_prospects", chave_update=chave_chat)
+    contratos_db = DicionarioCompartilhado(
+        estado_compartilhado, "telegram_contratos",
+        serializar=lambda dados: dados['nome'],
+        desserializar=lambda nome: {'nome': nome},
+        chave_update=chave_chat
+    )
+
+def threads_estado_padrao():
+    return 1 if isinstance(estado_compartilhado, BackendSQLite) else 4
+
+def chave_chat(update):
+    return update.effective_chat.id if update.effective_chat else None
+
+def chave_conversa(update):
+    # A mesma chave do ConversationHandler (per_chat e per_user)
+    if update.effective_chat is None or update.effective_user is None:
+        return None
+    return update.effective_chat.id, update.effective_user.id
 
 # --- Funções de Envio de Mensagem (Telegram API) ---
 
@@ -95,113 +588,99 @@ async def enviar_texto(update: Update, context: ContextTypes.DEFAULT_TYPE, texto
         parse_mode='Markdown'
     )
 
+# Motor de envio compartilhado: respeita os limites do Telegram em todos os follow-ups
+motor_envio = None
+
+def obter_motor_envio(application: Application) -> MotorEnvio:
+    """Cria (uma única vez) o motor de envio ligado ao bot da aplicação."""
+    global motor_envio
+    if motor_envio is None:
+        motor_envio = MotorEnvio(application.bot)
+    return motor_envio
+
 async def enviar_follow_up_msg(user_id, texto, application: Application):
     """Função que envia o follow-up. Precisa do objeto 'application'."""
-    try:
-        await application.bot.send_message(
-            chat_id=user_id,
-            text=texto,
-            parse_mode='Markdown'
-        )
-        logger.info(f"Follow-up enviado para o ID: {user_id}")
-    except Exception as e:
-        logger.error(f"Erro ao enviar follow-up para {user_id}: {e}")
+    erro = await obter_motor_envio(application).enviar(user_id, texto)
+    if erro is None:
+        logger.info("Follow-up enviado", extra={"chat_id": user_id})
+    else:
+        logger.error("Erro ao enviar follow-up: %s", erro, extra={"chat_id": user_id})
+    return erro is None
 
 
 # --- Handlers de Mensagens (Lógica do Chatbot) ---
 
+# Fluxo de conversa compartilhado com o bot do WhatsApp (fluxo.json), compilado na inicialização
+fluxo = carregar_fluxo(TELEGRAM)
+
+def montar_teclado(id_no):
+    """Teclado com os botões de um nó do fluxo (ou None se o nó não tiver opções)."""
+    titulos = fluxo.titulos(id_no)
+    if not titulos:
+        return None
+    return ReplyKeyboardMarkup([[KeyboardButton(t)] for t in titulos], one_time_keyboard=True, resize_keyboard=True)
+
+# Teclados montados uma única vez (objetos do Telegram são imutáveis)
+TECLADOS = MappingProxyType({id_no: montar_teclado(id_no) for id_no in fluxo.respostas})
+
+def regex_opcoes(id_no):
+    """Regex que aceita exatamente os títulos dos botões de um nó (para os filtros do ConversationHandler)."""
+    return "^(" + "|".join(re.escape(t) for t in fluxo.titulos(id_no)) + ")$"
+
+async def responder_no(update: Update, context: ContextTypes.DEFAULT_TYPE, id_no, **campos):
+    """Envia o texto (e o teclado) de um nó do fluxo. 'campos' preenche textos como '{nome}'."""
+    texto = fluxo.resposta(id_no).texto
+    await enviar_texto(update, context, texto.format(**campos) if campos else texto, TECLADOS[id_no])
+
 # 1. Comando de Início e Menu Principal
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Inicia a conversa e exibe o menu principal."""
-    apresentacao = (
-        "🤖 *Bem-vindo(a) à ITAC Desenvolvimento de Soluções Informatizadas!* "
-        "Sou seu assistente virtual. Em que posso te ajudar hoje?"
-    )
-    
-    keyboard = [
-        [KeyboardButton("Sou Cliente")],
-        [KeyboardButton("Ainda Não Sou Cliente")],
-        [KeyboardButton("Configurar Contrato (Dev)")]
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-    
-    await enviar_texto(update, context, apresentacao, reply_markup)
+    await responder_no(update, context, fluxo.inicio)
     
     return MENU_PRINCIPAL
 
 # 2. Resposta do Menu Principal
 async def menu_principal_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Lida com a seleção do menu principal."""
-    msg_recebida = update.message.text.strip()
+    intencao = fluxo.intencao(update.message.text.strip())
     chat_id = update.message.chat_id
 
     # --- Ramo 1: Sou Cliente ---
-    if msg_recebida == "Sou Cliente":
-        mensagem_cliente = (
-            "🤝 Olá! Ótimo ter você de volta. O que você precisa? "
-            "Como posso melhor atendê-lo(a)?"
-        )
-        
-        keyboard_cliente = [
-            [KeyboardButton("Suporte SLA")],
-            [KeyboardButton("Questões Contratuais")]
-        ]
-        reply_markup_cliente = ReplyKeyboardMarkup(keyboard_cliente, one_time_keyboard=True, resize_keyboard=True)
-        
-        await enviar_texto(update, context, mensagem_cliente, reply_markup_cliente)
+    if intencao == "sou_cliente":
+        await responder_no(update, context, intencao)
         return CLIENTE_OPCOES
 
     # --- Ramo 2: Ainda Não Sou Cliente (Prospect) ---
-    elif msg_recebida == "Ainda Não Sou Cliente":
+    elif intencao == "nao_sou_cliente":
         if chat_id not in prospects_db:
              prospects_db[chat_id] = update.message.from_user.username or update.message.from_user.first_name
-             logger.info(f"ID {chat_id} adicionado aos prospects.")
+             logger.info("Adicionado aos prospects", extra={"chat_id": chat_id})
              
-        resposta = (
-            "👋 Sem problemas! ... Um de nossos consultores entrará em contato em breve. "
-            "Obrigado pelo seu interesse!"
-        )
-        await enviar_texto(update, context, resposta)
+        await responder_no(update, context, intencao)
         return ConversationHandler.END 
         
     # --- Ramo 3: Configurar Contrato (Nova Funcionalidade) ---
-    elif msg_recebida == "Configurar Contrato (Dev)":
-        await update.message.reply_text("Certo, iniciando configuração de follow-up de contrato.")
+    elif intencao == "configurar_contrato":
+        await responder_no(update, context, intencao)
         
         if chat_id in contratos_db:
-            keyboard_contrato = [
-                [KeyboardButton("Remover Agendamento")],
-                [KeyboardButton("Voltar ao Menu")]
-            ]
-            reply_markup = ReplyKeyboardMarkup(keyboard_contrato, one_time_keyboard=True, resize_keyboard=True)
-            await enviar_texto(
-                update, context, 
-                f"Já existe um agendamento ativo para *{contratos_db[chat_id]['nome']}*. O que deseja fazer?", 
-                reply_markup
-            )
+            await responder_no(update, context, "contrato_existente", nome=contratos_db[chat_id]['nome'])
             return CONTRATO_OPCOES
         else:
-            await update.message.reply_text("Por favor, digite o *nome completo* da pessoa que deve receber o follow-up de contrato:")
+            await responder_no(update, context, "pedir_nome_contrato")
             return RECEBE_NOME_CONTRATO
 
 
 # 3. Respostas de Cliente
 async def cliente_opcoes_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Lida com as opções de cliente (SLA ou Contratual)."""
-    msg_recebida = update.message.text.strip()
-    
-    # ... (A lógica de Suporte SLA e Questões Contratuais permanece a mesma) ...
+    intencao = fluxo.intencao(update.message.text.strip())
     
-    if msg_recebida == "Suporte SLA":
-        resposta = ("🚨 Entendido. Nosso time de Suporte SLA foi notificado. Por favor, nos envie uma breve descrição do problema, e um técnico entrará em contato com você em até 1 hora.")
-        await enviar_texto(update, context, resposta)
-    
-    elif msg_recebida == "Questões Contratuais":
-        resposta = ("📝 Certo. Suas questões contratuais serão encaminhadas para o setor administrativo. Um especialista responderá em até 2 horas. Por favor, especifique o contrato ou o tópico de interesse.")
-        await enviar_texto(update, context, resposta)
+    if intencao in ("suporte_sla", "contratual"):
+        await responder_no(update, context, intencao)
     
     else:
-        await enviar_texto(update, context, "🤔 Opção inválida. Por favor, use os botões.")
+        await responder_no(update, context, "opcao_invalida")
         return CLIENTE_OPCOES
 
     return ConversationHandler.END
@@ -209,45 +688,42 @@ async def cliente_opcoes_handler(update: Update, context: ContextTypes.DEFAULT_T
 # --- Novas Funções para Agendamento de Contrato ---
 
 async def handle_recebe_nome_contrato(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Recebe o nome do prospect e agenda o follow-up semanal."""
+    """Recebe o nome do prospect e agenda o follow-up de segunda a sexta."""
     nome_prospect = update.message.text.strip()
     chat_id = update.message.chat_id
     
-    # Armazena o nome para o agendamento
-    context.user_data['contrato_nome'] = nome_prospect
-    
-    # Agenda a tarefa e armazena o job
-    job = application.job_queue.run_repeating(
-        callback=follow_up_contrato_task,
-        interval=timedelta(weeks=1), # Repetir a cada 1 semana
-        first=obter_proximo_horario_agendado(), # Primeira execução
-        chat_id=chat_id,
-        name=f"Contrato_{chat_id}",
-        data={'nome': nome_prospect}
-    )
-    
-    # Armazena o Job e o nome no banco de dados de contratos
-    contratos_db[chat_id] = {'nome': nome_prospect, 'job': job}
+    # Armazena o nome no banco de dados de contratos (fonte única; nada fica no user_data) e agenda o próximo envio
+    contratos_db[chat_id] = {'nome': nome_prospect}
+    if worker_primario:
+        agendador.adicionar(chat_id) # Nos outros workers, o principal agenda na próxima sincronização
 
     agendamento_info = (
         f" Agendamento concluído para *{nome_prospect}*! \n\n"
-        f"Enviarei o lembrete semanal de contrato toda *Segunda a Sexta* às *15:30 (horário de Brasília)*."
+        f"Enviarei o lembrete de contrato toda *Segunda a Sexta* às *15:30 (horário de Brasília)*."
     )
     await enviar_texto(update, context, agendamento_info)
-    logger.info(f"Agendamento de contrato criado para {chat_id} ({nome_prospect}).")
+    logger.info("Agendamento de contrato criado", extra={"chat_id": chat_id, "nome": nome_prospect})
     
     return ConversationHandler.END
 
-def obter_proximo_horario_agendado() -> datetime:
-    """Calcula o próximo dia de semana às 15:30."""
-    now = datetime.now()
+def reidratar_contratos():
+    """Recria, na inicialização, os agendamentos de todos os contratos salvos no banco (uma única consulta)."""
+    if not contratos_db:
+        return 0
+    agendador.adicionar_varios(list(contratos_db))
+    logger.info(f"{len(contratos_db)} agendamentos de contrato restaurados do banco.")
+    return len(contratos_db)
+
+def obter_proximo_horario_agendado(a_partir_de: datetime = None) -> datetime:
+    """Calcula o próximo dia de semana às 15:30 (estritamente depois de 'a_partir_de', padrão: agora)."""
+    now = a_partir_de or datetime.now()
     target_time = dt_time(15, 30, 0)
     
     # Inicia no próximo dia (pode ser hoje se a hora ainda não passou)
     next_run = datetime.combine(now.date(), target_time)
     
-    # Se a hora de hoje já passou, vai para amanhã
-    if next_run < now:
+    # Se a hora de hoje já passou (ou é agora), vai para amanhã
+    if next_run <= now:
         next_run += timedelta(days=1)
         
     # Verifica se é fim de semana (Seg=0, Dom=6)
@@ -258,47 +734,86 @@ def obter_proximo_horario_agendado() -> datetime:
     return next_run
 
 
-async def follow_up_contrato_task(context: ContextTypes.DEFAULT_TYPE):
-    """Callback executada pelo JobQueue."""
-    
-    chat_id = context.job.chat_id
-    nome_prospect = context.job.data['nome']
-    
-    # Verifica se o dia atual é um dia de semana (0=Segunda a 4=Sexta)
-    if datetime.now().weekday() < 5: 
-        mensagem = (
-            f"*{nome_prospect}*, bom dia! Tudo bem?\n\n"
-            "Só passando para dar uma lembrada no contrato do sistema.\n"
-            "Teve chance de dar uma olhada ou tem alguma dúvida que eu possa esclarecer? 😊"
-        )
-        await enviar_follow_up_msg(chat_id, mensagem, application)
-    else:
-        # Se for sábado ou domingo, não envia, mas o JobQueue garante que o intervalo de 1 semana será mantido.
-        # No entanto, como foi usado run_repeating com um intervalo fixo, a lógica de reajuste é crucial.
-        # Para garantir que seja sempre segunda a sexta, o job deve ser re-agendado após a execução.
-        # Mas para simplicidade, a verificação 'if weekday() < 5' é suficiente para bloquear o envio no fim de semana.
-        logger.info(f"Dia de semana ignorado para {nome_prospect}.")
+def mensagem_follow_up_contrato(nome_prospect):
+    return (
+        f"*{nome_prospect}*, bom dia! Tudo bem?\n\n"
+        "Só passando para dar uma lembrada no contrato do sistema.\n"
+        "Teve chance de dar uma olhada ou tem alguma dúvida que eu possa esclarecer? 😊"
+    )
+
+async def enviar_lote_contratos(chat_ids):
+    """Envia o follow-up de contrato para todos os chats que venceram no mesmo horário (com limite de taxa)."""
+    # Contratos removidos entre o agendamento e o envio são ignorados
+    def ler_nomes():
+        return {chat_id: contratos_db[chat_id]['nome'] for chat_id in chat_ids if chat_id in contratos_db}
+    # Com estado compartilhado, uma leitura do backend por chat: fora do event loop
+    nomes = ler_nomes() if estado_compartilhado is None else await asyncio.to_thread(ler_nomes)
+    resumo = await obter_motor_envio(application).enviar_em_massa(
+        nomes,
+        lambda chat_id: mensagem_follow_up_contrato(nomes[chat_id])
+    )
+    logger.info(f"Follow-up de contrato: {resumo['enviados']} enviados, {resumo['falhas']} falhas "
+                f"em {resumo['duracao']:.1f}s.")
+
+# Agendador único (min-heap) de todos os follow-ups de contrato, só em dias úteis
+agendador = AgendadorContratos(obter_proximo_horario_agendado, enviar_lote_contratos)
+
+# Tamanho dos bancos para os medidores e o relatório. Em memória, len() direto; com estado
+# compartilhado, len() é uma consulta ao SQLite/Redis: usamos a última contagem, refeita numa
+# thread por manter_contagens, e a coleta de /metrics não bloqueia o event loop
+_contagens = {"prospects": 0, "contratos": 0, "conversas": 0}
+
+def _bancos_contados():
+    return {"prospects": prospects_db, "contratos": contratos_db, "conversas": conversas_telegram}
+
+def contagem(nome):
+    """Quantidade de itens em prospects_db, contratos_db ou conversas_telegram, sem ir ao backend."""
+    if estado_compartilhado is None:
+        return len(_bancos_contados()[nome] or ())
+    return _contagens[nome]
+
+def atualizar_contagens():
+    """Reconta os bancos no backend compartilhado (roda numa thread)."""
+    for nome, banco in _bancos_contados().items():
+        _contagens[nome] = len(banco or ())
+
+# Medidores calculados na coleta (os bancos podem ser trocados por usar_estado_compartilhado)
+registro.medidor("telegram_prospects", "Prospects registrados para follow-up", lambda: contagem("prospects"))
+registro.medidor("telegram_contratos", "Contratos com follow-up configurado", lambda: contagem("contratos"))
+registro.medidor("telegram_sqlite_pendentes", "Alterações de prospects e contratos ainda não gravadas no SQLite",
+                 lambda: armazem.pendentes)
+registro.medidor("telegram_contratos_agendados", "Contratos no agendador deste processo", lambda: len(agendador))
+registro.medidor("telegram_agendador_atraso_segundos",
+                 "Atraso entre o horário devido e o envio do último lote de contratos", lambda: agendador.ultimo_atraso)
+
+# Estados das conversas em andamento, usados pelo ConversationHandler (definido em montar_aplicacao):
+# ConversasExpiraveis, o DicionarioCompartilhado dos workers ou o dicionário do PTB (sem expiração)
+conversas_telegram = None
+registro.medidor("telegram_conversas_ativas", "Conversas em andamento no ConversationHandler",
+                 lambda: contagem("conversas"))
+registro.medidor("telegram_conversas_expiradas", "Conversas abandonadas esquecidas desde a inicialização",
+                 lambda: getattr(conversas_telegram, "expiradas", 0))
 
 # 4. Opções de Contrato (Remover/Voltar)
 async def contrato_opcoes_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Lida com a opção de remover agendamento."""
-    msg_recebida = update.message.text.strip()
+    intencao = fluxo.intencao(update.message.text.strip())
     chat_id = update.message.chat_id
 
-    if msg_recebida == "Remover Agendamento":
+    if intencao == "remover_agendamento":
         if chat_id in contratos_db:
-            # 1. Remove o Job da fila
-            contratos_db[chat_id]['job'].schedule_removal()
+            # 1. Remove do agendador
+            agendador.remover(chat_id)
             # 2. Remove do banco de dados local
             del contratos_db[chat_id]
             
-            await update.message.reply_text("❌ Agendamento de follow-up de contrato removido com sucesso!")
-            logger.info(f"Agendamento de contrato removido para {chat_id}.")
+            await responder_no(update, context, intencao)
+            logger.info("Agendamento de contrato removido", extra={"chat_id": chat_id})
         else:
              await update.message.reply_text("Nenhum agendamento ativo encontrado.")
         return ConversationHandler.END
 
-    elif msg_recebida == "Voltar ao Menu":
+    elif intencao == "voltar_menu":
         await start(update, context)
         return ConversationHandler.END
 
@@ -311,120 +826,316 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return ConversationHandler.END
 
 
-# --- Funcionalidade de Follow-up (CLI) ---
+# --- Follow-up dos Prospects e Relatórios (API de administração) ---
 
-def iniciar_cli(application: Application):
-    """Loop da Linha de Comando (CLI) para Follow-up."""
-    
-    time.sleep(2) 
-    
-    print("\n--- Bot Telegram Iniciado! ---")
-    print("O Bot está rodando em segundo plano. Pressione ENTER para o menu de comandos.")
+MSG_FOLLOW_UP_PROSPECTS = "Olá novamente! ... Posso agendar uma conversa rápida esta semana? 💻"
+
+def memoria_processo():
+    """Memória residente atual e o pico (KiB), lidos de /proc (Linux). None se indisponível."""
+    try:
+        with open("/proc/self/status") as f:
+            campos = dict(linha.split(":", 1) for linha in f if ":" in linha)
+        return {"rss_kib": int(campos["VmRSS"].split()[0]), "pico_rss_kib": int(campos["VmHWM"].split()[0])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+def relatorio_memoria(application: Application):
+    """Tamanho das estruturas que crescem com o número de usuários (para a API de administração)."""
+    memoria = memoria_gemini.estatisticas()
+    cache = cache_gemini.estatisticas()
+    return {
+        "processo": memoria_processo(),
+        # Com estado compartilhado, as conversas ficam no backend (de todos os workers)
+        "conversas": (conversas_telegram.estatisticas() if isinstance(conversas_telegram, ConversasExpiraveis)
+                      else {"conversas": contagem("conversas")}),
+        "user_data": len(application.user_data),
+        "chat_data": len(application.chat_data),
+        "chats_em_processamento": application.update_processor.chats_ativos,
+        "memoria_gemini": memoria,
+        "cache_gemini": cache,
+        "limitador_gemini": limitador_gemini.estatisticas(),
+        "prospects": contagem("prospects"),
+        "contratos": contagem("contratos"),
+        "contratos_agendados": len(agendador),
+    }
+
+async def enviar_follow_up_prospects(msg, ao_progredir=None):
+    """Envia o follow-up para todos os prospects (em paralelo, dentro dos limites do Telegram)."""
+    chat_ids = await retrato(prospects_db)
+    logger.info(f"Iniciando follow-up para {len(chat_ids)} prospects")
+    resumo = await obter_motor_envio(application).enviar_em_massa(chat_ids, msg, ao_progredir=ao_progredir)
+    for user_id, erro in resumo['erros'].items():
+        logger.warning("Falha no follow-up", extra={"chat_id": user_id, "nome": chat_ids.get(user_id), "erro": str(erro)})
+    return resumo
 
+async def retrato(banco):
+    """Cópia de prospects_db ou contratos_db (chat_id -> valor) para listagens e envios em massa."""
+    if estado_compartilhado is None:
+        return dict(banco.dados) # Em memória: cópia em C, sem ceder o event loop no meio
+    return await asyncio.to_thread(lambda: banco.dados) # Uma leitura do backend, fora do event loop
+
+
+# --- Execução Principal do Bot ---
+
+_tarefa_sincronia = None
+
+async def sincronizar_contratos():
+    """Com estado compartilhado, traz para o agendador os contratos criados/removidos por outros workers."""
     while True:
+        await asyncio.sleep(INTERVALO_SINCRONIA_CONTRATOS)
         try:
-            input("\nPressione [ENTER] para o Menu CLI...")
-            
-            print("\n### Menu de Comandos CLI ###")
-            print("1. Enviar Follow-up (Prospects)")
-            print("2. Mostrar Lista de Prospects")
-            print("3. Mostrar Agendamentos de Contrato") # Novo
-            print("4. Sair")
-            
-            comando = input("Digite o número da opção: ").strip()
-            
-            if comando == '1':
-                if not prospects_db:
-                    print("\n[INFO] Nenhum prospect para follow-up no momento.")
-                    continue
-                    
-                follow_up_msg = ("Olá novamente! ... Posso agendar uma conversa rápida esta semana? 💻")
-                
-                print(f"\n--- Iniciando Follow-up para {len(prospects_db)} prospects ---")
-                application.create_task(follow_up_task(application, follow_up_msg))
-
-            elif comando == '2':
-                print("\n--- Lista de Prospects (Lead) ---")
-                if prospects_db:
-                    for chat_id, nome in prospects_db.items():
-                        print(f"- ID: {chat_id}, Nome: {nome}")
-                else:
-                    print("- Nenhuma entrada na lista.")
-                    
-            elif comando == '3': # Nova Opção
-                print("\n--- Lista de Agendamentos de Contrato ---")
-                if contratos_db:
-                    for chat_id, data in contratos_db.items():
-                        job_info = application.job_queue.get_jobs_by_name(f"Contrato_{chat_id}")
-                        next_run = job_info[0].next_run_time.strftime('%Y-%m-%d %H:%M:%S') if job_info else "N/A"
-                        print(f"- ID: {chat_id}, Nome: {data['nome']}, Próximo Envio: {next_run}")
-                else:
-                    print("- Nenhum agendamento ativo.")
-
-            elif comando == '4':
-                print("Encerrando o Bot...")
-                application.stop()
-                sys.exit(0)
-            else:
-                print("Comando inválido. Tente novamente.")
-                
-        except KeyboardInterrupt:
-            print("\nEncerrando o Bot...")
-            application.stop()
-            sys.exit(0)
+            chat_ids = await asyncio.to_thread(list, contratos_db)
+            novos, removidos = agendador.sincronizar(chat_ids)
+            if novos or removidos:
+                logger.info(f"Contratos sincronizados: {novos} novos, {removidos} removidos.")
         except Exception as e:
-             print(f"Erro no CLI: {e}")
-             
-async def follow_up_task(application: Application, msg):
-    """Tarefa assíncrona para enviar o follow-up de prospects."""
-    for user_id, nome in prospects_db.items():
-        print(f"Enviando follow-up para: {nome} (ID: {user_id})")
-        await enviar_follow_up_msg(user_id, msg, application)
-        await asyncio.sleep(1) 
-    print("--- Follow-up Concluído! ---")
+            logger.error(f"Erro ao sincronizar contratos: {e}")
 
+_tarefa_contagens = None
 
-# --- Execução Principal do Bot ---
+async def manter_contagens():
+    """Com estado compartilhado, mantém as contagens de 'contagem' atualizadas sem bloquear o event loop."""
+    while True:
+        try:
+            await asyncio.to_thread(atualizar_contagens)
+        except Exception as e:
+            logger.error(f"Erro ao contar prospects, contratos e conversas: {e}")
+        await asyncio.sleep(INTERVALO_CONTAGENS)
 
-if __name__ == '__main__':
-    import asyncio 
+async def iniciar_contagens(application: Application):
+    global _tarefa_contagens
+    if estado_compartilhado is not None:
+        _tarefa_contagens = asyncio.create_task(manter_contagens())
 
-    if "SEU_TOKEN_DO_TELEGRAM_AQUI" in TELEGRAM_BOT_TOKEN:
-        print("ERRO: Por favor, substitua 'SEU_TOKEN_DO_TELEGRAM_AQUI' pelo token real do BotFather.")
-        sys.exit(1)
-        
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+async def parar_contagens(application: Application):
+    if _tarefa_contagens is not None:
+        _tarefa_contagens.cancel()
+
+async def iniciar_agendador(application: Application):
+    """Sobe o loop do agendador de contratos junto com o event loop do bot (só no worker principal)."""
+    global _tarefa_sincronia
+    if not worker_primario:
+        return
+    agendador.iniciar()
+    if estado_compartilhado is not None:
+        _tarefa_sincronia = asyncio.create_task(sincronizar_contratos())
+
+async def parar_agendador(application: Application):
+    if _tarefa_sincronia is not None:
+        _tarefa_sincronia.cancel()
+    await agendador.parar()
+
+_servidor_metricas = None
+indice_worker = 0
+
+async def exportar_metricas(requisicao):
+    return Resposta(200, registro.exportar().encode(), TIPO_CONTEUDO)
+
+async def iniciar_metricas(application: Application):
+    """Sobe o GET /metrics deste processo no mesmo event loop do bot."""
+    global _servidor_metricas
+    if METRICAS_PORTA is None:
+        return
+    servidor = ServidorHTTP(METRICAS_HOST, METRICAS_PORTA + indice_worker).rota("GET", "/metrics", exportar_metricas)
+    try:
+        _servidor_metricas = await servidor.iniciar()
+    except OSError as e:
+        # Porta ocupada não impede o bot de atender
+        logger.error(f"Não foi possível expor /metrics na porta {servidor.porta}: {e}")
+
+async def parar_metricas(application: Application):
+    if _servidor_metricas is not None:
+        await _servidor_metricas.parar()
+
+_admin = None
+_servidor_admin = None
+
+def encerrar_bot():
+    """Encerramento gracioso pedido de dentro do event loop: o ciclo de stop/shutdown do bot roda inteiro."""
+    application.stop_running()
+
+async def iniciar_admin(application: Application):
+    """Sobe a API de administração (admin_telegram.py) no mesmo event loop do bot (só no worker principal)."""
+    global _admin, _servidor_admin
+    if ADMIN_PORTA is None or not worker_primario:
+        return
+    token = segredo("ADMIN_TOKEN", opcional=True)
+    if token is None and ADMIN_HOST not in ("127.0.0.1", "localhost", "::1"):
+        logger.error(f"API de administração não iniciada: defina ADMIN_TOKEN para escutar em {ADMIN_HOST}")
+        return
+    _admin = AdminTelegram(
+        token,
+        retrato_prospects=lambda: retrato(prospects_db),
+        retrato_contratos=lambda: retrato(contratos_db),
+        proxima_execucao=agendador.proxima_execucao,
+        enviar_follow_up=enviar_follow_up_prospects,
+        mensagem_follow_up=MSG_FOLLOW_UP_PROSPECTS,
+        relatorio=lambda: relatorio_memoria(application),
+        encerrar=encerrar_bot,
+    )
+    servidor = _admin.registrar(ServidorHTTP(ADMIN_HOST, ADMIN_PORTA))
+    try:
+        _servidor_admin = await servidor.iniciar()
+    except OSError as e:
+        logger.error(f"Não foi possível expor a API de administração na porta {servidor.porta}: {e}")
+
+async def parar_admin(application: Application):
+    if _servidor_admin is not None:
+        await _servidor_admin.parar()
+    if _admin is not None:
+        await _admin.parar()
+
+def aquecer():
+    """Carrega agora o que seria carregado na primeira pergunta livre. Retorna os segundos gastos."""
+    inicio = time.perf_counter()
+    obter_cliente_gemini()
+    _config_gemini()
+    obter_indice_faq()
+    return time.perf_counter() - inicio
+
+async def ao_iniciar(application: Application):
+    if AQUECER_NA_INICIALIZACAO:
+        segundos = await asyncio.to_thread(aquecer)
+        logger.info("Dependências carregadas na inicialização", extra={"duracao_ms": round(segundos * 1000, 1)})
+    await iniciar_contagens(application)
+    await iniciar_agendador(application)
+    await iniciar_metricas(application)
+    await iniciar_admin(application)
+
+async def ao_encerrar(application: Application):
+    await parar_admin(application)
+    await parar_metricas(application)
+    await parar_agendador(application)
+    await parar_contagens(application)
+
+def montar_aplicacao(token=None, base_url=None) -> Application:
+    """Cria o Application com o fluxo de conversa. 'base_url' permite apontar para outro servidor da Bot API."""
+    builder = (
+        Application.builder()
+        .token(token or token_telegram())
+        .concurrent_updates(ProcessadorPorChat(MAX_UPDATES_CONCORRENTES, backend=estado_compartilhado,
+                                               threads_backend=THREADS_ESTADO or threads_estado_padrao()))
+        .post_init(ao_iniciar)
+        .post_shutdown(ao_encerrar)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+    descartar_marcas_persistencia(application) # O bot não usa a persistência do PTB
     
-    # 1. Configuração do Flow de Conversação (ConversationHandler)
+    # Configuração do Flow de Conversação (ConversationHandler)
+    # Cada handler é medido com o rótulo do estado em que é chamado (telegram_handler_segundos)
     conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
+        entry_points=[CommandHandler("start", medido("inicio", start))],
         
         states={
             MENU_PRINCIPAL: [
-                MessageHandler(filters.Regex("^(Sou Cliente|Ainda Não Sou Cliente|Configurar Contrato \(Dev\))$"), menu_principal_handler),
-                MessageHandler(filters.TEXT & ~filters.COMMAND, fallback_gemini_handler) 
+                MessageHandler(filters.Regex(regex_opcoes("menu")), medido("menu_principal", menu_principal_handler)),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, medido("menu_principal", fallback_gemini_handler))
             ],
             CLIENTE_OPCOES: [
-                MessageHandler(filters.Regex("^(Suporte SLA|Questões Contratuais)$"), cliente_opcoes_handler),
-                MessageHandler(filters.TEXT & ~filters.COMMAND, fallback_gemini_handler)
+                MessageHandler(filters.Regex(regex_opcoes("sou_cliente")), medido("cliente_opcoes", cliente_opcoes_handler)),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, medido("cliente_opcoes", fallback_gemini_handler))
             ],
             CONTRATO_OPCOES: [
-                MessageHandler(filters.Regex("^(Remover Agendamento|Voltar ao Menu)$"), contrato_opcoes_handler),
+                MessageHandler(filters.Regex(regex_opcoes("contrato_existente")),
+                               medido("contrato_opcoes", contrato_opcoes_handler)),
             ],
             RECEBE_NOME_CONTRATO: [
-                MessageHandler(filters.TEXT & ~filters.COMMAND, handle_recebe_nome_contrato),
+                MessageHandler(filters.TEXT & ~filters.COMMAND, medido("recebe_nome_contrato", handle_recebe_nome_contrato)),
             ],
         },
-        fallbacks=[CommandHandler("cancel", cancel),CommandHandler("start", start)],
+        fallbacks=[CommandHandler("cancel", medido("fallback", cancel)), CommandHandler("start", medido("fallback", start))],
     )
 
+    global conversas_telegram
+    if estado_compartilhado is None and TEMPO_LIMITE_CONVERSA:
+        def ao_expirar(chat_id, user_id):
+            # O bot não usa user_data/chat_data, mas não deixa sobrar nada de quem foi embora
+            if user_id in application.user_data:
+                application.drop_user_data(user_id)
+            if chat_id in application.chat_data:
+                application.drop_chat_data(chat_id)
+
+        conversas_telegram = ConversasExpiraveis(TEMPO_LIMITE_CONVERSA, LARGURA_BALDE_CONVERSAS, ao_expirar)
+        expirar_conversas(conv_handler, conversas_telegram)
+    elif estado_compartilhado is not None:
+        # Chave: (ID do chat, ID do usuário), Valor: estado da conversa (inteiro)
+        conversas = DicionarioCompartilhado(
+            estado_compartilhado, "telegram_conversas",
+            serializar_chave=lambda chave: f"{chave[0]}:{chave[1]}",
+            desserializar_chave=lambda texto: tuple(int(parte) for parte in texto.split(":")),
+            desserializar=int,
+            chave_update=chave_conversa
+        )
+        compartilhar_conversas(conv_handler, conversas)
+        # O estado do chat de cada update é lido antes e gravado depois dele, numa thread
+        application.update_processor.estados = (conversas, prospects_db, contratos_db)
+        conversas_telegram = conversas
+    else:
+        conversas_telegram = {}
+        trocar_conversas(conv_handler, conversas_telegram)
+
     application.add_handler(conv_handler)
-    
-    # 2. Inicia o CLI em uma thread separada
-    cli_thread = threading.Thread(target=iniciar_cli, args=(application,))
-    cli_thread.daemon = True
-    cli_thread.start()
-
-    # 3. Inicia o Bot (polling)
-    print("Iniciando bot (polling)...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
\ No newline at end of file
+    return application
+
+def executar_worker(indice, segredo_webhook, url_publica, estado_url=None, porta=None, base_url=None):
+    """
+    Um worker do modo webhook. O worker 0 é o principal: roda o agendador e a API de administração.
+    """
+    global application, worker_primario, indice_worker
+    worker_primario = indice == 0
+    indice_worker = indice
+    if estado_url:
+        usar_estado_compartilhado(estado_url)
+    application = montar_aplicacao(base_url=base_url)
+
+    if worker_primario:
+        reidratar_contratos()
+
+    executar_webhook(application, segredo_webhook, WEBHOOK_CAMINHO, porta or WEBHOOK_PORTA, url_publica)
+
+def executar_processo_worker(indice, *args):
+    """Alvo do iniciar_workers: os workers 1+ são processos novos (spawn) e ligam os próprios logs."""
+    if indice > 0:
+        iniciar_logs()
+    executar_worker(indice, *args)
+
+if __name__ == '__main__':
+
+    iniciar_logs()
+    try:
+        token = token_telegram()
+    except SegredoAusente as erro:
+        print(f"ERRO: {erro}")
+        sys.exit(1)
+    if "SEU_TOKEN_DO_TELEGRAM_AQUI" in token:
+        print("ERRO: defina TELEGRAM_TOKEN no ambiente ou em codigo_bot.py com o token real do BotFather.")
+        sys.exit(1)
+    if do_ambiente():
+        logger.info("Configuração do ambiente", extra={"nomes": do_ambiente()})
+
+    if MODO_EXECUCAO == "webhook":
+        if not WEBHOOK_URL_PUBLICA:
+            print("ERRO: no modo webhook, configure WEBHOOK_URL_PUBLICA (endereço HTTPS que o Telegram chama).")
+            sys.exit(1)
+        if WEBHOOK_WORKERS > 1 and not ESTADO_URL:
+            print("ERRO: com mais de um worker, configure ESTADO_URL (estado compartilhado das conversas).")
+            sys.exit(1)
+        # O segredo é gerado antes de subir os workers, para todos aceitarem o mesmo token
+        segredo_webhook = WEBHOOK_SEGREDO or secrets.token_urlsafe(32)
+        print(f"Iniciando bot (webhook, {WEBHOOK_WORKERS} worker(s) na porta {WEBHOOK_PORTA})...")
+        iniciar_workers(WEBHOOK_WORKERS, executar_processo_worker, segredo_webhook, WEBHOOK_URL_PUBLICA, ESTADO_URL, WEBHOOK_PORTA)
+        sys.exit(0)
+
+    if ESTADO_URL:
+        usar_estado_compartilhado(ESTADO_URL)
+    application = montar_aplicacao()
+
+    # Restaura os agendamentos de contrato salvos antes do último reinício
+    reidratar_contratos()
+
+    # Inicia o Bot (polling), pedindo ao Telegram só os tipos de update que tratamos
+    print("Iniciando bot (polling)..."
+          + (f" Administração em http://{ADMIN_HOST}:{ADMIN_PORTA}/admin" if ADMIN_PORTA is not None else ""))
+    application.run_polling(allowed_updates=ALLOWED_UPDATES)
@@ -0,0 +1,82 @@
+import importlib
+import json
+import os
+
+# --- Configuração dos Bots ---
+# Ponto único de leitura da configuração. Cada valor é declarado no script com o seu padrão,
+# config("NOME", padrão), e pode ser trocado pela variável de ambiente CHATBOT_NOME, sem editar
+# o código (útil para réplicas e containers). Textos são usados como estão; os demais tipos são
+# lidos como JSON (números, true/false, null, listas e objetos).
+# Os segredos vêm da variável de ambiente ou, se ela não existir, do arquivo local
+# (codigo_bot.py / chave_api.py, fora do git), importado só quando o segredo é pedido.
+
+PREFIXO = "CHATBOT_"
+
+# Nome do segredo -> (módulo local, atributo). A variável de ambiente tem o mesmo nome do segredo.
+SEGREDOS = {
+    "TELEGRAM_TOKEN": ("codigo_bot", "TELEGRAM_TOKEN"),
+    "GOOGLE_API_KEY": ("chave_api", "GOOGLE_API_KEY"),
+    "ADMIN_TOKEN": ("codigo_bot", "ADMIN_TOKEN"),
+}
+
+_origens = {} # Chave: nome, Valor: "padrão" ou "ambiente"
+
+
+class SegredoAusente(RuntimeError):
+    """Segredo obrigatório que não está no ambiente nem no arquivo local."""
+
+
+def _numero(valor):
+    return isinstance(valor, (int, float)) and not isinstance(valor, bool)
+
+
+def _converter(nome, texto, padrao):
+    if isinstance(padrao, str):
+        return texto
+    try:
+        valor = json.loads(texto)
+    except ValueError:
+        if padrao is None:
+            return texto # Padrão None aceita texto puro (ex: URLs)
+        raise ValueError(f"{PREFIXO}{nome}: valor inválido {texto!r}") from None
+    if isinstance(padrao, tuple) and isinstance(valor, list):
+        return tuple(valor)
+    if _numero(padrao) and _numero(valor):
+        return valor # 10 ou 7.5 servem para um prazo declarado como 10
+    if padrao is not None and valor is not None and type(valor) is not type(padrao):
+        raise ValueError(f"{PREFIXO}{nome}: esperado {type(padrao).__name__}, recebido {texto!r}")
+    return valor
+
+
+def config(nome, padrao, ambiente=None):
+    """Valor da configuração 'nome': a variável de ambiente CHATBOT_<nome>, se existir, ou 'padrao'."""
+    texto = (os.environ if ambiente is None else ambiente).get(PREFIXO + nome)
+    if texto is None:
+        _origens[nome] = "padrão"
+        return padrao
+    _origens[nome] = "ambiente"
+    return _converter(nome, texto, padrao)
+
+
+def segredo(nome, ambiente=None, opcional=False):
+    """Segredo da variável de ambiente 'nome' ou do arquivo local correspondente.
+
+    Se não houver em nenhum dos dois, levanta SegredoAusente (ou retorna None com opcional=True).
+    """
+    valor = (os.environ if ambiente is None else ambiente).get(nome)
+    if valor:
+        return valor
+    modulo, atributo = SEGREDOS[nome]
+    try:
+        valor = getattr(importlib.import_module(modulo), atributo)
+    except (ImportError, AttributeError):
+        valor = None
+    if not valor and not opcional:
+        raise SegredoAusente(f"{nome} não definido: exporte a variável de ambiente {nome} "
+                             f"ou crie {modulo}.py com {atributo} = \"...\" (veja o README)")
+    return valor or None
+
+
+def do_ambiente():
+    """Nomes das configurações lidas até agora que vieram de variáveis de ambiente."""
+    return sorted(nome for nome, origem in _origens.items() if origem == "ambiente")
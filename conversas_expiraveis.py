@@ -0,0 +1,168 @@
+import logging
+import time
+from collections.abc import MutableMapping
+
+import telegram
+
+logger = logging.getLogger(__name__)
+
+# --- Estado das Conversas com Expiração por Inatividade ---
+# O ConversationHandler guarda o estado de cada conversa num dicionário que só perde a
+# chave quando o handler devolve END: quem abandona o menu no meio fica lá para sempre.
+# Este mapeamento substitui esse dicionário e esquece as conversas paradas há mais de
+# 'tempo_limite' segundos. Em vez de um timer por conversa (o conversation_timeout do PTB
+# agenda um job no JobQueue a cada update), as conversas são agrupadas em baldes de
+# 'largura_balde' segundos e um balde inteiro é varrido de uma vez quando vence.
+# Usado só dentro do event loop do bot (sem locks).
+
+# Trocar o mapeamento de estados do ConversationHandler depende de um atributo interno do
+# python-telegram-bot (_conversations, sem API pública). Testado nesta versão, a mesma minor
+# fixada no requirements.txt; trocar_conversas falha na inicialização se ele sumir.
+VERSAO_PTB_TESTADA = "22.8"
+
+TEMPO_LIMITE_PADRAO = 30 * 60
+LARGURA_BALDE_PADRAO = 60
+BITS_ESTADO = 8 # Estados de 0 a 255, guardados junto com o número do balde num único inteiro
+
+
+class ConversasExpiraveis(MutableMapping):
+    """
+    Mapeamento (ID do chat, ID do usuário) -> estado (inteiro) que expira por inatividade.
+
+    Representação compacta: em chats privados (chat == usuário, o caso do bot) a chave
+    interna é só o ID, sem a tupla; o valor é um único inteiro com o balde e o estado.
+    Cada balde é uma lista de chaves; uma conversa usada de novo não é tirada do balde
+    antigo, ela só é ignorada quando ele for varrido (o balde guardado no valor mudou).
+    'ao_expirar(chat_id, user_id)' é chamado para cada conversa esquecida.
+    """
+
+    def __init__(self, tempo_limite=TEMPO_LIMITE_PADRAO, largura_balde=LARGURA_BALDE_PADRAO, ao_expirar=None,
+                 relogio=time.monotonic):
+        self.tempo_limite = tempo_limite
+        self.largura_balde = largura_balde
+        self.ao_expirar = ao_expirar
+        self._relogio = relogio
+        self._estados = {}
+        self._baldes = {} # Chave: número do balde, Valor: lista de chaves internas
+        self._proximo_varrido = self._balde_atual()
+        self.expiradas = 0
+
+    def _balde_atual(self):
+        return int(self._relogio() // self.largura_balde)
+
+    @staticmethod
+    def _interna(chave):
+        chat_id, user_id = chave
+        return chat_id if chat_id == user_id else chave
+
+    @staticmethod
+    def _externa(interna):
+        return (interna, interna) if isinstance(interna, int) else interna
+
+    def varrer(self):
+        """Esquece as conversas dos baldes vencidos. Retorna quantas expiraram."""
+        # Um balde vence quando até a sua última conversa passou do tempo limite
+        ultimo_vencido = self._balde_atual() - self.tempo_limite // self.largura_balde - 1
+        expiradas = 0
+        if not self._baldes:
+            self._proximo_varrido = max(self._proximo_varrido, ultimo_vencido + 1) # Nada a varrer (ex: bot parado)
+        while self._proximo_varrido <= ultimo_vencido:
+            balde = self._proximo_varrido
+            self._proximo_varrido += 1
+            for interna in self._baldes.pop(balde, ()):
+                valor = self._estados.get(interna)
+                if valor is None or valor >> BITS_ESTADO != balde:
+                    continue # Conversa encerrada ou usada de novo depois (está num balde mais novo)
+                del self._estados[interna]
+                expiradas += 1
+                if self.ao_expirar is not None:
+                    self.ao_expirar(*self._externa(interna))
+        self.expiradas += expiradas
+        return expiradas
+
+    def __getitem__(self, chave):
+        return self._estados[self._interna(chave)] & ((1 << BITS_ESTADO) - 1)
+
+    def __setitem__(self, chave, estado):
+        if not isinstance(estado, int) or not 0 <= estado < 1 << BITS_ESTADO:
+            # Só handlers bloqueantes (estados inteiros); um PendingState não cabe aqui
+            raise TypeError(f"Estado de conversa não suportado: {estado!r}")
+        self.varrer()
+        balde = self._balde_atual()
+        interna = self._interna(chave)
+        anterior = self._estados.get(interna)
+        if anterior is None or anterior >> BITS_ESTADO != balde:
+            self._baldes.setdefault(balde, []).append(interna)
+        self._estados[interna] = balde << BITS_ESTADO | estado
+
+    def __delitem__(self, chave):
+        # A chave continua no balde e é ignorada na varredura
+        del self._estados[self._interna(chave)]
+
+    def __contains__(self, chave):
+        return self._interna(chave) in self._estados
+
+    def __iter__(self):
+        return map(self._externa, list(self._estados))
+
+    def __len__(self):
+        return len(self._estados)
+
+    def estatisticas(self):
+        return {
+            "conversas": len(self._estados),
+            "baldes": len(self._baldes),
+            "chaves_nos_baldes": sum(map(len, self._baldes.values())),
+            "expiradas": self.expiradas,
+        }
+
+
+def trocar_conversas(conv_handler, conversas):
+    """
+    Faz o ConversationHandler guardar os estados em 'conversas' (qualquer MutableMapping)
+    no lugar do dicionário interno. Levanta RuntimeError se a versão instalada do PTB não
+    tiver mais esse dicionário: sem a checagem, o mapeamento seria ignorado em silêncio.
+    """
+    if not hasattr(conv_handler, "_conversations"):
+        raise RuntimeError(
+            f"python-telegram-bot {telegram.__version__}: ConversationHandler._conversations não "
+            f"existe mais (testado com {VERSAO_PTB_TESTADA}); instale a versão do requirements.txt"
+        )
+    conv_handler._conversations = conversas
+    return conv_handler
+
+
+def expirar_conversas(conv_handler, conversas):
+    """Faz o ConversationHandler guardar os estados em 'conversas' (ConversasExpiraveis)."""
+    return trocar_conversas(conv_handler, conversas)
+
+
+# --- Contorno: IDs anotados para uma persistência que não existe ---
+# Vazamento do PTB (testado em VERSAO_PTB_TESTADA): sem persistência, o Application ainda anota
+# o ID de todo chat e usuário que mandou um update nestes conjuntos internos, para salvar na
+# próxima update_persistence, que nunca roda; eles só crescem. O contorno fica isolado aqui:
+# só vale sem persistência, só troca os atributos que existirem como conjuntos e pode ser
+# removido quando o PTB deixar de anotar os IDs sem persistência.
+_MARCAS_PERSISTENCIA = ("_chat_ids_to_be_updated_in_persistence", "_user_ids_to_be_updated_in_persistence",
+                        "_chat_ids_to_be_deleted_in_persistence", "_user_ids_to_be_deleted_in_persistence")
+
+
+class _ConjuntoDescartado(set):
+    """Conjunto que ignora inserções."""
+
+    def add(self, item):
+        pass
+
+
+def descartar_marcas_persistencia(application):
+    """Troca os conjuntos de IDs pendentes de persistência por versões que ignoram inserções (sem persistência)."""
+    if application.persistence is not None:
+        return application
+    for atributo in _MARCAS_PERSISTENCIA:
+        if not isinstance(getattr(application, atributo, None), set):
+            # Outra versão do PTB: nada a contornar neste atributo (ou ele mudou de forma)
+            logger.warning(f"python-telegram-bot {telegram.__version__}: Application.{atributo} não encontrado; "
+                           f"contorno do vazamento sem persistência não aplicado nele")
+            continue
+        setattr(application, atributo, _ConjuntoDescartado())
+    return application
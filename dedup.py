@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+
+# --- Deduplicação de Mensagens do Webhook ---
+# A Meta reenvia eventos quando a confirmação demora. Guardamos os IDs das mensagens
+# já vistas por um tempo limitado para descartar as repetições em O(1).
+
+TTL_PADRAO = 24 * 3600 # A Meta pode reenviar por até ~1 dia
+MAX_ITENS_PADRAO = 200_000
+
+
+class _ContadorDedup:
+    """Contadores de verificações e duplicatas (taxa de acerto do dedup)."""
+
+    def __init__(self):
+        self.verificados = 0
+        self.duplicados = 0
+
+    def estatisticas(self):
+        return {
+            "verificados": self.verificados,
+            "duplicados": self.duplicados,
+            "taxa_duplicados": (self.duplicados / self.verificados) if self.verificados else 0.0,
+        }
+
+
+class DedupMemoria(_ContadorDedup):
+    """Índice em memória (por processo) com expiração por tempo e limite de itens."""
+
+    def __init__(self, ttl=TTL_PADRAO, max_itens=MAX_ITENS_PADRAO):
+        super().__init__()
+        self.ttl = ttl
+        self.max_itens = max_itens
+        # Chave: ID da mensagem, Valor: instante em que expira. A ordem de inserção é a ordem de expiração.
+        self._vistos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def e_nova(self, id_mensagem):
+        """Registra o ID e retorna True se ele ainda não tinha sido visto."""
+        agora = time.monotonic()
+        with self._lock:
+            self.verificados += 1
+
+            # Remove do início os IDs expirados (amortizado O(1))
+            while self._vistos:
+                primeiro, expira = next(iter(self._vistos.items()))
+                if expira > agora and len(self._vistos) < self.max_itens:
+                    break
+                del self._vistos[primeiro]
+
+            expira = self._vistos.get(id_mensagem)
+            if expira is not None and expira > agora:
+                self.duplicados += 1
+                return False
+
+            self._vistos[id_mensagem] = agora + self.ttl
+            return True
+
+    def __len__(self):
+        return len(self._vistos)
+
+
+class DedupRedis(_ContadorDedup):
+    """Índice compartilhado entre processos (vários workers do Flask) usando SET NX com expiração."""
+
+    def __init__(self, cliente, ttl=TTL_PADRAO, prefixo="wa:msg:"):
+        super().__init__()
+        self.cliente = cliente
+        self.ttl = ttl
+        self.prefixo = prefixo
+        self._lock = threading.Lock()
+
+    def e_nova(self, id_mensagem):
+        """Registra o ID e retorna True se nenhum processo o tinha visto ainda."""
+        nova = bool(self.cliente.set(self.prefixo + id_mensagem, 1, nx=True, ex=int(self.ttl)))
+        with self._lock:
+            self.verificados += 1
+            if not nova:
+                self.duplicados += 1
+        return nova
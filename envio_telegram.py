@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import timedelta
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError, TimedOut
+
+from metricas import registro
+
+logger = logging.getLogger(__name__)
+
+# --- Motor de Envio do Telegram (follow-ups e campanhas) ---
+# Limites do Telegram para bots: ~30 mensagens/s no total e ~1 mensagem/s por chat.
+# Usamos valores um pouco abaixo para ter folga.
+MSGS_POR_SEGUNDO = 25
+INTERVALO_POR_CHAT = 1.0
+MAX_TENTATIVAS = 4
+BACKOFF_INICIAL = 1.0
+MAX_ENVIOS_CONCORRENTES = 30
+
+# Mesmas métricas do envio do WhatsApp (envio_whatsapp), separadas pelo rótulo 'canal'
+LATENCIA_ENVIO = registro.histograma("chatbot_envio_segundos", "Latência de cada chamada de envio à API", ("canal",))
+FALHAS_ENVIO = registro.contador("chatbot_envio_falhas_total", "Envios que falharam após todas as tentativas", ("canal",))
+
+
+def _segundos(valor) -> float:
+    """RetryAfter.retry_after pode vir como int ou timedelta, conforme a versão da biblioteca."""
+    return valor.total_seconds() if isinstance(valor, timedelta) else float(valor)
+
+
+class BaldeTokens:
+    """Token bucket assíncrono: libera no máximo 'taxa' envios por segundo (com rajada de 'capacidade')."""
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = taxa
+        self.capacidade = capacidade or taxa
+        self._tokens = float(self.capacidade)
+        self._atualizado = time.monotonic()
+        self._pausado_ate = 0.0
+
+    def pausar(self, segundos):
+        """Suspende todos os envios (ex: o Telegram respondeu RetryAfter)."""
+        self._pausado_ate = max(self._pausado_ate, time.monotonic() + segundos)
+
+    async def adquirir(self):
+        while True:
+            agora = time.monotonic()
+            if agora < self._pausado_ate:
+                await asyncio.sleep(self._pausado_ate - agora)
+                continue
+
+            self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado) * self.taxa)
+            self._atualizado = agora
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.taxa)
+
+
+class MotorEnvio:
+    """Envia mensagens respeitando o limite global do bot e o limite por chat, com novas tentativas."""
+
+    def __init__(self, bot, msgs_por_segundo=MSGS_POR_SEGUNDO, intervalo_por_chat=INTERVALO_POR_CHAT,
+                 max_tentativas=MAX_TENTATIVAS):
+        self.bot = bot
+        self.balde = BaldeTokens(msgs_por_segundo)
+        self.intervalo_por_chat = intervalo_por_chat
+        self.max_tentativas = max_tentativas
+        # Chave: ID do chat, Valor: instante (monotonic) a partir do qual pode receber outra mensagem
+        self._proximo_por_chat = {}
+
+    async def _aguardar_chat(self, chat_id):
+        agora = time.monotonic()
+        liberado_em = self._proximo_por_chat.get(chat_id, 0.0)
+        self._proximo_por_chat[chat_id] = max(agora, liberado_em) + self.intervalo_por_chat
+        if liberado_em > agora:
+            await asyncio.sleep(liberado_em - agora)
+
+        # Limpeza periódica para o dicionário não crescer sem limite
+        if len(self._proximo_por_chat) > 10000:
+            self._proximo_por_chat = {c: t for c, t in self._proximo_por_chat.items() if t > agora}
+
+    async def enviar(self, chat_id, texto, parse_mode='Markdown'):
+        """Envia uma mensagem. Retorna None em caso de sucesso ou a descrição do erro final."""
+        await self._aguardar_chat(chat_id)
+
+        for tentativa in range(1, self.max_tentativas + 1):
+            await self.balde.adquirir()
+            try:
+                with LATENCIA_ENVIO.cronometrar("telegram"):
+                    await self.bot.send_message(chat_id=chat_id, text=texto, parse_mode=parse_mode)
+                return None
+            except RetryAfter as e:
+                # Limite do bot inteiro: pausa todos os envios, não só este
+                espera = _segundos(e.retry_after)
+                logger.warning("Telegram pediu para aguardar", extra={"chat_id": chat_id, "espera_s": espera})
+                self.balde.pausar(espera)
+                erro = f"RetryAfter({espera}s)"
+            except (Forbidden, BadRequest) as e:
+                # Usuário bloqueou o bot, chat inexistente, texto inválido...: não adianta repetir
+                FALHAS_ENVIO.inc("telegram")
+                return f"{type(e).__name__}: {e}"
+            except (TimedOut, NetworkError) as e:
+                erro = f"{type(e).__name__}: {e}"
+                if tentativa < self.max_tentativas:
+                    # Backoff exponencial com jitter
+                    await asyncio.sleep(BACKOFF_INICIAL * 2 ** (tentativa - 1) * random.uniform(0.5, 1.5))
+            except TelegramError as e:
+                # Outros erros do Telegram (ex: ChatMigrated): falha deste chat, sem repetir
+                FALHAS_ENVIO.inc("telegram")
+                return f"{type(e).__name__}: {e}"
+            except Exception as e:
+                logger.exception("Erro inesperado no envio", extra={"chat_id": chat_id})
+                FALHAS_ENVIO.inc("telegram")
+                return f"{type(e).__name__}: {e}"
+
+        FALHAS_ENVIO.inc("telegram")
+        return erro
+
+    async def enviar_em_massa(self, chat_ids, texto, max_concorrentes=MAX_ENVIOS_CONCORRENTES,
+                              ao_progredir=None, parse_mode='Markdown'):
+        """
+        Envia o texto para vários chats em paralelo (dentro dos limites).
+        'texto' pode ser uma string ou uma função chat_id -> string (mensagem personalizada).
+
+        'ao_progredir(enviados, falhas, total)' é chamado a cada ~5% do total.
+        Retorna um resumo com totais, duração e os erros por chat.
+        """
+        chat_ids = list(chat_ids)
+        total = len(chat_ids)
+        fila = asyncio.Queue()
+        for chat_id in chat_ids:
+            fila.put_nowait(chat_id)
+
+        resumo = {"total": total, "enviados": 0, "falhas": 0, "erros": {}}
+        passo_progresso = max(1, total // 20)
+        inicio = time.monotonic()
+
+        async def trabalhador():
+            while True:
+                try:
+                    chat_id = fila.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    erro = await self.enviar(chat_id, texto(chat_id) if callable(texto) else texto, parse_mode)
+                except Exception as e:
+                    # Ex: a função que monta a mensagem falhou para este chat; os outros seguem
+                    logger.exception("Erro ao preparar o envio", extra={"chat_id": chat_id})
+                    erro = f"{type(e).__name__}: {e}"
+                if erro is None:
+                    resumo["enviados"] += 1
+                else:
+                    resumo["falhas"] += 1
+                    resumo["erros"][chat_id] = erro
+                feitos = resumo["enviados"] + resumo["falhas"]
+                if ao_progredir and (feitos % passo_progresso == 0 or feitos == total):
+                    try:
+                        ao_progredir(resumo["enviados"], resumo["falhas"], total)
+                    except Exception:
+                        logger.exception("Erro no acompanhamento do envio em massa")
+
+        # return_exceptions: a falha de um trabalhador não cancela os outros nem perde o resumo
+        for falha in await asyncio.gather(*(trabalhador() for _ in range(min(max_concorrentes, total))),
+                                          return_exceptions=True):
+            if isinstance(falha, Exception):
+                logger.error("Trabalhador do envio em massa falhou", exc_info=falha)
+        resumo["duracao"] = time.monotonic() - inicio
+        return resumo
@@ -0,0 +1,136 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metricas import registro
+
+# --- Envio de Mensagens pela API do WhatsApp (Graph API) ---
+# Uma única Session com pool de conexões keep-alive é reaproveitada por todos os envios,
+# evitando abrir uma conexão TCP/TLS nova a cada mensagem.
+
+MSGS_POR_SEGUNDO = 20
+MAX_ENVIOS_CONCORRENTES = 10
+MAX_TENTATIVAS = 4
+BACKOFF_INICIAL = 0.5
+TIMEOUT_REQUISICAO = 10
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+# Mesmas métricas do envio do Telegram (envio_telegram), separadas pelo rótulo 'canal'
+LATENCIA_ENVIO = registro.histograma("chatbot_envio_segundos", "Latência de cada chamada de envio à API", ("canal",))
+FALHAS_ENVIO = registro.contador("chatbot_envio_falhas_total", "Envios que falharam após todas as tentativas", ("canal",))
+
+
+class LimitadorTaxa:
+    """Token bucket thread-safe: no máximo 'taxa' mensagens por segundo."""
+
+    def __init__(self, taxa, capacidade=None):
+        self.taxa = taxa
+        self.capacidade = capacidade or taxa
+        self._tokens = float(self.capacidade)
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._atualizado) * self.taxa)
+                self._atualizado = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+
+
+class EnviadorWhatsApp:
+    """Envia mensagens reais (Session com pool) ou simuladas (token de exemplo / modo local)."""
+
+    def __init__(self, api_url, access_token, msgs_por_segundo=MSGS_POR_SEGUNDO,
+                 max_concorrentes=MAX_ENVIOS_CONCORRENTES, max_tentativas=MAX_TENTATIVAS, simulado=None):
+        if simulado is None:
+            simulado = not access_token or "SEU_TOKEN_DE_ACESSO_AQUI" in access_token
+        self.simulado = simulado
+        self.api_url = api_url
+        self.max_concorrentes = max_concorrentes
+        self.max_tentativas = max_tentativas
+        self.limitador = LimitadorTaxa(msgs_por_segundo)
+
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max_concorrentes, max_retries=0)
+        self.sessao.mount("https://", adaptador)
+        self.sessao.mount("http://", adaptador)
+        self.sessao.headers["Authorization"] = f"Bearer {access_token}"
+
+    def _espera_retry(self, resposta, tentativa):
+        """Respeita o cabeçalho Retry-After; senão, backoff exponencial com jitter."""
+        retry_after = resposta.headers.get("Retry-After") if resposta is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return BACKOFF_INICIAL * 2 ** (tentativa - 1) * random.uniform(0.5, 1.5)
+
+    def enviar(self, dados_mensagem):
+        """Faz o POST para a Graph API, repetindo em 429/5xx e falhas de conexão."""
+        if self.simulado:
+            return {"status": "success", "simulado": True}
+
+        for tentativa in range(1, self.max_tentativas + 1):
+            self.limitador.adquirir()
+            resposta = None
+            try:
+                with LATENCIA_ENVIO.cronometrar("whatsapp"):
+                    resposta = self.sessao.post(self.api_url, json=dados_mensagem, timeout=TIMEOUT_REQUISICAO)
+                if resposta.status_code not in STATUS_REPETIVEIS:
+                    if not resposta.ok:
+                        FALHAS_ENVIO.inc("whatsapp") # Erro definitivo (ex: 400): não adianta repetir
+                    resposta.raise_for_status()
+                    return resposta.json()
+                erro = f"HTTP {resposta.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                erro = f"{type(e).__name__}: {e}"
+
+            if tentativa < self.max_tentativas:
+                time.sleep(self._espera_retry(resposta, tentativa))
+
+        FALHAS_ENVIO.inc("whatsapp")
+        raise RuntimeError(f"Falha ao enviar mensagem após {self.max_tentativas} tentativas ({erro})")
+
+    def enviar_em_massa(self, mensagens, ao_enviar=None):
+        """
+        Envia várias mensagens em paralelo dentro do limite de mensagens por segundo.
+
+        'mensagens' é uma lista de (destinatario, dados_mensagem).
+        Retorna um resumo com totais, duração e os erros por destinatário.
+        """
+        resumo = {"total": len(mensagens), "enviados": 0, "falhas": 0, "erros": {}}
+        lock = threading.Lock()
+        inicio = time.monotonic()
+
+        def enviar_um(item):
+            destinatario, dados_mensagem = item
+            try:
+                self.enviar(dados_mensagem)
+                erro = None
+            except Exception as e:
+                erro = str(e)
+            with lock:
+                if erro is None:
+                    resumo["enviados"] += 1
+                else:
+                    resumo["falhas"] += 1
+                    resumo["erros"][destinatario] = erro
+            if ao_enviar:
+                ao_enviar(destinatario, erro)
+
+        with ThreadPoolExecutor(max_workers=self.max_concorrentes) as executor:
+            list(executor.map(enviar_um, mensagens))
+
+        resumo["duracao"] = time.monotonic() - inicio
+        return resumo
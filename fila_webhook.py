@@ -0,0 +1,131 @@
+import logging
+import queue
+import threading
+import time
+
+# --- Fila de Processamento do Webhook ---
+# O webhook só valida e enfileira a mensagem, respondendo 200 na hora.
+# Trabalhadores em segundo plano fazem o processamento (incluindo o envio da resposta).
+
+# Comportamentos quando a fila está cheia
+RECUSAR = "recusar"                   # Devolve False: o webhook responde 503 e a Meta reenvia depois
+DESCARTAR_ANTIGA = "descartar_antiga" # Descarta a mensagem mais antiga para dar lugar à nova
+BLOQUEAR = "bloquear"                 # Espera até 'timeout_bloqueio' segundos por uma vaga
+
+_FIM = object() # Sentinela que encerra um trabalhador
+
+logger = logging.getLogger(__name__)
+
+
+class FilaProcessamento:
+    """Fila limitada + pool de threads que executa 'processar(*args)' para cada item."""
+
+    def __init__(self, processar, tamanho_max=1000, trabalhadores=4, ao_encher=RECUSAR, timeout_bloqueio=0.5):
+        if ao_encher not in (RECUSAR, DESCARTAR_ANTIGA, BLOQUEAR):
+            raise ValueError(f"Comportamento de fila cheia inválido: {ao_encher}")
+
+        self.processar = processar
+        self.ao_encher = ao_encher
+        self.timeout_bloqueio = timeout_bloqueio
+        self.num_trabalhadores = trabalhadores
+        self._fila = queue.Queue(maxsize=tamanho_max)
+        self._threads = []
+        self._encerrando = False
+        self._lock = threading.Lock()
+
+        self.enfileirados = 0
+        self.processados = 0
+        self.erros = 0
+        self.descartados = 0
+        self.recusados = 0
+
+    def iniciar(self):
+        for i in range(self.num_trabalhadores):
+            t = threading.Thread(target=self._trabalhador, name=f"fila-webhook-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def _contar(self, campo):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def _trabalhador(self):
+        while True:
+            item = self._fila.get()
+            try:
+                if item is _FIM:
+                    return
+                self.processar(*item)
+                self._contar("processados")
+            except Exception:
+                self._contar("erros")
+                logger.exception("Erro ao processar mensagem da fila")
+            finally:
+                self._fila.task_done()
+
+    def enfileirar(self, *args):
+        """Coloca um item na fila. Retorna False se ele foi recusado."""
+        if self._encerrando:
+            self._contar("recusados")
+            return False
+
+        try:
+            if self.ao_encher == BLOQUEAR:
+                self._fila.put(args, timeout=self.timeout_bloqueio)
+            else:
+                self._fila.put_nowait(args)
+        except queue.Full:
+            if self.ao_encher != DESCARTAR_ANTIGA:
+                self._contar("recusados")
+                return False
+            # Abre espaço descartando a mensagem mais antiga
+            try:
+                self._fila.get_nowait()
+                self._fila.task_done()
+                self._contar("descartados")
+            except queue.Empty:
+                pass
+            try:
+                self._fila.put_nowait(args)
+            except queue.Full:
+                self._contar("recusados")
+                return False
+
+        self._contar("enfileirados")
+        return True
+
+    @property
+    def profundidade(self):
+        """Quantidade de itens aguardando processamento (gauge)."""
+        return self._fila.qsize()
+
+    def estatisticas(self):
+        return {
+            "profundidade": self.profundidade,
+            "capacidade": self._fila.maxsize,
+            "enfileirados": self.enfileirados,
+            "processados": self.processados,
+            "erros": self.erros,
+            "descartados": self.descartados,
+            "recusados": self.recusados,
+        }
+
+    def encerrar(self, timeout=10.0):
+        """Para de aceitar itens, processa o que já está na fila e encerra os trabalhadores."""
+        if self._encerrando:
+            return self.profundidade # Já encerrada (ex: pelo __main__ e depois pelo atexit)
+        self._encerrando = True
+        limite = time.monotonic() + timeout
+        for _ in self._threads:
+            # Sentinelas entram depois dos itens pendentes, então a fila é drenada primeiro
+            try:
+                self._fila.put(_FIM, timeout=max(0.0, limite - time.monotonic()))
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(max(0.0, limite - time.monotonic()))
+        pendentes = self.profundidade
+        if pendentes:
+            logger.warning("Fila encerrada com mensagens não processadas", extra={"pendentes": pendentes})
+        return pendentes
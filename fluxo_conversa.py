@@ -0,0 +1,84 @@
+import json
+import os
+from types import MappingProxyType
+from typing import NamedTuple
+
+from cache_respostas import normalizar_pergunta
+
+# --- Fluxo de Conversa Compartilhado (WhatsApp e Telegram) ---
+# O fluxo é declarado em fluxo.json e compilado uma vez na inicialização:
+# cada texto/ID aceito vira uma entrada de dicionário (busca O(1)) e cada resposta
+# fica pré-montada. Novos ramos do menu não aumentam o custo por mensagem.
+
+CAMINHO_FLUXO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fluxo.json")
+
+WHATSAPP = "whatsapp"
+TELEGRAM = "telegram"
+
+
+class Resposta(NamedTuple):
+    """Resposta pré-montada de um nó do fluxo (imutável)."""
+    id: str
+    texto: str
+    botao: str
+    opcoes: tuple # ((id, titulo), ...)
+    acao: str
+
+
+def _no_disponivel(item, canal):
+    canais = item.get("canais")
+    return canais is None or canal in canais
+
+
+class FluxoCompilado:
+    """Fluxo de um canal, com as intenções indexadas por texto normalizado e por ID interativo."""
+
+    def __init__(self, definicao, canal):
+        self.canal = canal
+        nos = {id_no: no for id_no, no in definicao["nos"].items() if _no_disponivel(no, canal)}
+
+        respostas = {}
+        intencoes = {}
+        for id_no, no in nos.items():
+            opcoes = tuple(
+                (opcao["id"], opcao["titulo"])
+                for opcao in no.get("opcoes", ())
+                if _no_disponivel(opcao, canal) and opcao["id"] in nos
+            )
+            respostas[id_no] = Resposta(id_no, no.get("texto"), no.get("botao"), opcoes, no.get("acao"))
+
+            for gatilho in no.get("gatilhos", ()):
+                intencoes[gatilho] = id_no
+
+        # Opções levam ao nó de mesmo ID, tanto pelo ID interativo quanto pelo título do botão
+        for resposta in respostas.values():
+            for id_opcao, titulo in resposta.opcoes:
+                intencoes[id_opcao] = id_opcao
+                intencoes[titulo] = id_opcao
+
+        self.respostas = MappingProxyType(respostas)
+        self.inicio = definicao["inicio"]
+        self.fallback = definicao.get("fallback") if definicao.get("fallback") in nos else None
+        # Dois níveis de busca: texto exato (botões) e texto normalizado (digitação livre)
+        self._exatos = MappingProxyType(dict(intencoes))
+        self._normalizados = MappingProxyType({normalizar_pergunta(t): id_no for t, id_no in intencoes.items()})
+
+    def intencao(self, texto):
+        """ID do nó correspondente ao texto recebido, ou None."""
+        id_no = self._exatos.get(texto)
+        if id_no is None:
+            id_no = self._normalizados.get(normalizar_pergunta(texto))
+        return id_no
+
+    def resposta(self, id_no):
+        return self.respostas[id_no]
+
+    def titulos(self, id_no):
+        """Títulos dos botões de um nó, na ordem declarada."""
+        return tuple(titulo for _, titulo in self.respostas[id_no].opcoes)
+
+
+def carregar_fluxo(canal, caminho=CAMINHO_FLUXO):
+    """Lê o fluxo.json e compila para o canal informado (WHATSAPP ou TELEGRAM)."""
+    with open(caminho, encoding="utf-8") as f:
+        return FluxoCompilado(json.load(f), canal)
@@ -0,0 +1,236 @@
+import html
+import re
+
+# --- Formatação das Respostas do Gemini para o Telegram ---
+# O modelo escreve Markdown comum (**negrito**, *itálico*, `código`, ```blocos```, # títulos,
+# listas com "* "), que o parse_mode 'Markdown' do Telegram não entende direito: um '*' ou '_'
+# sem par faz o envio falhar. Aqui a resposta é convertida, numa passada por parágrafo, para o
+# HTML do Telegram, em que só '<', '>' e '&' precisam de escape e toda tag aberta é fechada
+# na mesma linha. Marcadores sem par ficam como texto. Respostas longas são divididas em
+# mensagens de até LIMITE_MENSAGEM caracteres, de preferência entre parágrafos, sem cortar
+# uma tag ao meio.
+
+PARSE_MODE = "HTML"
+LIMITE_MENSAGEM = 4096
+_SEPARADOR_PARAGRAFO = "\n\n"
+
+_INLINE = (
+    r"(?P<crases>`{1,3})(?P<codigo>[^`\n]+?)(?P=crases)"
+    r"|\[(?P<rotulo>[^\]\n]+)\]\((?P<url>https?://[^\s()<>]+)\)"
+    r"|\*\*(?P<negrito>\S(?:.*?\S)?)\*\*"
+    r"|__(?P<negrito2>\S(?:.*?\S)?)__"
+    r"|~~(?P<riscado>\S(?:.*?\S)?)~~"
+    r"|\*(?<![\w*]\*)(?P<italico>[^\s*](?:[^*\n]*?[^\s*])?)\*(?![\w*])"
+    r"|_(?<![\w_]_)(?P<italico2>[^\s_](?:[^_\n]*?[^\s_])?)_(?![\w_])"
+)
+# Dentro de negrito, itálico e títulos só as marcações no meio da linha; no parágrafo também
+# títulos e itens de lista.
+# Toda alternativa começa com um caractere fixo (os títulos e itens, com o '\n' antes da linha),
+# o que deixa a regex pular direto para o próximo candidato: com '^' ou um lookbehind na frente,
+# ela testaria todas as alternativas em cada posição do texto (~7x mais lento).
+_RE_INLINE = re.compile(_INLINE)
+_RE_PARAGRAFO = re.compile(
+    r"\n(?:[ \t]{0,3}#{1,6}[ \t]+(?P<titulo>\S[^\n]*?)[ \t#]*$"
+    r"|(?P<recuo>[ \t]*)[*+-][ \t]+(?P<item>))"
+    r"|" + _INLINE,
+    re.MULTILINE
+)
+_MARCADORES = frozenset("`[*_~#+-")
+_TAGS = {"negrito": "b", "negrito2": "b", "riscado": "s", "italico": "i", "italico2": "i"}
+_RE_TAG = re.compile(r"<[^>]*>")
+# Linha que abre ou fecha um bloco de código: ``` e, opcionalmente, a linguagem. Com mais coisa
+# (ex: "```print(1)```" numa linha só) a linha é texto comum, para nada se perder.
+_RE_CERCA = re.compile(r"```(?P<linguagem>[\w+#.-]{0,30})")
+
+
+def _escapar(texto):
+    return texto.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _tamanho(texto):
+    # O Telegram conta em unidades UTF-16 (um emoji fora do plano básico vale 2)
+    return len(texto) if texto.isascii() else len(texto.encode("utf-16-le")) // 2
+
+
+def cortar(texto, limite=LIMITE_MENSAGEM):
+    """Início do texto com no máximo 'limite' unidades UTF-16, sem partir um emoji ao meio."""
+    if _tamanho(texto) <= limite:
+        return texto
+    # errors="ignore" descarta a metade de um par surrogate que ficou no corte
+    return texto.encode("utf-16-le")[:limite * 2].decode("utf-16-le", errors="ignore")
+
+
+def _formatar(texto, regex):
+    """Uma passada da regex pelo texto: o que casa vira tag, o resto é escapado."""
+    if _MARCADORES.isdisjoint(texto):
+        return _escapar(texto)
+    saida = []
+    inicio = 0
+    for marca in regex.finditer(texto):
+        saida.append(_escapar(texto[inicio:marca.start()]))
+        grupo = marca.lastgroup
+        if grupo == "codigo":
+            saida.append(f"<code>{_escapar(marca.group(grupo))}</code>")
+        elif grupo == "url":
+            url = html.escape(marca.group("url"), quote=True)
+            saida.append(f'<a href="{url}">{_escapar(marca.group("rotulo"))}</a>')
+        elif grupo == "titulo":
+            # O título já vira negrito: os marcadores de ênfase nas pontas são redundantes
+            titulo = marca.group(grupo).strip("*_") or marca.group(grupo)
+            saida.append(f"\n<b>{_formatar(titulo, _RE_INLINE)}</b>")
+        elif grupo == "item":
+            saida.append(f"\n{marca.group('recuo')}• ")
+        else:
+            tag = _TAGS[grupo]
+            saida.append(f"<{tag}>{_formatar(marca.group(grupo), _RE_INLINE)}</{tag}>")
+        inicio = marca.end()
+    saida.append(_escapar(texto[inicio:]))
+    return "".join(saida)
+
+
+def _formatar_paragrafo(texto):
+    # O '\n' na frente faz a primeira linha casar com os títulos e itens, como as outras
+    return _formatar("\n" + texto, _RE_PARAGRAFO)[1:]
+
+
+def _formatar_codigo(linguagem, linhas):
+    codigo = _escapar("\n".join(linhas))
+    if linguagem:
+        return f'<pre><code class="language-{_escapar(linguagem)}">{codigo}</code></pre>'
+    return f"<pre>{codigo}</pre>"
+
+
+def _blocos(texto):
+    """Parágrafos e blocos de código, em ordem: (linguagem ou None se for parágrafo, linhas)."""
+    paragrafo = []
+    codigo = None # Linhas do bloco de código aberto
+    linguagem = ""
+    for linha in texto.replace("\r\n", "\n").split("\n"):
+        cerca = _RE_CERCA.fullmatch(linha.strip()) if "```" in linha else None
+        if codigo is not None:
+            if cerca:
+                yield linguagem, codigo
+                codigo = None
+            else:
+                codigo.append(linha)
+        elif cerca:
+            if paragrafo:
+                yield None, paragrafo
+                paragrafo = []
+            codigo = []
+            linguagem = cerca.group("linguagem")
+        elif linha.strip():
+            paragrafo.append(linha)
+        elif paragrafo:
+            yield None, paragrafo
+            paragrafo = []
+    if paragrafo:
+        yield None, paragrafo
+    if codigo is not None:
+        yield linguagem, codigo # Bloco sem o ``` de fechamento (ex: resposta cortada): fecha aqui
+
+
+def _partir_linha(linha, limite):
+    """
+    Linha que não cabe numa mensagem: cortada (no último espaço antes do ponto estimado, se
+    houver) onde a primeira parte deve caber, e cada parte cortada de novo até caber.
+    """
+    formatada = _formatar_paragrafo(linha)
+    tamanho = _tamanho(formatada)
+    if tamanho <= limite or len(linha) < 2:
+        return [formatada]
+    # Proporcional ao que o escape, as tags e os emojis aumentaram a linha
+    ponto = min(len(linha) - 1, max(1, len(linha) * limite // tamanho))
+    corte = linha.rfind(" ", 0, ponto + 1)
+    if corte <= 0:
+        return _partir_linha(linha[:ponto], limite) + _partir_linha(linha[ponto:], limite)
+    return _partir_linha(linha[:corte], limite) + _partir_linha(linha[corte + 1:], limite)
+
+
+def _partes_paragrafo(linhas, limite):
+    for linha in linhas:
+        pedacos = _partir_linha(linha, limite)
+        yield pedacos[0], "\n"
+        for pedaco in pedacos[1:]:
+            yield pedaco, " "
+
+
+def _trechos_codigo(linhas, limite, folga):
+    atual, tamanho = [], 0
+    for linha in linhas:
+        custo = _tamanho(_escapar(linha)) + 1
+        while custo - 1 + folga > limite:
+            # Linha de código maior que uma mensagem: cortada no tamanho máximo (o pior escape é '&amp;')
+            corte = max(1, (limite - folga) // 5)
+            pedaco, linha = linha[:corte], linha[corte:]
+            if atual:
+                yield atual
+                atual, tamanho = [], 0
+            yield [pedaco]
+            custo = _tamanho(_escapar(linha)) + 1
+        if atual and tamanho + custo + folga > limite:
+            yield atual
+            atual, tamanho = [], 0
+        atual.append(linha)
+        tamanho += custo
+    if atual:
+        yield atual
+
+
+def _partes_codigo(linguagem, linhas, limite):
+    """Bloco de código grande: vários blocos menores, cada um com as linhas que couberem."""
+    folga = _tamanho(_formatar_codigo(linguagem, []))
+    if 2 * folga > limite:
+        linguagem = "" # Limite pequeno: o espaço das tags fica para o código
+        folga = _tamanho(_formatar_codigo(linguagem, []))
+    for trecho in _trechos_codigo(linhas, limite, folga):
+        if any(linha.strip() for linha in trecho): # Só linhas em branco seria um bloco vazio
+            yield _formatar_codigo(linguagem, trecho), "\n"
+
+
+def formatar_resposta(texto, limite=LIMITE_MENSAGEM):
+    """
+    Converte a resposta do modelo para o HTML do Telegram (parse_mode=PARSE_MODE) e divide em
+    mensagens de até 'limite' caracteres, entre parágrafos sempre que possível. Retorna a lista
+    de mensagens, na ordem de envio (vazia se o texto for vazio).
+    """
+    mensagens, atual = [], []
+    tamanho = 0
+
+    def adicionar(parte, separador):
+        nonlocal tamanho
+        if not parte.strip():
+            return # Pedaço só de espaços (ex: sobra de um corte): o Telegram recusa mensagem vazia
+        custo = _tamanho(parte)
+        if atual and tamanho + len(separador) + custo > limite:
+            mensagens.append("".join(atual))
+            atual.clear()
+            tamanho = 0
+        if atual:
+            atual.append(separador)
+            tamanho += len(separador)
+        atual.append(parte)
+        tamanho += custo
+
+    for linguagem, linhas in _blocos(texto):
+        if not any(linha.strip() for linha in linhas):
+            continue # Bloco de código vazio
+        if linguagem is None:
+            formatado = _formatar_paragrafo("\n".join(linhas))
+        else:
+            formatado = _formatar_codigo(linguagem, linhas)
+        if _tamanho(formatado) <= limite:
+            adicionar(formatado, _SEPARADOR_PARAGRAFO)
+            continue
+        # Não cabe numa mensagem: por linhas (parágrafo) ou em vários blocos (código)
+        partes = _partes_paragrafo(linhas, limite) if linguagem is None else _partes_codigo(linguagem, linhas, limite)
+        for i, (parte, separador) in enumerate(partes):
+            adicionar(parte, separador if i else _SEPARADOR_PARAGRAFO)
+    if atual:
+        mensagens.append("".join(atual))
+    return mensagens
+
+
+def texto_puro(mensagem):
+    """Mensagem formatada sem as tags (para reenviar sem parse_mode se o Telegram recusar)."""
+    return html.unescape(_RE_TAG.sub("", mensagem))
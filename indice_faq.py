@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from cache_respostas import normalizar_pergunta
+
+# --- Índice Local de FAQ (TF-IDF de n-gramas de caracteres) ---
+# Responde às perguntas mais comuns sem chamar o Gemini. O índice é montado uma vez
+# na inicialização (ou carregado de um arquivo pré-calculado com: python indice_faq.py).
+
+CAMINHO_FAQ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "faq.json")
+CAMINHO_INDICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "faq_indice.npz")
+
+# Similaridade de cosseno mínima para responder localmente
+LIMIAR_FAQ = 0.55
+TAMANHO_NGRAMA = 3
+# Só o score não basta: "qual o valor do dólar hoje" parece com "qual o valor" (0.59). Cada
+# palavra da pergunta (de TAMANHO_MINIMO_PALAVRA letras ou mais, fora as de cortesia) precisa
+# ter ao menos COBERTURA_MINIMA_PALAVRA dos seus n-gramas nas perguntas da entrada encontrada.
+COBERTURA_MINIMA_PALAVRA = 0.5
+TAMANHO_MINIMO_PALAVRA = 4
+PALAVRAS_IGNORADAS = {"favor", "obrigado", "obrigada", "gostaria", "tarde", "noite"}
+
+
+def ngramas(texto, n=TAMANHO_NGRAMA):
+    """Conta os n-gramas de caracteres do texto normalizado (com bordas de palavra)."""
+    texto = f" {normalizar_pergunta(texto)} "
+    contagem = {}
+    for i in range(len(texto) - n + 1):
+        g = texto[i:i + n]
+        contagem[g] = contagem.get(g, 0) + 1
+    return contagem
+
+
+def _hash_arquivo(caminho):
+    with open(caminho, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class IndiceFAQ:
+    """Matriz TF-IDF (linhas = variações de pergunta, normalizadas em L2)."""
+
+    def __init__(self, respostas, linha_resposta, vocabulario, idf, matriz):
+        self.respostas = respostas           # lista de respostas (str)
+        self.linha_resposta = linha_resposta # np.array: linha da matriz -> índice da resposta
+        self.vocabulario = vocabulario       # dict: n-grama -> coluna
+        self.idf = idf                       # np.array (colunas,)
+        self.matriz = matriz                 # np.array (linhas, colunas), float32
+
+    @classmethod
+    def construir(cls, entradas):
+        """Monta o índice a partir da lista de entradas do faq.json."""
+        respostas, perguntas, linha_resposta = [], [], []
+        for i, entrada in enumerate(entradas):
+            respostas.append(entrada["resposta"])
+            for pergunta in entrada["perguntas"]:
+                perguntas.append(ngramas(pergunta))
+                linha_resposta.append(i)
+
+        vocabulario = {}
+        for contagem in perguntas:
+            for g in contagem:
+                vocabulario.setdefault(g, len(vocabulario))
+
+        tf = np.zeros((len(perguntas), len(vocabulario)), dtype=np.float32)
+        for linha, contagem in enumerate(perguntas):
+            for g, qtd in contagem.items():
+                tf[linha, vocabulario[g]] = qtd
+
+        # IDF suavizado (mesma fórmula do scikit-learn)
+        df = np.count_nonzero(tf, axis=0)
+        idf = (np.log((1 + len(perguntas)) / (1 + df)) + 1).astype(np.float32)
+
+        matriz = tf * idf
+        normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+        matriz /= np.where(normas == 0, 1, normas)
+
+        return cls(respostas, np.array(linha_resposta, dtype=np.int32), vocabulario, idf, matriz)
+
+    @classmethod
+    def carregar(cls, caminho_faq=CAMINHO_FAQ, caminho_indice=CAMINHO_INDICE):
+        """Usa o índice pré-calculado se ele corresponder ao faq.json atual; senão reconstrói."""
+        hash_faq = _hash_arquivo(caminho_faq)
+
+        if caminho_indice and os.path.exists(caminho_indice):
+            dados = np.load(caminho_indice, allow_pickle=False)
+            if str(dados["hash_faq"]) == hash_faq:
+                vocabulario = {g: i for i, g in enumerate(dados["ngramas"].tolist())}
+                return cls(dados["respostas"].tolist(), dados["linha_resposta"], vocabulario, dados["idf"], dados["matriz"])
+
+        with open(caminho_faq, encoding="utf-8") as f:
+            return cls.construir(json.load(f))
+
+    def salvar(self, caminho_indice=CAMINHO_INDICE, caminho_faq=CAMINHO_FAQ):
+        """Grava o índice para acelerar a próxima inicialização."""
+        ngramas_ordenados = sorted(self.vocabulario, key=self.vocabulario.get)
+        np.savez_compressed(
+            caminho_indice,
+            hash_faq=np.array(_hash_arquivo(caminho_faq)),
+            respostas=np.array(self.respostas),
+            linha_resposta=self.linha_resposta,
+            ngramas=np.array(ngramas_ordenados),
+            idf=self.idf,
+            matriz=self.matriz,
+        )
+
+    def buscar(self, pergunta):
+        """Retorna (índice da entrada, score) da entrada mais parecida; (None, 0.0) se nada se parece."""
+        colunas, pesos = [], []
+        norma_fora = 0.0
+        idf_max = float(self.idf.max())
+        for g, qtd in ngramas(pergunta).items():
+            coluna = self.vocabulario.get(g)
+            if coluna is not None:
+                colunas.append(coluna)
+                pesos.append(qtd * self.idf[coluna])
+            else:
+                # N-grama desconhecido: não pontua, mas pesa na norma (como um termo raro)
+                norma_fora += (qtd * idf_max) ** 2
+
+        if not colunas:
+            return None, 0.0
+
+        pesos = np.array(pesos, dtype=np.float32)
+        norma = np.sqrt(float(pesos @ pesos) + norma_fora)
+
+        scores = self.matriz[:, colunas] @ pesos / norma
+        melhor = int(np.argmax(scores))
+        return int(self.linha_resposta[melhor]), float(scores[melhor])
+
+    def palavras_desconhecidas(self, pergunta, entrada):
+        """Palavras da pergunta que não aparecem (nem parecidas) nas perguntas da entrada (índice de buscar)."""
+        linhas = self.linha_resposta == entrada
+        desconhecidas = []
+        for palavra in normalizar_pergunta(pergunta).split():
+            if len(palavra) < TAMANHO_MINIMO_PALAVRA or palavra in PALAVRAS_IGNORADAS:
+                continue
+            contagem = ngramas(palavra)
+            colunas = [self.vocabulario[g] for g in contagem if g in self.vocabulario]
+            presentes = int(np.count_nonzero(self.matriz[linhas][:, colunas].any(axis=0))) if colunas else 0
+            if presentes < COBERTURA_MINIMA_PALAVRA * len(contagem):
+                desconhecidas.append(palavra)
+        return desconhecidas
+
+    def responder(self, pergunta, limiar=LIMIAR_FAQ):
+        """Resposta local se a similaridade passar do limiar e a pergunta não trouxer palavras
+        fora da entrada; senão None (segue para o Gemini)."""
+        entrada, score = self.buscar(pergunta)
+        if score < limiar or self.palavras_desconhecidas(pergunta, entrada):
+            return None
+        return self.respostas[entrada]
+
+
+if __name__ == "__main__":
+    # Pré-calcula o índice em disco (rodar sempre que o faq.json mudar)
+    with open(CAMINHO_FAQ, encoding="utf-8") as f:
+        indice = IndiceFAQ.construir(json.load(f))
+    indice.salvar()
+    print(f"Índice salvo em {CAMINHO_INDICE}: {indice.matriz.shape[0]} perguntas, {len(indice.vocabulario)} n-gramas.")
@@ -0,0 +1,107 @@
+import time
+from collections import OrderedDict
+
+# --- Limite de Perguntas ao Gemini por Chat e no Total ---
+# Token buckets na frente do Gemini: cada chat tem o seu balde (perguntas por minuto com uma
+# rajada inicial) e todos dividem um balde global (perguntas por segundo do processo), para
+# uma pessoa colando mensagens em sequência não gastar a cota do Gemini de todo mundo.
+# A verificação é O(1): o balde guarda os tokens e o instante da última atualização, e a
+# reposição é calculada na hora. Um balde parado tempo suficiente para encher de novo é igual
+# a um balde novo, então é esquecido; os baldes ficam em ordem de uso e a limpeza só olha o
+# início. Usado só dentro do event loop do bot (sem locks). Cada processo tem os seus baldes.
+
+POR_MINUTO_CHAT_PADRAO = 5
+RAJADA_CHAT_PADRAO = 3
+POR_SEGUNDO_GLOBAL_PADRAO = 10
+RAJADA_GLOBAL_PADRAO = 20
+
+CHAT = "chat"
+GLOBAL = "global"
+
+
+class LimitadorChats:
+    """
+    Token bucket por chat e um global. 'por_minuto_chat' ou 'por_segundo_global' None = sem
+    aquele limite. Uma pergunta só passa se houver token nos dois baldes, e consome um de cada.
+    """
+
+    def __init__(self, por_minuto_chat=POR_MINUTO_CHAT_PADRAO, rajada_chat=RAJADA_CHAT_PADRAO,
+                 por_segundo_global=POR_SEGUNDO_GLOBAL_PADRAO, rajada_global=RAJADA_GLOBAL_PADRAO,
+                 relogio=time.monotonic):
+        self.taxa_chat = por_minuto_chat / 60 if por_minuto_chat else None
+        self.rajada_chat = max(1, rajada_chat)
+        self.taxa_global = por_segundo_global or None
+        self.rajada_global = max(1, rajada_global)
+        self._relogio = relogio
+
+        # Chave: ID do chat, Valor: [tokens, atualizado_em, avisado]. Ordem: último uso (o mais antigo primeiro).
+        # 'avisado': o chat já recebeu o aviso de limite desde a última pergunta aceita.
+        self._chats = OrderedDict()
+        # Tempo para um balde vazio encher; depois disso, parado, ele pode ser esquecido. Sem o
+        # limite por chat, o balde do chat só guarda o aviso dado: vale o tempo do balde global encher
+        if self.taxa_chat:
+            self._tempo_para_encher = self.rajada_chat / self.taxa_chat
+        elif self.taxa_global:
+            self._tempo_para_encher = self.rajada_global / self.taxa_global
+        else:
+            self._tempo_para_encher = None # Sem limite nenhum: nenhum balde é criado
+        self._global = [float(self.rajada_global), relogio()]
+        self.recusadas = {CHAT: 0, GLOBAL: 0}
+
+    def __len__(self):
+        return len(self._chats)
+
+    def _limpar(self, agora):
+        while self._chats:
+            chat_id, balde = next(iter(self._chats.items()))
+            if agora - balde[1] < self._tempo_para_encher:
+                return
+            del self._chats[chat_id]
+
+    @staticmethod
+    def _repor(balde, taxa, rajada, agora):
+        balde[0] = min(rajada, balde[0] + (agora - balde[1]) * taxa)
+        balde[1] = agora
+
+    def verificar(self, chat_id):
+        """
+        None se a pergunta pode ir ao Gemini. Senão (limite, espera, avisar): qual balde está vazio
+        (CHAT ou GLOBAL), quantos segundos até o próximo token e se é a primeira recusa do chat
+        desde a última pergunta aceita (para avisar uma vez só, sem responder a cada mensagem).
+        """
+        if self._tempo_para_encher is None:
+            return None
+        agora = self._relogio()
+        self._limpar(agora)
+
+        balde = self._chats.get(chat_id)
+        if balde is None:
+            balde = self._chats[chat_id] = [float(self.rajada_chat), agora, False]
+        else:
+            self._chats.move_to_end(chat_id)
+            if self.taxa_chat:
+                self._repor(balde, self.taxa_chat, self.rajada_chat, agora)
+            balde[1] = agora
+
+        if self.taxa_chat and balde[0] < 1:
+            return self._recusar(balde, CHAT, (1 - balde[0]) / self.taxa_chat)
+        if self.taxa_global:
+            self._repor(self._global, self.taxa_global, self.rajada_global, agora)
+            if self._global[0] < 1:
+                return self._recusar(balde, GLOBAL, (1 - self._global[0]) / self.taxa_global)
+            self._global[0] -= 1
+
+        if self.taxa_chat:
+            balde[0] -= 1
+        balde[2] = False
+        return None
+
+    def _recusar(self, balde, limite, espera):
+        self.recusadas[limite] += 1
+        avisar = not balde[2]
+        balde[2] = True
+        return limite, espera, avisar
+
+    def estatisticas(self):
+        return {"chats": len(self._chats), "recusadas_chat": self.recusadas[CHAT],
+                "recusadas_global": self.recusadas[GLOBAL]}
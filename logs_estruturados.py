@@ -0,0 +1,161 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+# --- Logs Estruturados sem Bloquear o Caminho Quente ---
+# Os handlers do bot e os trabalhadores da fila do WhatsApp só colocam o registro numa fila
+# (QueueHandler); uma thread em segundo plano (QueueListener) formata em JSON e escreve no
+# terminal ou arquivo. Assim, um terminal lento ou um disco ocupado não entra na latência
+# das mensagens. Campos extras (chat_id, estado, duracao_ms, ...) vão em 'extra={...}' e
+# viram chaves do JSON. As linhas de DEBUG de alto volume podem ser amostradas.
+# configurar_logs() troca os handlers do logger raiz: só o ponto de entrada do bot (o
+# __main__ ou o worker) chama, nunca a importação do módulo.
+
+NIVEL_PADRAO = "INFO"
+# Com a fila cheia, DEBUG é descartado (e contado); INFO ou acima é escrito direto por quem
+# registrou, sem se perder (mais lento, mas só enquanto a thread de escrita não dá conta)
+TAMANHO_FILA = 10000
+NIVEL_MAXIMO_DESCARTE = logging.DEBUG
+FORMATO_TEXTO = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Atributos de todo LogRecord; o que não estiver aqui veio do 'extra' e vai para o JSON
+_ATRIBUTOS_PADRAO = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+_formatador = logging.Formatter()
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro: horário, nível, logger, mensagem e os campos do 'extra'."""
+
+    def format(self, record):
+        dados = {
+            "ts": round(record.created, 3),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for chave, valor in vars(record).items():
+            if chave not in _ATRIBUTOS_PADRAO:
+                dados[chave] = valor
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            dados["erro"] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+class FiltroAmostragem(logging.Filter):
+    """
+    Deixa passar só 1 de cada 'a_cada' registros de nível até 'nivel_maximo' (DEBUG), contados
+    por mensagem (o texto antes da formatação), para as linhas repetitivas não dominarem o log.
+    """
+
+    def __init__(self, a_cada, nivel_maximo=logging.DEBUG):
+        super().__init__()
+        self.a_cada = a_cada
+        self.nivel_maximo = nivel_maximo
+        self._contagens = {}
+
+    def filter(self, record):
+        if record.levelno > self.nivel_maximo or self.a_cada <= 1:
+            return True
+        # Sem lock: uma contagem perdida entre threads só muda qual registro é amostrado
+        contagem = self._contagens.get(record.msg, 0)
+        self._contagens[record.msg] = contagem + 1
+        return contagem % self.a_cada == 0
+
+
+class HandlerFila(logging.handlers.QueueHandler):
+    """
+    QueueHandler que não espera pela escrita: com 'limite' registros na fila, descarta e conta
+    os de nível até 'nivel_maximo_descarte' e entrega os demais direto ao handler 'saida'.
+    Usa a queue.SimpleQueue (em C, sem Condition) e não copia o registro.
+    """
+
+    def __init__(self, fila, limite, saida, nivel_maximo_descarte=NIVEL_MAXIMO_DESCARTE):
+        super().__init__(fila)
+        self.limite = limite
+        self.saida = saida
+        self.nivel_maximo_descarte = nivel_maximo_descarte
+        self.descartados = 0
+        self.escritos_direto = 0
+
+    def prepare(self, record):
+        # Só o necessário na thread de quem registrou: junta os argumentos na mensagem e
+        # transforma a exceção em texto (o traceback não pode ir para outra thread). O JSON
+        # é montado na thread de escrita. Este é o único handler do logger raiz, então o
+        # registro pode ser alterado no lugar em vez de copiado.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _formatador.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() < self.limite:
+            self.queue.put_nowait(record)
+        elif record.levelno <= self.nivel_maximo_descarte:
+            self.descartados += 1
+        else:
+            # Avisos e erros são justamente o que se precisa num incidente: nunca se perdem.
+            # O handle do handler tem lock próprio, então divide a saída com a thread de escrita.
+            self.escritos_direto += 1
+            self.saida.handle(record)
+
+
+_listener = None
+_handler_fila = None
+
+
+def configurar_logs(nivel=NIVEL_PADRAO, formato_json=True, amostragem_debug=1, arquivo=None,
+                    tamanho_fila=TAMANHO_FILA):
+    """
+    Liga o pipeline no logger raiz (substituindo os handlers que houver) e retorna o HandlerFila.
+    'amostragem_debug': 1 = todas as linhas de DEBUG, N = 1 a cada N de cada mensagem.
+    'arquivo': None = stderr.
+    """
+    global _listener, _handler_fila
+    parar_logs()
+
+    saida = logging.FileHandler(arquivo, encoding="utf-8") if arquivo else logging.StreamHandler(sys.stderr)
+    saida.setFormatter(FormatadorJSON() if formato_json else logging.Formatter(FORMATO_TEXTO))
+
+    fila = queue.SimpleQueue()
+    _handler_fila = HandlerFila(fila, tamanho_fila, saida)
+    if amostragem_debug > 1:
+        # Filtra antes de enfileirar: o registro descartado não custa nem a cópia
+        _handler_fila.addFilter(FiltroAmostragem(amostragem_debug))
+
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(_handler_fila)
+    raiz.setLevel(nivel)
+
+    _listener = logging.handlers.QueueListener(fila, saida)
+    _listener.start()
+    return _handler_fila
+
+
+def parar_logs():
+    """Escreve o que estiver na fila e para a thread de escrita."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def logs_descartados():
+    return _handler_fila.descartados if _handler_fila is not None else 0
+
+
+def logs_escritos_direto():
+    return _handler_fila.escritos_direto if _handler_fila is not None else 0
+
+
+atexit.register(parar_logs)
@@ -0,0 +1,133 @@
+import time
+from collections import OrderedDict
+
+# --- Memória das Conversas com o Gemini ---
+# Guarda as últimas perguntas e respostas de cada chat para o Gemini entender o contexto
+# ("e quanto custa isso?") sem o usuário repetir tudo. O histórico de cada chat tem um
+# orçamento de tokens (as trocas mais antigas saem primeiro e as respostas longas são
+# guardadas encurtadas), e o total de chats é limitado por quantidade e por bytes com
+# despejo LRU, para a memória ficar estável com 100 mil usuários.
+# Usado só dentro do event loop do bot (sem locks). Cada processo tem a sua memória.
+
+CARACTERES_POR_TOKEN = 4 # Estimativa local (português); evita chamar count_tokens na API a cada mensagem
+ORCAMENTO_TOKENS_PADRAO = 1000
+MAX_TOKENS_RESPOSTA = 250 # Respostas antigas do modelo são guardadas só até este tamanho
+MAX_CHATS_PADRAO = 10000
+TTL_PADRAO = 2 * 3600
+MAX_BYTES_PADRAO = 32 * 1024 * 1024
+
+
+def estimar_tokens(texto):
+    """Estimativa barata de tokens (~4 caracteres por token)."""
+    return (len(texto) + CARACTERES_POR_TOKEN - 1) // CARACTERES_POR_TOKEN
+
+
+class MemoriaConversas:
+    """
+    Histórico recente por chat, com orçamento de tokens, expiração por inatividade e LRU.
+
+    Representação compacta: cada troca é uma tupla (tokens, pergunta, resposta) com os
+    textos em UTF-8 (bytes), sem objetos de mensagem nem dicionários por turno.
+    """
+
+    def __init__(self, orcamento_tokens=ORCAMENTO_TOKENS_PADRAO, max_chats=MAX_CHATS_PADRAO, ttl_segundos=TTL_PADRAO,
+                 max_bytes=MAX_BYTES_PADRAO, max_tokens_resposta=MAX_TOKENS_RESPOSTA):
+        self.orcamento_tokens = orcamento_tokens
+        self.max_chats = max_chats
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes = max_bytes
+        self.max_tokens_resposta = max_tokens_resposta
+
+        # Chave: ID do chat, Valor: [expira_em, tokens, bytes, lista de (tokens, pergunta, resposta)]
+        # A ordem é a de uso (mais antigo primeiro), o que serve ao LRU e à expiração.
+        self._chats = OrderedDict()
+        self._bytes = 0
+        self.despejados = 0
+
+    def __len__(self):
+        return len(self._chats)
+
+    def _remover(self, chat_id):
+        self._bytes -= self._chats.pop(chat_id)[2]
+
+    def _expirar(self, agora):
+        # Os mais antigos estão no início: para na primeira conversa ainda válida
+        while self._chats:
+            chat_id, entrada = next(iter(self._chats.items()))
+            if entrada[0] > agora:
+                return
+            self._remover(chat_id)
+
+    def historico(self, chat_id, max_tokens=None):
+        """
+        Trocas recentes do chat, da mais antiga para a mais nova, como [(pergunta, resposta)],
+        limitadas a 'max_tokens' (as mais recentes têm prioridade).
+        """
+        agora = time.monotonic()
+        self._expirar(agora)
+        entrada = self._chats.get(chat_id)
+        if entrada is None:
+            return []
+        self._chats.move_to_end(chat_id)
+        entrada[0] = agora + self.ttl_segundos
+
+        limite = entrada[1] if max_tokens is None else max_tokens
+        trocas, usados = [], 0
+        for tokens, pergunta, resposta in reversed(entrada[3]):
+            if usados + tokens > limite:
+                break
+            usados += tokens
+            trocas.append((pergunta.decode(), resposta.decode()))
+        trocas.reverse()
+        return trocas
+
+    def registrar(self, chat_id, pergunta, resposta):
+        """Acrescenta uma troca ao chat, descartando as mais antigas que passarem do orçamento."""
+        agora = time.monotonic()
+        self._expirar(agora)
+
+        limite = self.max_tokens_resposta * CARACTERES_POR_TOKEN
+        if len(resposta) > limite:
+            resposta = resposta[:limite] + "…"
+        # Tokens estimados sobre o texto (caracteres), como no resto do bot; os bytes UTF-8 de
+        # acentos e emojis contariam a mais
+        tokens = estimar_tokens(pergunta) + estimar_tokens(resposta)
+        troca = (tokens, pergunta.encode(), resposta.encode())
+        if troca[0] > self.orcamento_tokens:
+            return # Uma única troca maior que o orçamento não vale a pena guardar
+
+        entrada = self._chats.get(chat_id)
+        if entrada is None:
+            entrada = self._chats[chat_id] = [0.0, 0, 0, []]
+        else:
+            self._chats.move_to_end(chat_id)
+        entrada[0] = agora + self.ttl_segundos
+        trocas = entrada[3]
+        tamanho = len(troca[1]) + len(troca[2])
+        trocas.append(troca)
+        entrada[1] += troca[0]
+        entrada[2] += tamanho
+        self._bytes += tamanho
+
+        while entrada[1] > self.orcamento_tokens:
+            tokens, antiga_pergunta, antiga_resposta = trocas.pop(0)
+            entrada[1] -= tokens
+            tamanho = len(antiga_pergunta) + len(antiga_resposta)
+            entrada[2] -= tamanho
+            self._bytes -= tamanho
+
+        # Despejo LRU até respeitar o número de chats e o teto de memória
+        while len(self._chats) > self.max_chats or self._bytes > self.max_bytes:
+            self._remover(next(iter(self._chats)))
+            self.despejados += 1
+
+    def esquecer(self, chat_id):
+        if chat_id in self._chats:
+            self._remover(chat_id)
+
+    def estatisticas(self):
+        return {
+            "chats": len(self._chats),
+            "bytes_textos": self._bytes,
+            "despejados": self.despejados,
+        }
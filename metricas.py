@@ -0,0 +1,190 @@
+import bisect
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- Métricas dos Bots (formato de texto do Prometheus) ---
+# Contadores, histogramas e medidores em memória, baratos o bastante para o caminho
+# quente (um lock e algumas somas por observação). Cada processo tem o seu registro;
+# com vários workers, o Prometheus coleta cada um separadamente (um alvo por worker).
+# Os medidores são calculados só na coleta (ex: tamanho dos bancos de prospects).
+
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+# Limites (em segundos) dos histogramas de latência: de 5 ms a 1 min
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatar_rotulos(nomes, valores, extra=""):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _formatar_numero(valor):
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._series = {} # Chave: tupla com os valores dos rótulos
+        self._lock = threading.Lock()
+
+    def _cabecalho(self):
+        return [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    """Valor que só cresce (ex: erros, mensagens enviadas)."""
+
+    tipo = "counter"
+
+    def inc(self, *rotulos, valor=1):
+        with self._lock:
+            self._series[rotulos] = self._series.get(rotulos, 0) + valor
+
+    def valor(self, *rotulos):
+        return self._series.get(rotulos, 0)
+
+    def exportar(self):
+        linhas = self._cabecalho()
+        with self._lock:
+            series = list(self._series.items())
+        for rotulos, valor in series:
+            linhas.append(f"{self.nome}{_formatar_rotulos(self.rotulos, rotulos)} {_formatar_numero(valor)}")
+        return linhas
+
+
+class Histograma(_Metrica):
+    """Distribuição de valores (latências) em faixas fixas; percentis são calculados no Prometheus."""
+
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_LATENCIA):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, valor, *rotulos):
+        # Cada faixa guarda só as suas observações; a soma acumulada é feita na exportação
+        faixa = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][faixa] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def cronometrar(self, *rotulos):
+        """Context manager que observa o tempo decorrido do bloco (funciona com 'with' em código async)."""
+        return _Cronometro(self, rotulos)
+
+    def contagem(self, *rotulos):
+        serie = self._series.get(rotulos)
+        return serie[2] if serie else 0
+
+    def exportar(self):
+        linhas = self._cabecalho()
+        with self._lock:
+            series = [(rotulos, list(faixas), soma, total) for rotulos, (faixas, soma, total) in self._series.items()]
+        for rotulos, faixas, soma, total in series:
+            acumulado = 0
+            for limite, quantidade in zip(self.limites + (math.inf,), faixas):
+                acumulado += quantidade
+                le = f'le="{_formatar_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, rotulos, le)} {acumulado}")
+            sufixo = _formatar_rotulos(self.rotulos, rotulos)
+            linhas.append(f"{self.nome}_sum{sufixo} {_formatar_numero(soma)}")
+            linhas.append(f"{self.nome}_count{sufixo} {total}")
+        return linhas
+
+
+class _Cronometro:
+    __slots__ = ("histograma", "rotulos", "inicio")
+
+    def __init__(self, histograma, rotulos):
+        self.histograma = histograma
+        self.rotulos = rotulos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *erro):
+        self.histograma.observar(time.perf_counter() - self.inicio, *self.rotulos)
+        return False
+
+
+class Medidor(_Metrica):
+    """Valor instantâneo calculado na coleta por 'funcao()' (ex: quantidade de prospects)."""
+
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, funcao):
+        super().__init__(nome, ajuda)
+        self.funcao = funcao
+
+    def exportar(self):
+        try:
+            valor = self.funcao()
+        except Exception as e:
+            # Um medidor com problema (ex: banco indisponível) não derruba a coleta inteira
+            logger.warning(f"Falha ao calcular a métrica {self.nome}: {e}")
+            return []
+        return self._cabecalho() + [f"{self.nome} {_formatar_numero(valor)}"]
+
+
+class Registro:
+    """Conjunto de métricas de um processo. Registrar o mesmo nome de novo devolve a métrica existente."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, classe, nome, *args, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = self._metricas[nome] = classe(nome, *args, **kwargs)
+            elif not isinstance(metrica, classe):
+                raise ValueError(f"Métrica '{nome}' já registrada como {metrica.tipo}")
+            return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._registrar(Contador, nome, ajuda, rotulos)
+
+    def histograma(self, nome, ajuda, rotulos=(), limites=LIMITES_LATENCIA):
+        return self._registrar(Histograma, nome, ajuda, rotulos, limites)
+
+    def medidor(self, nome, ajuda, funcao):
+        medidor = self._registrar(Medidor, nome, ajuda, funcao)
+        medidor.funcao = funcao # Re-registro (ex: bancos trocados por estado compartilhado) usa a função nova
+        return medidor
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+        linhas = []
+        with self._lock:
+            metricas = list(self._metricas.values())
+        for metrica in metricas:
+            linhas.extend(metrica.exportar())
+        return "\n".join(linhas) + "\n"
+
+
+# Registro padrão do processo, usado pelos dois bots e pelos módulos de envio
+registro = Registro()
@@ -0,0 +1,56 @@
+# --- Leitura dos Payloads do Webhook do WhatsApp (Meta) ---
+# Uma única entrega pode conter várias mensagens e atualizações de status:
+#   entry[].changes[].value.messages[] / value.statuses[]
+# Percorremos tudo em uma passada e devolvemos apenas as mensagens que o bot processa.
+
+
+def _conteudo(mensagem):
+    """Texto digitado ou ID da opção interativa escolhida (ex: 'sou_cliente')."""
+    tipo = mensagem.get("type")
+
+    if tipo == "text":
+        return mensagem.get("text", {}).get("body")
+
+    if tipo == "interactive":
+        interativo = mensagem.get("interactive", {})
+        # list_reply (menus de lista) ou button_reply (botões de resposta)
+        resposta = interativo.get("list_reply") or interativo.get("button_reply") or {}
+        return resposta.get("id")
+
+    if tipo == "button":
+        # Botão de resposta rápida de um template
+        botao = mensagem.get("button", {})
+        return botao.get("payload") or botao.get("text")
+
+    # Imagens, áudios, localização etc. ainda não são tratados pelo bot
+    return None
+
+
+def extrair_mensagens(payload):
+    """
+    Retorna a lista de (id_mensagem, remetente, conteudo) de uma entrega do webhook.
+
+    Eventos só de status são ignorados. Também aceita o formato simplificado
+    {'from': ..., 'text': ...} usado nos testes locais.
+    """
+    if not isinstance(payload, dict):
+        return []
+
+    entradas = payload.get("entry")
+    if entradas is None:
+        # Formato simplificado (simulação local)
+        remetente, texto = payload.get("from"), payload.get("text")
+        if remetente and texto:
+            return [(payload.get("id"), remetente, texto)]
+        return []
+
+    mensagens = []
+    for entrada in entradas:
+        for mudanca in entrada.get("changes", ()):
+            # Entregas só com 'statuses' não têm 'messages': saem daqui sem custo extra
+            for mensagem in mudanca.get("value", {}).get("messages", ()):
+                conteudo = _conteudo(mensagem)
+                remetente = mensagem.get("from")
+                if remetente and conteudo:
+                    mensagens.append((mensagem.get("id"), remetente, conteudo))
+    return mensagens
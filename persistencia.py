@@ -0,0 +1,211 @@
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+
+from metricas import registro
+
+logger = logging.getLogger(__name__)
+
+# --- Persistência em SQLite (modo WAL) ---
+# Os dicionários de prospects e contratos continuam sendo usados como dicionários
+# comuns pelos handlers; cada alteração é enfileirada e gravada em lote por uma
+# thread em segundo plano, então nenhum handler espera pelo disco (fsync).
+
+INTERVALO_GRAVACAO = 0.5 # Segundos entre gravações em lote
+TAMANHO_LOTE = 1000
+ESPERA_MAXIMA_RETENTATIVA = 30 # Segundos entre tentativas de um lote que falhou (dobra a cada falha)
+
+LOTES_FALHOS = registro.contador("sqlite_lotes_falhos_total", "Gravações em lote no SQLite que falharam (e serão repetidas)")
+OPERACOES_DESCARTADAS = registro.contador(
+    "sqlite_operacoes_descartadas_total", "Operações descartadas por um erro do SQLite que não passa repetindo")
+
+_REMOVER = object() # Marca de remoção na fila de gravação
+
+
+class ArmazemSQLite:
+    """Banco SQLite em modo WAL com gravação assíncrona em lote."""
+
+    def __init__(self, caminho, intervalo=INTERVALO_GRAVACAO, tamanho_lote=TAMANHO_LOTE):
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.tamanho_lote = tamanho_lote
+        self._fila = queue.SimpleQueue()
+        self._pendentes = 0
+        self._cond = threading.Condition()
+        self._encerrado = False
+        # Operações de lotes que falharam, repetidas junto com o próximo lote: {(tabela, chat_id): valor}
+        self._retidas = {}
+        self._operacoes_retidas = 0 # Quantas operações enfileiradas elas representam
+
+        with self._conectar() as conexao:
+            # WAL: leituras não bloqueiam o gravador (e vice-versa)
+            conexao.execute("PRAGMA journal_mode=WAL")
+
+        self._thread = threading.Thread(target=self._gravador, name="sqlite-gravador", daemon=True)
+        self._thread.start()
+        atexit.register(self.fechar)
+
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        # Em WAL, NORMAL só faz fsync nos checkpoints (seguro contra queda do processo)
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        return conexao
+
+    def criar_tabela(self, tabela):
+        """Cria a tabela chave/valor (a chave primária é o índice por ID do chat)."""
+        with self._conectar() as conexao:
+            conexao.execute(f"CREATE TABLE IF NOT EXISTS {tabela} (chat_id PRIMARY KEY, valor TEXT)")
+
+    def carregar(self, tabela):
+        """Lê a tabela inteira em uma única consulta. Retorna uma lista de (chat_id, valor)."""
+        conexao = self._conectar()
+        try:
+            return conexao.execute(f"SELECT chat_id, valor FROM {tabela}").fetchall()
+        finally:
+            conexao.close()
+
+    def gravar(self, tabela, chat_id, valor):
+        self._enfileirar((tabela, chat_id, valor))
+
+    def remover(self, tabela, chat_id):
+        self._enfileirar((tabela, chat_id, _REMOVER))
+
+    def _enfileirar(self, operacao):
+        with self._cond:
+            self._pendentes += 1
+        self._fila.put(operacao)
+
+    def _gravador(self):
+        conexao = self._conectar()
+        espera = self.intervalo
+        while True:
+            lote = []
+            try:
+                lote.append(self._fila.get(timeout=espera))
+                # Junta tudo o que chegou até o tamanho do lote (uma transação por lote)
+                while len(lote) < self.tamanho_lote:
+                    lote.append(self._fila.get_nowait())
+            except queue.Empty:
+                pass
+
+            if lote or self._retidas:
+                if self._aplicar(conexao, lote):
+                    espera = self.intervalo
+                    gravadas = len(lote) + self._operacoes_retidas
+                    self._operacoes_retidas = 0
+                    with self._cond:
+                        self._pendentes -= gravadas
+                        self._cond.notify_all()
+                else:
+                    # Nada se perde: o lote fica retido e é repetido, com espera crescente
+                    self._operacoes_retidas += len(lote)
+                    espera = min(espera * 2, ESPERA_MAXIMA_RETENTATIVA)
+            elif self._encerrado:
+                conexao.close()
+                return
+
+    def _aplicar(self, conexao, lote):
+        """Grava as operações retidas e o lote numa transação. Retorna False (e retém tudo) se a falha for passageira."""
+        # Só a última operação de cada chave importa dentro do lote
+        ultimas = self._retidas
+        for tabela, chat_id, valor in lote:
+            ultimas[(tabela, chat_id)] = valor
+
+        gravacoes, remocoes = {}, {}
+        for (tabela, chat_id), valor in ultimas.items():
+            if valor is _REMOVER:
+                remocoes.setdefault(tabela, []).append((chat_id,))
+            else:
+                gravacoes.setdefault(tabela, []).append((chat_id, valor))
+
+        try:
+            with conexao:
+                for tabela, linhas in gravacoes.items():
+                    conexao.executemany(f"INSERT OR REPLACE INTO {tabela} (chat_id, valor) VALUES (?, ?)", linhas)
+                for tabela, linhas in remocoes.items():
+                    conexao.executemany(f"DELETE FROM {tabela} WHERE chat_id = ?", linhas)
+        except sqlite3.OperationalError:
+            # Banco travado por outro processo, disco cheio, erro de E/S...: passa e vale repetir
+            LOTES_FALHOS.inc()
+            logger.exception("Erro ao gravar lote no SQLite; as operações serão repetidas",
+                             extra={"operacoes": len(ultimas), "banco": self.caminho})
+            return False
+        except sqlite3.Error:
+            # Repetir daria o mesmo erro e travaria as gravações seguintes: o lote é descartado
+            OPERACOES_DESCARTADAS.inc(valor=len(ultimas))
+            logger.exception("Erro ao gravar lote no SQLite; operações descartadas",
+                             extra={"operacoes": len(ultimas), "banco": self.caminho})
+        self._retidas = {}
+        return True
+
+    @property
+    def pendentes(self):
+        """Operações ainda não gravadas (na fila ou retidas depois de uma falha)."""
+        return self._pendentes
+
+    def aguardar_gravacao(self, timeout=None):
+        """Bloqueia até todas as alterações enfileiradas estarem no banco (usado no encerramento e nos benchmarks)."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pendentes:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._cond.wait(restante)
+        return True
+
+    def fechar(self):
+        if not self._encerrado:
+            if not self.aguardar_gravacao(timeout=30):
+                logger.error("Encerrando com operações não gravadas no SQLite",
+                             extra={"operacoes": self._pendentes, "banco": self.caminho})
+            self._encerrado = True
+            self._thread.join(timeout=self.intervalo * 2)
+
+
+class DicionarioPersistente(MutableMapping):
+    """
+    Dicionário em memória espelhado numa tabela do SQLite.
+
+    Os dados só são lidos do banco no primeiro acesso (uma única consulta).
+    'serializar'/'desserializar' convertem o valor em memória para o texto gravado
+    (ex: contratos guardam só o nome; o Job é recriado na inicialização).
+    """
+
+    def __init__(self, armazem, tabela, serializar=None, desserializar=None):
+        self.armazem = armazem
+        self.tabela = tabela
+        self.serializar = serializar or (lambda valor: valor)
+        self.desserializar = desserializar or (lambda valor: valor)
+        self._dados = None
+        armazem.criar_tabela(tabela)
+
+    @property
+    def dados(self):
+        if self._dados is None:
+            self._dados = {chat_id: self.desserializar(valor) for chat_id, valor in self.armazem.carregar(self.tabela)}
+        return self._dados
+
+    def __getitem__(self, chat_id):
+        return self.dados[chat_id]
+
+    def __setitem__(self, chat_id, valor):
+        self.dados[chat_id] = valor
+        self.armazem.gravar(self.tabela, chat_id, self.serializar(valor))
+
+    def __delitem__(self, chat_id):
+        del self.dados[chat_id]
+        self.armazem.remover(self.tabela, chat_id)
+
+    def __contains__(self, chat_id):
+        return chat_id in self.dados
+
+    def __iter__(self):
+        return iter(self.dados)
+
+    def __len__(self):
+        return len(self.dados)
@@ -0,0 +1,128 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram.ext import BaseUpdateProcessor
+
+# --- Processamento Concorrente de Updates com Ordem por Chat ---
+# Updates de chats diferentes rodam em paralelo; updates do mesmo chat são
+# processados um de cada vez, na ordem de chegada, para que as transições de
+# estado do ConversationHandler continuem corretas. A vaga do limite de updates
+# simultâneos só é ocupada depois da vez do chat chegar: os updates na fila de um
+# chat que manda mensagens sem parar não tiram as vagas dos outros chats.
+# Com vários processos (modo webhook), uma trava por chat no backend compartilhado
+# garante que só um worker processa aquele chat de cada vez. As chamadas ao backend
+# (trava e estado do chat) rodam em threads próprias: um Redis lento não para os outros chats.
+# Com threads demais o SQLite fica pior (as conexões disputam a trava de escrita do arquivo).
+
+ESPERA_TRAVA_INICIAL = 0.002 # Segundos entre tentativas de pegar a trava de outro worker
+ESPERA_TRAVA_MAXIMA = 0.05
+# Tempo máximo de um update (ex: resposta longa do Gemini); depois disso a trava expira sozinha
+TTL_TRAVA = 120
+# O BaseUpdateProcessor ocupa a vaga do seu semáforo em process_update (final no PTB 22), antes
+# da vez do chat. Ele recebe um limite que nunca é atingido; o limite real é o semáforo do
+# ProcessadorPorChat, ocupado em do_process_update depois da trava do chat.
+VAGAS_BASE = 2 ** 30
+
+
+class ProcessadorPorChat(BaseUpdateProcessor):
+    """Limita o total de updates simultâneos e serializa os updates de cada chat."""
+
+    __slots__ = ("_travas", "_vagas", "limite", "backend", "estados", "_threads")
+
+    def __init__(self, max_concurrent_updates: int, backend=None, threads_backend=1):
+        if max_concurrent_updates < 1:
+            raise ValueError("max_concurrent_updates precisa ser positivo")
+        super().__init__(VAGAS_BASE)
+        self.limite = max_concurrent_updates
+        self._vagas = asyncio.Semaphore(max_concurrent_updates)
+        # Chave: ID do chat, Valor: [asyncio.Lock, número de updates usando a trava]
+        self._travas = {}
+        # BackendEstado compartilhado entre os workers (None = um único processo)
+        self.backend = backend
+        # DicionarioCompartilhado com chave_update: a chave de cada update é carregada antes
+        # dele e gravada depois (ver DicionarioCompartilhado.carregar)
+        self.estados = ()
+        self._threads = ThreadPoolExecutor(threads_backend, "estado") if backend is not None else None
+
+    @staticmethod
+    def _chave_chat(update):
+        chat = getattr(update, "effective_chat", None)
+        return chat.id if chat is not None else None
+
+    async def do_process_update(self, update, coroutine) -> None:
+        chave = self._chave_chat(update)
+        if chave is None:
+            # Updates sem chat (ex: inline) não precisam de ordenação
+            async with self._vagas:
+                await coroutine
+            return
+
+        entrada = self._travas.get(chave)
+        if entrada is None:
+            entrada = self._travas[chave] = [asyncio.Lock(), 0]
+        entrada[1] += 1
+
+        try:
+            # asyncio.Lock atende em ordem FIFO, preservando a ordem dos updates do chat
+            async with entrada[0], self._vagas:
+                if self.backend is None:
+                    await coroutine
+                else:
+                    await self._processar_com_trava_compartilhada(chave, update, coroutine)
+        finally:
+            entrada[1] -= 1
+            if entrada[1] == 0:
+                # Ninguém mais esperando: libera a memória da trava deste chat
+                del self._travas[chave]
+
+    async def _processar_com_trava_compartilhada(self, chave, update, coroutine):
+        nome = f"chat:{chave}"
+        espera = ESPERA_TRAVA_INICIAL
+        try:
+            while (token := await self._na_thread(self._entrar, nome, update)) is None:
+                # Outro worker está processando este chat: tenta de novo com backoff
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, ESPERA_TRAVA_MAXIMA)
+        except BaseException:
+            coroutine.close() # O update não roda sem a trava e o estado do chat
+            raise
+        try:
+            await coroutine
+        finally:
+            # Mesmo se o update falhou: o que ele já tinha alterado vai para o backend
+            await self._na_thread(self._sair, nome, token, update)
+
+    def _na_thread(self, funcao, *args):
+        return asyncio.get_running_loop().run_in_executor(self._threads, funcao, *args)
+
+    def _entrar(self, nome, update):
+        """Numa thread: pega a trava do chat e carrega o estado dele. Retorna o token ou None."""
+        token = self.backend.adquirir_trava(nome, TTL_TRAVA)
+        if token is not None:
+            try:
+                for estado in self.estados:
+                    estado.carregar(update)
+            except BaseException:
+                self._sair(nome, token, update)
+                raise
+        return token
+
+    def _sair(self, nome, token, update):
+        """Numa thread: grava o estado do chat e libera a trava."""
+        try:
+            for estado in self.estados:
+                estado.gravar(update)
+        finally:
+            self.backend.liberar_trava(nome, token)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._threads is not None:
+            self._threads.shutdown(wait=False)
+
+    @property
+    def chats_ativos(self) -> int:
+        """Quantidade de chats com updates em processamento ou na fila."""
+        return len(self._travas)
@@ -0,0 +1,300 @@
+import asyncio
+import collections
+import logging
+import time
+
+from metricas import registro
+
+logger = logging.getLogger(__name__)
+
+# --- Resiliência das Chamadas ao Gemini ---
+# Quando o Gemini fica lento ou fora do ar, cada usuário não deve esperar o tempo todo
+# do travamento. Cada chamada tem um prazo. Um disjuntor por modelo abre quando muitas das
+# últimas chamadas falharam ou foram lentas; aberto, ele responde na hora sem chamar a API.
+# Um pedido que passa do p95 observado ganha uma segunda cópia (hedging), e o primeiro que
+# responder vence. Se o modelo principal falha, tentamos os modelos de reserva (mais leves).
+
+PRAZO_PADRAO = 10.0        # Segundos por chamada a um modelo
+PRAZO_TOTAL_PADRAO = 15.0  # Segundos somando as tentativas em todos os modelos
+HEDGE_MIN_AMOSTRAS = 50    # Só dispara a segunda cópia depois de conhecer o p95
+HEDGE_ATRASO_MINIMO = 0.5  # Nunca dispara a segunda cópia antes disso (evita dobrar a carga em respostas rápidas)
+
+# Disjuntor: avalia as últimas JANELA chamadas (a partir de MIN_CHAMADAS)
+DISJUNTOR_JANELA = 20
+DISJUNTOR_MIN_CHAMADAS = 10
+DISJUNTOR_TAXA_ERROS = 0.5
+DISJUNTOR_LATENCIA_LENTA = 8.0
+DISJUNTOR_TAXA_LENTAS = 0.5
+DISJUNTOR_TEMPO_ABERTO = 30.0
+
+FECHADO, ABERTO, MEIO_ABERTO = "fechado", "aberto", "meio_aberto"
+
+ABERTURAS = registro.contador("gemini_disjuntor_aberturas_total", "Vezes que o disjuntor do modelo abriu", ("modelo",))
+HEDGES = registro.contador("gemini_hedges_total", "Segundas chamadas disparadas por passar do p95", ("modelo",))
+PRAZOS_EXCEDIDOS = registro.contador("gemini_prazo_excedido_total", "Chamadas canceladas pelo prazo", ("modelo",))
+RESPOSTAS_RESERVA = registro.contador(
+    "gemini_respostas_reserva_total", "Respostas dadas por um modelo de reserva", ("modelo",))
+
+
+class GeminiIndisponivel(Exception):
+    """Nenhum modelo respondeu dentro do prazo, ou todos estão com o disjuntor aberto."""
+
+
+class JanelaLatencias:
+    """Últimas latências de um modelo; o p95 é recalculado só a cada 'recalcular_a_cada' registros."""
+
+    def __init__(self, tamanho=500, recalcular_a_cada=25):
+        self._valores = collections.deque(maxlen=tamanho)
+        self.recalcular_a_cada = recalcular_a_cada
+        self._novos = 0
+        self._p95 = None
+
+    def __len__(self):
+        return len(self._valores)
+
+    def registrar(self, segundos):
+        self._valores.append(segundos)
+        self._novos += 1
+
+    def percentil95(self, min_amostras=HEDGE_MIN_AMOSTRAS):
+        """p95 das latências recentes, ou None se ainda há poucas amostras."""
+        if len(self._valores) < min_amostras:
+            return None
+        if self._p95 is None or self._novos >= self.recalcular_a_cada:
+            ordenados = sorted(self._valores)
+            self._p95 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))]
+            self._novos = 0
+        return self._p95
+
+
+class Disjuntor:
+    """
+    Disjuntor (circuit breaker) de um modelo.
+
+    Fechado: todas as chamadas passam. Abre se, nas últimas 'janela' chamadas, a fração
+    de erros ou de chamadas lentas atingir o limite. Aberto: recusa tudo por 'tempo_aberto'
+    segundos. Meio aberto: deixa passar uma chamada de teste; se ela for bem e rápida, fecha.
+    Usado só dentro do event loop do bot (sem locks).
+    """
+
+    def __init__(self, nome, janela=DISJUNTOR_JANELA, min_chamadas=DISJUNTOR_MIN_CHAMADAS,
+                 taxa_erros=DISJUNTOR_TAXA_ERROS, latencia_lenta=DISJUNTOR_LATENCIA_LENTA,
+                 taxa_lentas=DISJUNTOR_TAXA_LENTAS, tempo_aberto=DISJUNTOR_TEMPO_ABERTO, relogio=time.monotonic):
+        self.nome = nome
+        self.min_chamadas = min_chamadas
+        self.taxa_erros = taxa_erros
+        self.latencia_lenta = latencia_lenta
+        self.taxa_lentas = taxa_lentas
+        self.tempo_aberto = tempo_aberto
+        self.relogio = relogio
+        self.estado = FECHADO
+        self._resultados = collections.deque(maxlen=janela) # (erro, lenta) das últimas chamadas
+        self._aberto_ate = 0.0
+        self._sonda_em_voo = False
+
+    @property
+    def aberto(self):
+        """True enquanto estiver recusando chamadas (sem consumir a chamada de teste)."""
+        return self.estado == ABERTO and self.relogio() < self._aberto_ate
+
+    def permite(self):
+        """Reserva a passagem de uma chamada. Toda chamada permitida deve terminar em registrar() ou cancelar()."""
+        if self.estado == FECHADO:
+            return True
+        if self.estado == ABERTO:
+            if self.relogio() < self._aberto_ate:
+                return False
+            self.estado = MEIO_ABERTO
+            self._sonda_em_voo = False
+        if self._sonda_em_voo:
+            return False # Meio aberto: uma chamada de teste por vez
+        self._sonda_em_voo = True
+        return True
+
+    def registrar(self, latencia=None, erro=False):
+        """Resultado de uma chamada permitida: latência em segundos ou erro (inclui prazo estourado)."""
+        lenta = not erro and latencia is not None and latencia >= self.latencia_lenta
+        if self.estado == MEIO_ABERTO:
+            self._sonda_em_voo = False
+            if erro or lenta:
+                self._abrir()
+            else:
+                self.estado = FECHADO
+                self._resultados.clear()
+                logger.info(f"Disjuntor do {self.nome} fechado: chamada de teste respondeu.")
+            return
+        if self.estado == ABERTO:
+            return # Chamada iniciada antes de abrir
+
+        self._resultados.append((erro, lenta))
+        total = len(self._resultados)
+        if total >= self.min_chamadas:
+            erros = sum(1 for e, _ in self._resultados if e)
+            lentas = sum(1 for _, l in self._resultados if l)
+            if erros >= self.taxa_erros * total or lentas >= self.taxa_lentas * total:
+                self._abrir()
+
+    def cancelar(self):
+        """Chamada permitida que foi abandonada sem resultado (ex: o usuário desistiu)."""
+        if self.estado == MEIO_ABERTO:
+            self._sonda_em_voo = False
+
+    def _abrir(self):
+        self.estado = ABERTO
+        self._aberto_ate = self.relogio() + self.tempo_aberto
+        self._resultados.clear()
+        ABERTURAS.inc(self.nome)
+        logger.warning(f"Disjuntor do {self.nome} aberto por {self.tempo_aberto:.0f}s.")
+
+
+class ChamadorResiliente:
+    """
+    Executa chamadas ao Gemini com prazo, disjuntor por modelo, hedging e modelos de reserva.
+    'modelos' é a lista em ordem de preferência: o principal e depois os de reserva.
+    """
+
+    def __init__(self, modelos, prazo=PRAZO_PADRAO, prazo_total=PRAZO_TOTAL_PADRAO, hedge=True,
+                 hedge_min_amostras=HEDGE_MIN_AMOSTRAS, hedge_atraso_minimo=HEDGE_ATRASO_MINIMO, **config_disjuntor):
+        self.modelos = list(modelos)
+        self.prazo = prazo
+        self.prazo_total = prazo_total
+        self.hedge = hedge
+        self.hedge_min_amostras = hedge_min_amostras
+        self.hedge_atraso_minimo = hedge_atraso_minimo
+        self.disjuntores = {modelo: Disjuntor(modelo, **config_disjuntor) for modelo in self.modelos}
+        self.latencias = {modelo: JanelaLatencias() for modelo in self.modelos}
+
+    def disponivel(self):
+        """False quando todos os disjuntores estão abertos (dá para responder sem esperar fila)."""
+        return any(not disjuntor.aberto for disjuntor in self.disjuntores.values())
+
+    def _prazo_da_tentativa(self, limite):
+        if limite is None:
+            return self.prazo
+        restante = limite - time.monotonic()
+        return restante if self.prazo is None else min(self.prazo, restante)
+
+    def _registrar_sucesso(self, modelo, latencia):
+        self.disjuntores[modelo].registrar(latencia)
+        if modelo != self.modelos[0]:
+            RESPOSTAS_RESERVA.inc(modelo)
+
+    async def chamar(self, chamada):
+        """
+        chamada(modelo) -> coroutine que retorna o texto da resposta.
+        Retorna (texto, modelo que respondeu); GeminiIndisponivel se nenhum modelo respondeu.
+        """
+        limite = time.monotonic() + self.prazo_total if self.prazo_total else None
+        for modelo in self.modelos:
+            prazo = self._prazo_da_tentativa(limite)
+            if prazo is not None and prazo <= 0:
+                break
+            disjuntor = self.disjuntores[modelo]
+            if not disjuntor.permite():
+                continue
+
+            inicio = time.monotonic()
+            try:
+                texto = await asyncio.wait_for(self._com_hedge(chamada, modelo), prazo)
+            except asyncio.TimeoutError:
+                disjuntor.registrar(erro=True)
+                PRAZOS_EXCEDIDOS.inc(modelo)
+                logger.warning("Prazo do Gemini excedido", extra={"modelo": modelo, "prazo_s": prazo})
+                continue
+            except asyncio.CancelledError:
+                disjuntor.cancelar()
+                raise
+            except Exception as e:
+                disjuntor.registrar(erro=True)
+                logger.warning("Erro no Gemini: %r", e, extra={"modelo": modelo})
+                continue
+            self._registrar_sucesso(modelo, time.monotonic() - inicio)
+            return texto, modelo
+        raise GeminiIndisponivel("Nenhum modelo do Gemini respondeu")
+
+    async def _com_hedge(self, chamada, modelo):
+        """Faz a chamada; se ela passar do p95 do modelo, dispara uma segunda e fica com a primeira que responder."""
+        janela = self.latencias[modelo]
+        inicio = time.monotonic()
+        atraso = None
+        if self.hedge and self.disjuntores[modelo].estado == FECHADO:
+            p95 = janela.percentil95(self.hedge_min_amostras)
+            if p95 is not None:
+                atraso = max(p95, self.hedge_atraso_minimo)
+
+        pendentes = {asyncio.ensure_future(chamada(modelo))}
+        try:
+            if atraso is not None:
+                feitas, _ = await asyncio.wait(pendentes, timeout=atraso)
+                if not feitas:
+                    HEDGES.inc(modelo)
+                    pendentes.add(asyncio.ensure_future(chamada(modelo)))
+
+            erro = None
+            while pendentes:
+                feitas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in feitas:
+                    if tarefa.exception() is None:
+                        # Com hedge, é o tempo até a primeira resposta: nunca menor que o p95 que o disparou,
+                        # então a janela continua representando a latência de uma chamada isolada
+                        janela.registrar(time.monotonic() - inicio)
+                        return tarefa.result()
+                    erro = tarefa.exception()
+            raise erro
+        finally:
+            for tarefa in pendentes:
+                tarefa.cancel()
+
+    async def stream(self, abrir):
+        """
+        Versão em streaming: abrir(modelo) -> coroutine que retorna um iterador assíncrono de pedaços.
+        O prazo vale até o primeiro pedaço (e o prazo total até o fim); só troca de modelo antes
+        do primeiro pedaço, e não faz hedging (parte da resposta já pode ter sido mostrada).
+        Gera (pedaço, modelo); GeminiIndisponivel se nada chegou ou o stream parou no meio.
+        """
+        limite = time.monotonic() + self.prazo_total if self.prazo_total else None
+        for modelo in self.modelos:
+            prazo = self._prazo_da_tentativa(limite)
+            if prazo is not None and prazo <= 0:
+                break
+            disjuntor = self.disjuntores[modelo]
+            if not disjuntor.permite():
+                continue
+
+            inicio = time.monotonic()
+            registrado = False
+            try:
+                iterador = None
+                try:
+                    async def primeiro_pedaco():
+                        nonlocal iterador
+                        iterador = (await abrir(modelo)).__aiter__()
+                        return await iterador.__anext__()
+                    pedaco = await asyncio.wait_for(primeiro_pedaco(), prazo)
+                except Exception as e: # Inclui o prazo estourado e o stream vazio (StopAsyncIteration)
+                    disjuntor.registrar(erro=True)
+                    registrado = True
+                    if isinstance(e, asyncio.TimeoutError):
+                        PRAZOS_EXCEDIDOS.inc(modelo)
+                        logger.warning("Prazo do Gemini excedido (stream)", extra={"modelo": modelo, "prazo_s": prazo})
+                    else:
+                        logger.warning("Erro no Gemini: %r", e, extra={"modelo": modelo})
+                    continue
+
+                self._registrar_sucesso(modelo, time.monotonic() - inicio)
+                registrado = True
+                yield pedaco, modelo
+                while True:
+                    try:
+                        restante = None if limite is None else limite - time.monotonic()
+                        pedaco = await asyncio.wait_for(iterador.__anext__(), restante)
+                    except StopAsyncIteration:
+                        return
+                    except asyncio.TimeoutError:
+                        PRAZOS_EXCEDIDOS.inc(modelo)
+                        raise GeminiIndisponivel(f"{modelo} excedeu o prazo total no meio da resposta")
+                    yield pedaco, modelo
+            finally:
+                if not registrado:
+                    disjuntor.cancelar()
+        raise GeminiIndisponivel("Nenhum modelo do Gemini respondeu")
@@ -0,0 +1,123 @@
+import json
+import logging
+from typing import NamedTuple
+
+import tornado.web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+logger = logging.getLogger(__name__)
+
+# --- Rotas HTTP no Event Loop do Bot ---
+# Métricas e administração rodam no mesmo event loop do bot do Telegram. O HTTP em si
+# (interpretação da requisição, Content-Length, chunked, keep-alive) fica com o servidor do
+# tornado, o mesmo que o python-telegram-bot usa no modo webhook; aqui ficam só as rotas:
+# cada uma é uma coroutine Requisicao -> Resposta. Pensado para ficar atrás de um
+# proxy/load balancer que termina o TLS.
+
+MAX_CORPO = 1024 * 1024 # Nenhuma rota recebe corpos maiores que isso
+TIMEOUT_OCIOSO = 75 # Segundos que uma conexão keep-alive pode ficar parada
+
+
+class Requisicao(NamedTuple):
+    metodo: str
+    caminho: str
+    consulta: dict   # Parâmetros da query string
+    cabecalhos: dict # Nomes em minúsculas
+    corpo: bytes
+
+    def json(self):
+        return json.loads(self.corpo)
+
+
+class Resposta(NamedTuple):
+    status: int = 200
+    corpo: bytes = b"" # Ou um iterador assíncrono de bytes: enviado em pedaços (chunked), ex: SSE
+    tipo: str = "text/plain; charset=utf-8"
+
+
+def resposta_json(dados, status=200):
+    return Resposta(status, json.dumps(dados, ensure_ascii=False, default=str).encode(), "application/json")
+
+
+def resposta_texto(texto, status=200):
+    return Resposta(status, texto.encode())
+
+
+class _Despachante(tornado.web.RequestHandler):
+    """Entrega cada requisição à rota (caminho exato, método) registrada no ServidorHTTP."""
+
+    def initialize(self, rotas):
+        self.rotas = rotas
+
+    async def _atender(self):
+        metodos = self.rotas.get(self.request.path)
+        if metodos is None:
+            return self.send_error(404)
+        handler = metodos.get(self.request.method)
+        if handler is None:
+            return self.send_error(405)
+
+        requisicao = Requisicao(
+            self.request.method,
+            self.request.path,
+            {nome: self.get_query_argument(nome) for nome in self.request.query_arguments},
+            {nome.lower(): valor for nome, valor in self.request.headers.get_all()},
+            self.request.body,
+        )
+        try:
+            resposta = await handler(requisicao)
+        except Exception:
+            logger.exception(f"Erro ao atender {requisicao.metodo} {requisicao.caminho}")
+            return self.send_error(500)
+
+        self.set_status(resposta.status)
+        self.set_header("Content-Type", resposta.tipo)
+        if isinstance(resposta.corpo, bytes):
+            return self.finish(resposta.corpo)
+        async for pedaco in resposta.corpo:
+            if pedaco:
+                self.write(pedaco)
+                await self.flush()
+        self.finish()
+
+    get = post = put = patch = delete = _atender
+
+    def write_error(self, status_code, **kwargs):
+        self.finish(b"") # Sem a página HTML de erro do tornado
+
+
+class ServidorHTTP:
+    """Rotas HTTP servidas pelo tornado no event loop atual. Cada rota é uma coroutine Requisicao -> Resposta."""
+
+    def __init__(self, host="0.0.0.0", porta=8080, reuse_port=False, max_corpo=MAX_CORPO):
+        self.host = host
+        self.porta = porta
+        # reuse_port: vários processos escutam a mesma porta e o kernel distribui as conexões
+        self.reuse_port = reuse_port
+        self.max_corpo = max_corpo
+        self._rotas = {}       # Chave: caminho, Valor: {método: handler}
+        self._servidor = None
+
+    def rota(self, metodo, caminho, handler):
+        self._rotas.setdefault(caminho, {})[metodo.upper()] = handler
+        return self
+
+    async def iniciar(self):
+        # log_function: cada requisição já aparece nas métricas; sem uma linha de log por acesso
+        aplicacao = tornado.web.Application([(r".*", _Despachante, {"rotas": self._rotas})],
+                                            log_function=lambda handler: None)
+        sockets = bind_sockets(self.porta, self.host, reuse_port=self.reuse_port, backlog=1024)
+        self._servidor = HTTPServer(aplicacao, max_body_size=self.max_corpo, idle_connection_timeout=TIMEOUT_OCIOSO)
+        self._servidor.add_sockets(sockets)
+        # Com porta 0 o sistema escolhe uma livre: guardamos a real
+        self.porta = sockets[0].getsockname()[1]
+        logger.info(f"Servidor HTTP ouvindo em {self.host}:{self.porta}")
+        return self
+
+    async def parar(self):
+        if self._servidor is None:
+            return
+        self._servidor.stop()
+        await self._servidor.close_all_connections()
+        self._servidor = None
@@ -0,0 +1,66 @@
+import multiprocessing
+
+from telegram import Update
+from tornado.netutil import bind_sockets
+
+from conversas_expiraveis import trocar_conversas
+
+# --- Modo Webhook do Bot do Telegram ---
+# Em vez de um único processo buscando updates (polling), o Telegram faz um POST
+# para a nossa URL a cada update. Cada worker roda o Application.run_webhook do PTB (servidor
+# tornado, conferência do token secreto, set_webhook e o ciclo de vida completo do bot); com
+# vários workers na mesma porta (SO_REUSEPORT) o kernel distribui as conexões entre eles, e
+# atrás de um load balancer basta apontar para todos.
+# O estado das conversas precisa então ficar num backend compartilhado (backend_estado).
+
+# Só pedimos ao Telegram os tipos de update que os handlers tratam (mensagens de texto e comandos)
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+
+def compartilhar_conversas(conv_handler, estado):
+    """
+    Faz o ConversationHandler ler e gravar o estado de cada conversa direto em 'estado'
+    (um mapeamento compartilhado entre processos, ex: DicionarioCompartilhado).
+
+    A persistência do PTB só carrega as conversas na inicialização, o que não serve
+    para vários workers atendendo o mesmo chat. Os handlers do bot são bloqueantes,
+    então o ConversationHandler só guarda estados simples (inteiros) nesse mapeamento.
+    """
+    return trocar_conversas(conv_handler, estado)
+
+
+def executar_webhook(application, segredo, caminho, porta, url_publica, host="0.0.0.0", max_conexoes=40):
+    """
+    Executa o bot em modo webhook até receber SIGINT/SIGTERM (ou application.stop_running()).
+    Todo worker registra o mesmo webhook (url_publica + caminho, com o mesmo segredo), o que o
+    Telegram aceita sem efeito colateral.
+    """
+    # O run_webhook aceita um socket já pronto (parâmetro 'unix', que também recebe sockets
+    # TCP): assim cada worker escuta a mesma porta com SO_REUSEPORT
+    socket_escuta, = bind_sockets(porta, host, reuse_port=True, backlog=1024)
+    application.run_webhook(
+        url_path=caminho,
+        webhook_url=url_publica.rstrip("/") + caminho,
+        secret_token=segredo,
+        allowed_updates=ALLOWED_UPDATES,
+        max_connections=max_conexoes,
+        unix=socket_escuta,
+    )
+
+
+def iniciar_workers(quantidade, alvo, *args):
+    """
+    Sobe 'quantidade - 1' processos executando alvo(indice, *args) e roda o worker 0 neste processo.
+    Usa 'spawn': cada worker importa o bot do zero (sem herdar threads, conexões ou o event loop).
+    """
+    contexto = multiprocessing.get_context("spawn")
+    processos = [contexto.Process(target=alvo, args=(indice, *args), daemon=True) for indice in range(1, quantidade)]
+    for processo in processos:
+        processo.start()
+    try:
+        alvo(0, *args)
+    finally:
+        for processo in processos:
+            processo.terminate()
+        for processo in processos:
+            processo.join(timeout=10)